@@ -0,0 +1,19 @@
+# app_paths.py - Onde o robô guarda os arquivos que gera (caches, histórico local, checkpoints)
+
+import os
+import sys
+
+
+def app_dir():
+    """
+    Pasta do aplicativo: a do executável no build do PyInstaller (sys._MEIPASS é temporária e
+    apagada ao sair) ou a dos scripts. Não depende da pasta de onde o robô foi iniciado.
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def app_data_path(name):
+    """Caminho de um arquivo ou pasta gerado pelo robô, dentro de app_dir()."""
+    return os.path.join(app_dir(), name)
@@ -0,0 +1,86 @@
+# asset_resolver.py - Índice dos nomes de ativos da API: par base, variante, opcode e suporte
+
+from collections import namedtuple
+
+# Sufixos com que a API publica o mesmo par (ex: EURUSD, EURUSD-OTC, EURUSD-op)
+VARIANTS = ('-OTC', '-op')
+
+# `otc` segue a regra antiga de substring ('-OTC' em qualquer ponto do nome, ex: 'EURUSD-OTC-L')
+AssetInfo = namedtuple('AssetInfo', ['name', 'canonical', 'variant', 'opcode', 'supported', 'otc'])
+
+
+def split_variant(name):
+    """'EURUSD-OTC' -> ('EURUSD', '-OTC'); 'EURUSD' -> ('EURUSD', '')."""
+    for variant in VARIANTS:
+        if name.endswith(variant): return name[:-len(variant)], variant
+    return name, ''
+
+
+class AssetResolver:
+    """
+    Resolve os nomes da API por consulta em dicionários, montados uma vez para um conjunto de
+    nomes (`names`, ex: as chaves de get_all_open_time) e o mapa de opcodes da biblioteca
+    (`opcodes`, de get_all_ACTIVES_OPCODE). É imutável: quando os nomes ou os opcodes mudam,
+    monta-se outro (ver `matches`).
+    """
+
+    def __init__(self, names, opcodes):
+        self.names = frozenset(names)
+        self.source = opcodes
+        self.opcodes = {str(name).upper(): code for name, code in opcodes.items()} if isinstance(opcodes, dict) \
+            else dict.fromkeys(str(name).upper() for name in opcodes or ())
+        self.assets = {}
+        self.by_canonical = {}
+        # Ordem da API preservada: as buscas percorrem os nomes na ordem em que foram recebidos
+        for name in names:
+            info = self._build(name)
+            self.assets[name] = info
+            self.by_canonical.setdefault(info.canonical, []).append(name)
+        self.otc = tuple(name for name, info in self.assets.items() if info.otc)
+
+    def _build(self, name):
+        canonical, variant = split_variant(name)
+        key = name.upper()
+        return AssetInfo(name, canonical, variant, self.opcodes.get(key), key in self.opcodes, '-OTC' in name)
+
+    def matches(self, names, opcodes):
+        """True se o índice ainda vale para estes nomes e opcodes (mesmo mapa de opcodes e mesmas chaves)."""
+        return opcodes is self.source and self.names == names
+
+    def resolve(self, name):
+        """AssetInfo do nome; nomes fora do conjunto indexado são resolvidos na hora, sem cache."""
+        return self.assets.get(name) or self._build(name)
+
+    def is_supported(self, name):
+        info = self.assets.get(name)
+        return info.supported if info else name.upper() in self.opcodes
+
+    def variants(self, canonical):
+        """Os nomes indexados do par, na ordem da API (ex: ['EURUSD', 'EURUSD-op'])."""
+        return self.by_canonical.get(canonical, [])
+
+
+class PreferredAssets:
+    """
+    Lista de pares preferidos, na ordem de prioridade, com a consulta do par de um nome da API.
+    O par base do índice (AssetInfo.canonical) resolve os nomes com os sufixos conhecidos; os
+    demais (ex: 'EURUSD-L') caem na regra antiga, o primeiro par da lista que é prefixo do nome,
+    testando só os prefixos com os comprimentos dos pares.
+    """
+
+    def __init__(self, assets):
+        self.assets = list(assets)
+        self.rank = {}
+        for position, asset in enumerate(self.assets):
+            self.rank.setdefault(asset, position)
+        self.lengths = sorted({len(asset) for asset in self.rank})
+
+    def __contains__(self, asset):
+        return asset in self.rank
+
+    def match(self, info):
+        """O par preferido do AssetInfo, ou None se nenhum corresponde."""
+        if info.canonical in self.rank: return info.canonical
+        name = info.name
+        positions = [self.rank[name[:length]] for length in self.lengths if name[:length] in self.rank]
+        return self.assets[min(positions)] if positions else None
@@ -0,0 +1,343 @@
+# backtest.py - Replay do histórico M1 pelas estratégias, sem conexão com a corretora
+#
+# Uso: python backtest.py --data pasta_com_csvs [--assets EURUSD GBPUSD] [--strategies strategy_berman.py]
+#                         [--workers 4] [--payout 0.85] [--balance 1000] [--output resultado.csv]
+#                         [--vectorized] [--check-vectorized 2000] [--start 2024-01-01 --end 2024-04-01]
+#
+# Cada ativo é um CSV (<ATIVO>.csv) com as colunas from (epoch em segundos), open, high (ou max),
+# low (ou min), close e volume, como as velas retornadas pela API. Se a pasta não tiver CSVs, é lida
+# como um CandleStore (candle_store.py), só no período de --start/--end.
+
+import argparse
+import csv
+import importlib
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from candles import CANDLE_FIELDS, enable_copy_on_write, read_only_view, resample_candles, to_frame
+from indicators import IndicatorEngine, IndicatorStateBank
+from risk_management import RiskManagement
+
+# Mesmas janelas que o BotCore pede à API: 110 velas M1 e 50 velas M5
+WINDOW = 110
+M5_INTERVAL = 300
+M5_COUNT = 50
+
+
+def load_strategies(names=None):
+    """Carrega as funções check_signal de strategies/strategy_*.py (todas, ou só as de `names`)."""
+    strategy_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategies')
+    strategies = {}
+    for filename in sorted(os.listdir(strategy_folder)):
+        if not (filename.startswith('strategy_') and filename.endswith('.py')): continue
+        if names and filename not in names and filename[:-3] not in names: continue
+        module = importlib.import_module(f"strategies.{filename[:-3]}")
+        if hasattr(module, 'check_signal'):
+            strategies[filename] = module.check_signal
+    return strategies
+
+
+def load_history(path):
+    """
+    Lê o histórico M1 de um ativo e devolve (timestamps int64, valores 5 x n na ordem de CANDLE_FIELDS).
+    `path` é um CSV ou uma fonte ('store', pasta, ativo, início, fim) de history_files; do CandleStore
+    os arrays são somente leitura, e só um período de um único dia sem lacunas vem direto do arquivo
+    mapeado: com vários dias (o caso comum num backtest) os dias são concatenados numa cópia.
+    """
+    if isinstance(path, tuple):
+        _, root, asset, start, end = path
+        return CandleStore(root).read(asset, start, end)
+
+    df = pd.read_csv(path).rename(columns={'max': 'high', 'min': 'low'})
+    if 'volume' not in df: df['volume'] = 0.0
+    df = df.drop_duplicates('from', keep='last').sort_values('from')
+    timestamps = df['from'].to_numpy(dtype=np.int64)
+    values = df[list(CANDLE_FIELDS)].to_numpy(dtype=np.float64).T.copy()
+    return timestamps, values
+
+
+class HistoryWalker:
+    """
+    Monta, para cada vela `f` do histórico, as janelas que o BotCore vê na virada do minuto em
+    que `f` abre: as WINDOW - 1 velas M1 fechadas antes de `f` mais `f` em formação, e o M5
+    correspondente, com o bucket de `f` formado até ela. Da vela em formação só se conhece a
+    abertura: abertura, máxima, mínima e fechamento iguais a ela, volume 0.
+    A ordem decidida nessa janela abre em `f` e liquida no fechamento dela, como em generate_signals.
+    """
+
+    def __init__(self, timestamps, values):
+        self.timestamps = timestamps
+        self.values = values
+        m5 = resample_candles(to_frame(timestamps, values), M5_INTERVAL)
+        # A unidade do índice varia (to_frame gera segundos no pandas 3, nanossegundos no 2.x)
+        self.m5_timestamps = m5.index.as_unit('s').asi8.astype(np.int64) if len(m5) else np.zeros(0, dtype=np.int64)
+        self.m5_values = m5[list(CANDLE_FIELDS)].to_numpy(dtype=np.float64).T.copy()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def forming_bar(self, f):
+        """A vela `f` logo depois de abrir, na ordem de CANDLE_FIELDS."""
+        open_price = self.values[0, f]
+        return np.array([open_price, open_price, open_price, open_price, 0.0])
+
+    def m1_window(self, f, window=WINDOW):
+        """Janela de `window` velas: as fechadas antes de `f` e `f` em formação."""
+        values = self.values[:, f - window + 1:f + 1].copy()
+        values[:, -1] = self.forming_bar(f)
+        return to_frame(self.timestamps[f - window + 1:f + 1], values)
+
+    def m5_window(self, f):
+        """Últimas M5_COUNT velas M5 na abertura da vela `f`: buckets fechados + o bucket de `f`, formado até ela."""
+        bucket = self.timestamps[f] // M5_INTERVAL * M5_INTERVAL
+        closed = int(np.searchsorted(self.m5_timestamps, bucket))
+        first = int(np.searchsorted(self.timestamps, bucket))
+
+        forming = self.forming_bar(f)
+        if first < f:
+            partial = self.values[:, first:f]
+            forming = np.array([partial[0, 0], max(partial[1].max(), forming[1]), min(partial[2].min(), forming[2]),
+                                forming[3], partial[4].sum()])
+
+        start = max(0, closed - (M5_COUNT - 1))
+        timestamps = np.append(self.m5_timestamps[start:closed], bucket)
+        values = np.column_stack([self.m5_values[:, start:closed], forming])
+        return to_frame(timestamps, values)
+
+
+def settle(action, open_price, close_price, stake, payout):
+    """Resultado de uma opção de 1 minuto aberta na abertura da vela e expirada no fechamento."""
+    if close_price == open_price: return 0.0
+    won = close_price > open_price if action == 'CALL' else close_price < open_price
+    return stake * payout if won else -stake
+
+
+def verify_generate_signals(module, df, window=WINDOW):
+    """
+    Confere generate_signals do módulo contra check_signal chamado vela a vela, nas janelas que o
+    robô monta (HistoryWalker.m1_window, com a vela em formação).
+    Retorna a lista de divergências (horário da vela, vetorizado, por vela); vazia se equivalentes.
+    """
+    vectorized = module.generate_signals(df, window)
+    if hasattr(module, 'reset_state'): module.reset_state()
+    walker = HistoryWalker(df.index.as_unit('s').asi8, df[list(CANDLE_FIELDS)].to_numpy(dtype=np.float64).T.copy())
+    mismatches = []
+    for t in range(window - 1, len(df)):
+        per_bar = module.check_signal(read_only_view(walker.m1_window(t, window)))
+        if per_bar != vectorized[t]:
+            mismatches.append((df.index[t], vectorized[t], per_bar))
+    return mismatches
+
+
+def new_strategy_stats():
+    return {'trades': 0, 'wins': 0, 'losses': 0, 'draws': 0, 'pnl': 0.0}
+
+
+def backtest_asset(asset, path, settings, strategy_names=None, vectorized=False):
+    """
+    Percorre o histórico de um ativo minuto a minuto, como o BotCore em modo sequencial:
+    na abertura de cada vela as estratégias rodam na ordem sobre a janela do robô (velas fechadas
+    mais a que acabou de abrir), o primeiro sinal abre uma ordem de 1 minuto nessa vela, liquidada
+    no fechamento dela, e a vela seguinte não é avaliada (posição ainda aberta). O RiskManagement é recriado a cada dia (UTC), com o
+    saldo corrente, e o dia é encerrado ao atingir stop loss ou take profit.
+
+    Com `vectorized`, só as estratégias com generate_signals rodam, e os sinais de toda a série
+    são calculados de uma vez, com a mesma regra: o sinal da vela t abre a ordem na própria vela t.
+    O resultado traz as operações feitas em 'trades': (início da vela, estratégia, sinal, resultado).
+    """
+    # Os workers não devem inundar o terminal com os logs de depuração das estratégias
+    logging.disable(logging.CRITICAL)
+    strategies = load_strategies(strategy_names)
+    # O mesmo processo pode receber vários ativos: estratégias com estado começam do zero
+    modules = {name: sys.modules[func.__module__] for name, func in strategies.items()}
+    for module in modules.values():
+        if hasattr(module, 'reset_state'): module.reset_state()
+    walker = HistoryWalker(*load_history(path))
+
+    skipped, signal_arrays = [], {}
+    if vectorized:
+        skipped = [name for name, module in modules.items() if not hasattr(module, 'generate_signals')]
+        strategies = {name: func for name, func in strategies.items() if name not in skipped}
+        frame = to_frame(walker.timestamps, walker.values)
+        signal_arrays = {name: modules[name].generate_signals(frame, WINDOW) for name in strategies}
+    payout = settings.get('payout', 0.85)
+    risk_settings = dict(settings, trade_history_file=None)
+
+    states = IndicatorStateBank()
+    stats = {name: new_strategy_stats() for name in strategies}
+    balance = settings.get('balance', 1000.0)
+    risk_manager, day, day_closed = None, None, False
+    days, target_days = 0, 0
+    trades = []
+
+    # f: vela em que a ordem abre; a decisão usa as velas fechadas até f - 1 e a abertura de f
+    f = WINDOW - 1
+    while f < len(walker):
+        bar_day = walker.timestamps[f] // 86400
+        if bar_day != day:
+            if risk_manager: balance = risk_manager.current_balance
+            risk_manager, day, day_closed = RiskManagement(balance, risk_settings), bar_day, False
+            days += 1
+        if day_closed: f += 1; continue
+
+        # Uma lacuna no histórico (fim de semana, falha de coleta) não forma uma janela contínua
+        if walker.timestamps[f] - walker.timestamps[f - WINDOW + 1] != (WINDOW - 1) * 60: f += 1; continue
+
+        if not vectorized:
+            df_m1, df_m5 = walker.m1_window(f), walker.m5_window(f)
+            indicators = IndicatorEngine(df_m1, asset=asset, states=states)
+        traded = False
+        for name, strategy_func in strategies.items():
+            if vectorized:
+                signal = signal_arrays[name][f]
+            else:
+                try:
+                    signal = strategy_func(read_only_view(df_m1), read_only_view(df_m5), indicators=indicators)
+                except Exception:
+                    signal = None
+            if not signal: continue
+
+            stake = risk_manager.calculate_stake()
+            if stake <= 0: continue
+            profit = settle(signal, walker.values[0, f], walker.values[3, f], stake, payout)
+            risk_manager.register_trade_result(profit)
+
+            entry = stats[name]
+            entry['trades'] += 1; entry['pnl'] += profit
+            entry['wins' if profit > 0 else 'losses' if profit < 0 else 'draws'] += 1
+            trades.append((int(walker.timestamps[f]), name, signal, profit))
+            traded = True
+            break
+
+        if risk_manager.check_stop_loss() or risk_manager.check_take_profit():
+            day_closed = True; target_days += 1
+        f += 2 if traded else 1
+
+    return {'asset': asset, 'stats': stats, 'start_balance': settings.get('balance', 1000.0),
+            'final_balance': risk_manager.current_balance if risk_manager else balance,
+            'bars': len(walker), 'days': days, 'target_days': target_days, 'skipped': skipped, 'trades': trades}
+
+
+def history_files(data_dir, assets=None, start=None, end=None):
+    """Fonte do histórico de cada ativo: os CSVs da pasta ou, sem eles, o CandleStore no período [start, end)."""
+    files = {name[:-4]: os.path.join(data_dir, name) for name in sorted(os.listdir(data_dir)) if name.endswith('.csv')}
+    if not files:
+        files = {asset: ('store', data_dir, asset, start, end) for asset in CandleStore(data_dir).assets()}
+    if assets: files = {asset: path for asset, path in files.items() if asset in assets}
+    return files
+
+
+def parse_date(value):
+    """'AAAA-MM-DD' (UTC) em segundos desde a época; None fica None."""
+    if value is None: return None
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+def run_backtest(data_dir, settings, assets=None, strategy_names=None, workers=None, vectorized=False,
+                 start=None, end=None):
+    """Roda backtest_asset para cada ativo da pasta, um ativo por processo."""
+    files = history_files(data_dir, assets, start, end)
+    # Os workers ligam o Copy-on-Write por conta própria (processos novos no Windows)
+    with ProcessPoolExecutor(max_workers=workers, initializer=enable_copy_on_write) as pool:
+        futures = [pool.submit(backtest_asset, asset, path, settings, strategy_names, vectorized) for asset, path in files.items()]
+        return [future.result() for future in futures]
+
+
+def check_vectorized(data_dir, bars, assets=None, strategy_names=None, start=None, end=None):
+    """Roda verify_generate_signals nas últimas `bars` velas de cada ativo. Retorna True se tudo bater."""
+    logging.disable(logging.CRITICAL)
+    strategies = load_strategies(strategy_names)
+    modules = {name: sys.modules[func.__module__] for name, func in strategies.items()}
+    ok = True
+    for asset, path in history_files(data_dir, assets, start, end).items():
+        df = to_frame(*load_history(path)).iloc[-(bars + WINDOW - 1):]
+        for name, module in modules.items():
+            if not hasattr(module, 'generate_signals'): continue
+            mismatches = verify_generate_signals(module, df)
+            ok = ok and not mismatches
+            print(f"{asset} {name}: {'OK' if not mismatches else f'{len(mismatches)} divergência(s)'} em {len(df) - WINDOW + 1} velas")
+            for when, vectorized, per_bar in mismatches[:5]:
+                print(f"    {when}: vetorizado={vectorized} por vela={per_bar}")
+    return ok
+
+
+def report_rows(results):
+    rows = []
+    for result in results:
+        for name, entry in result['stats'].items():
+            win_rate = entry['wins'] / entry['trades'] * 100 if entry['trades'] else 0.0
+            rows.append({'ativo': result['asset'], 'estrategia': name, 'operacoes': entry['trades'],
+                         'wins': entry['wins'], 'losses': entry['losses'], 'draws': entry['draws'],
+                         'assertividade': round(win_rate, 2), 'pl': round(entry['pnl'], 2)})
+    return rows
+
+
+def print_report(results):
+    print(f"{'ativo':<12} {'estratégia':<30} {'ops':>6} {'wins':>6} {'losses':>6} {'acerto':>8} {'P/L ($)':>10}")
+    for row in report_rows(results):
+        print(f"{row['ativo']:<12} {row['estrategia']:<30} {row['operacoes']:>6} {row['wins']:>6} {row['losses']:>6} "
+              f"{row['assertividade']:>7.2f}% {row['pl']:>10.2f}")
+    skipped = sorted({name for result in results for name in result['skipped']})
+    if skipped: print(f"Sem generate_signals (ignoradas no modo vetorizado): {', '.join(skipped)}")
+    for result in results:
+        print(f"{result['asset']}: {result['bars']} velas, {result['days']} dias ({result['target_days']} encerrados por meta) | "
+              f"saldo ${result['start_balance']:.2f} -> ${result['final_balance']:.2f}")
+
+
+def main():
+    enable_copy_on_write()
+    parser = argparse.ArgumentParser(description="Backtest das estratégias sobre histórico M1")
+    parser.add_argument('--data', required=True, help="Pasta com um CSV de velas M1 por ativo, ou um CandleStore")
+    parser.add_argument('--start', help="Início do período no CandleStore (AAAA-MM-DD, UTC)")
+    parser.add_argument('--end', help="Fim do período no CandleStore (AAAA-MM-DD, exclusivo)")
+    parser.add_argument('--assets', nargs='+')
+    parser.add_argument('--strategies', nargs='+')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--payout', type=float, default=0.85)
+    parser.add_argument('--balance', type=float, default=1000.0)
+    parser.add_argument('--stake-mode', choices=['percentage', 'fixed'], default='percentage')
+    parser.add_argument('--stake-value', type=float, default=1.0)
+    parser.add_argument('--capital-strategy', choices=['none', 'soros', 'martingale'], default='none')
+    parser.add_argument('--soros-levels', type=int, default=2)
+    parser.add_argument('--martingale-multiplier', type=float, default=2.0)
+    parser.add_argument('--stop-loss', type=float, default=10.0)
+    parser.add_argument('--take-profit', type=float, default=5.0)
+    parser.add_argument('--output', help="Grava o resultado por ativo e estratégia em CSV")
+    parser.add_argument('--vectorized', action='store_true', help="Usa generate_signals (sinais da série inteira de uma vez)")
+    parser.add_argument('--check-vectorized', type=int, metavar='VELAS',
+                        help="Só confere generate_signals contra check_signal nas últimas VELAS velas de cada ativo")
+    args = parser.parse_args()
+
+    start, end = parse_date(args.start), parse_date(args.end)
+    if args.check_vectorized:
+        sys.exit(0 if check_vectorized(args.data, args.check_vectorized, args.assets, args.strategies, start, end) else 1)
+
+    settings = {
+        'payout': args.payout, 'balance': args.balance,
+        'stake_mode': args.stake_mode, 'stake_value': args.stake_value,
+        'capital_strategy': args.capital_strategy, 'soros_levels': args.soros_levels,
+        'martingale_multiplier': args.martingale_multiplier,
+        'stop_loss': args.stop_loss, 'take_profit': args.take_profit,
+    }
+    started = datetime.now(timezone.utc)
+    results = run_backtest(args.data, settings, args.assets, args.strategies, args.workers, args.vectorized, start, end)
+    print_report(results)
+    print(f"Tempo total: {(datetime.now(timezone.utc) - started).total_seconds():.1f}s")
+
+    if args.output:
+        rows = report_rows(results)
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ['ativo'])
+            writer.writeheader(); writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/bench_botcore.py - Vazão do BotCore contra a corretora simulada, sem conta real
+#
+# Uso: python benchmarks/bench_botcore.py [--assets 10 100 300] [--cycles 3] [--latency 0.0]
+#                                         [--candle-latency 0.05] [--parallel 4] [--store candle_store]
+#                                         [--hours 24] [--replay sessao.jsonl.gz]
+#
+# Cada ciclo é o que o loop do BotCore faz a cada minuto: descoberta de ativos, busca paralela
+# das velas de todos os ativos e avaliação das estratégias (com envio das ordens ao simulador).
+# Com --hours, roda o BotCore.run de verdade por esse período com um SimulatedClock; com --replay,
+# reproduz uma sessão gravada (record_file) do mesmo jeito, o mais rápido possível.
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_core import BotCore
+from candle_store import CandleStore
+from candles import enable_copy_on_write
+from clock import SimulatedClock, set_clock
+from iq_option_connection import IQOptionConnection
+from order_tracker import OrderTracker
+from recording import ReplayBackend
+from risk_management import RiskManagement
+from simulated_broker import SimulatedBroker, synthetic_assets
+
+
+# Segunda-feira 00:00 UTC: o robô fica no modo REGULAR o dia todo
+SESSION_START = 1704672000
+
+
+def bench_settings(assets, parallel):
+    return {
+        'account_type': 'PRACTICE', 'preferred_assets': assets, 'max_parallel_requests': parallel,
+        'concurrent_positions': True, 'max_open_positions': len(assets), 'candle_store_dir': None,
+        'metadata_cache_file': None,
+        'stake_mode': 'fixed', 'stake_value': 1.0, 'stop_loss': 1e9, 'take_profit': 1e9,
+        'trade_history_file': None,
+    }
+
+
+def make_bot(assets, broker, parallel):
+    settings = bench_settings(assets, parallel)
+    bot = BotCore(settings, queue.Queue(), queue.Queue(), threading.Event())
+    iq = IQOptionConnection(None, None, broker)
+    iq.connect()
+    risk_manager = RiskManagement(iq.api.get_balance(), settings)
+    bot.order_tracker = OrderTracker(iq, lambda order, profit: bot.on_order_settled(order, profit, risk_manager))
+    return bot, iq, risk_manager
+
+
+def run_cycles(bot, iq, risk_manager, strategies, cycles, parallel):
+    """Roda `cycles` ciclos completos e devolve os tempos (descoberta, velas, avaliação) e as ordens enviadas."""
+    timings = {'descoberta': 0.0, 'velas': 0.0, 'avaliacao': 0.0}
+    orders = 0
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="CandleFetch") as fetch_pool:
+        for _ in range(cycles):
+            # Cada ciclo reavalia a mesma vela, como se fosse um minuto novo
+            bot.last_candle_times.clear()
+            started = time.perf_counter()
+            active_assets = bot.find_active_assets('REGULAR', iq)
+            fetched = time.perf_counter()
+            snapshot = bot.fetch_candles_snapshot(iq, active_assets, strategies, fetch_pool)
+            evaluated = time.perf_counter()
+            for asset in active_assets:
+                df_m1, df_m5 = snapshot[asset['name']]
+                orders += bot.evaluate_asset(iq, asset, df_m1, strategies, risk_manager, df_m5)
+            finished = time.perf_counter()
+            timings['descoberta'] += fetched - started
+            timings['velas'] += evaluated - fetched
+            timings['avaliacao'] += finished - evaluated
+    return timings, orders
+
+
+def run_session(settings, start, seconds):
+    """Roda BotCore.run com um SimulatedClock de `start` até `start + seconds`. Retorna (segundos reais, bot)."""
+    clock = SimulatedClock(start)
+    previous = set_clock(clock)
+    try:
+        stop_event = threading.Event()
+        clock.stop_at(start + seconds, stop_event)
+        bot = BotCore(settings, queue.Queue(), queue.Queue(), stop_event)
+        started = time.perf_counter()
+        bot.run()
+        return time.perf_counter() - started, bot
+    finally:
+        set_clock(previous)
+
+
+def latency_option(args):
+    return args.latency if args.candle_latency is None else {'get_candles': args.candle_latency}
+
+
+def main():
+    enable_copy_on_write()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latência simulada por chamada à API (s)")
+    parser.add_argument('--candle-latency', type=float, default=None, help="Latência só de get_candles (s)")
+    parser.add_argument('--parallel', type=int, default=4, help="max_parallel_requests do BotCore")
+    parser.add_argument('--store', help="Usa o histórico gravado deste CandleStore em vez de velas sintéticas")
+    parser.add_argument('--hours', type=float, help="Roda o loop completo do BotCore por H horas simuladas")
+    parser.add_argument('--replay', help="Reproduz uma sessão gravada com o loop completo do BotCore")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    if args.replay:
+        backend = ReplayBackend(args.replay, 'fast')
+        # Os ativos são os que têm velas na gravação
+        assets = sorted({asset for asset, _ in backend.candles})
+        settings = dict(bench_settings(assets, args.parallel), backend=backend)
+        elapsed, bot = run_session(settings, backend.start_time, backend.end_time - backend.start_time + 60)
+        print(f"replay de {(backend.end_time - backend.start_time) / 60:.0f} min em {elapsed:.1f}s | "
+              f"{bot.order_tracker.open_count()} ordem(ns) sem resultado")
+        return
+
+    if args.hours:
+        print(f"{'ativos':>7} | {'horas':>5} | {'tempo real (s)':>14} | {'velas/s':>9} | {'ordens':>6} | {'saldo':>10}")
+        for count in args.assets:
+            store = CandleStore(args.store) if args.store else None
+            assets = store.assets()[:count] if store else synthetic_assets(count)
+            broker = SimulatedBroker(assets, store=store, latency=latency_option(args))
+            elapsed, bot = run_session(dict(bench_settings(assets, args.parallel), backend=broker), SESSION_START, args.hours * 3600)
+            evaluated = len(assets) * args.hours * 60
+            print(f"{len(assets):>7} | {args.hours:>5.1f} | {elapsed:>14.1f} | {evaluated / elapsed:>9.1f} | "
+                  f"{len(broker.orders):>6} | {broker.get_balance():>10.2f}")
+        return
+
+    latency = latency_option(args)
+    print(f"{'ativos':>7} | {'descoberta (s)':>14} | {'velas (s)':>9} | {'avaliação (s)':>13} | {'ativos/s':>9} | {'ordens':>6}")
+    for count in args.assets:
+        store = CandleStore(args.store) if args.store else None
+        assets = store.assets()[:count] if store else synthetic_assets(count)
+        broker = SimulatedBroker(assets, store=store, latency=latency)
+        bot, iq, risk_manager = make_bot(assets, broker, args.parallel)
+        strategies = bot.load_strategies()
+
+        timings, orders = run_cycles(bot, iq, risk_manager, strategies, args.cycles, args.parallel)
+        total = sum(timings.values())
+        print(f"{len(assets):>7} | {timings['descoberta'] / args.cycles:>14.4f} | {timings['velas'] / args.cycles:>9.4f} | "
+              f"{timings['avaliacao'] / args.cycles:>13.4f} | {len(assets) * args.cycles / total:>9.1f} | {orders:>6}")
+
+
+if __name__ == '__main__':
+    main()
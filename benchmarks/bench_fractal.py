@@ -0,0 +1,99 @@
+# benchmarks/bench_fractal.py - Fractais vetorizados vs. o laço original da strategy_fibo_ema_rsi
+#
+# Uso: python benchmarks/bench_fractal.py [--sizes 110 10000 1000000] [--legacy-max N]
+#
+# Só mede o tempo; a equivalência com o laço original é conferida em test_indicators.py.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicators import find_fractals, find_last_swing
+
+
+# --- Implementação original (referência) ---
+
+def legacy_manual_fractal(df):
+    df['FRACTALS_5_high'] = None
+    df['FRACTALS_5_low'] = None
+    for i in range(2, len(df) - 2):
+        is_high_fractal = (df['high'].iloc[i] > df['high'].iloc[i-2] and df['high'].iloc[i] > df['high'].iloc[i-1] and
+                           df['high'].iloc[i] > df['high'].iloc[i+1] and df['high'].iloc[i] > df['high'].iloc[i+2])
+        if is_high_fractal:
+            df.loc[df.index[i], 'FRACTALS_5_high'] = df['high'].iloc[i]
+
+        is_low_fractal = (df['low'].iloc[i] < df['low'].iloc[i-2] and df['low'].iloc[i] < df['low'].iloc[i-1] and
+                          df['low'].iloc[i] < df['low'].iloc[i+1] and df['low'].iloc[i] < df['low'].iloc[i+2])
+        if is_low_fractal:
+            df.loc[df.index[i], 'FRACTALS_5_low'] = df['low'].iloc[i]
+    return df
+
+
+def legacy_find_last_swing(df, trend_type):
+    fractal_highs = df[df['FRACTALS_5_high'].notna()]
+    fractal_lows = df[df['FRACTALS_5_low'].notna()]
+    if len(fractal_lows) < 1 or len(fractal_highs) < 1: return None, None
+    if trend_type == 'bullish':
+        last_high_time = fractal_highs.index[-1]
+        relevant_lows = fractal_lows[fractal_lows.index < last_high_time]
+        if relevant_lows.empty: return None, None
+        return df.loc[relevant_lows.index[-1], 'low'], df.loc[last_high_time, 'high']
+    last_low_time = fractal_lows.index[-1]
+    relevant_highs = fractal_highs[fractal_highs.index < last_low_time]
+    if relevant_highs.empty: return None, None
+    return df.loc[last_low_time, 'low'], df.loc[relevant_highs.index[-1], 'high']
+
+
+def make_candles(n, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    spread = rng.uniform(0, 0.0004, (2, n))
+    index = pd.date_range('2024-01-01', periods=n, freq='min', name='from')
+    return pd.DataFrame({'high': close + spread[0], 'low': close - spread[1], 'close': close}, index=index)
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[110, 10_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=1_000_000,
+                        help="Não roda o laço original acima deste número de velas")
+    args = parser.parse_args()
+
+    print(f"{'velas':>10} | {'original (s)':>12} | {'vetorizado (s)':>14} | {'ganho':>8}")
+    for n in args.sizes:
+        df = make_candles(n)
+        repeat = 5 if n <= 10_000 else 1
+
+        def vectorized():
+            highs, lows = find_fractals(df['high'].to_numpy(), df['low'].to_numpy())
+            return highs, lows, find_last_swing(highs, lows, 'bullish'), find_last_swing(highs, lows, 'bearish')
+
+        new_time, _ = timed(vectorized, repeat)
+        if n > args.legacy_max:
+            print(f"{n:>10} | {'-':>12} | {new_time:>14.6f} | {'-':>8}")
+            continue
+
+        def legacy():
+            out = legacy_manual_fractal(df.copy())
+            return out, legacy_find_last_swing(out, 'bullish'), legacy_find_last_swing(out, 'bearish')
+
+        old_time, _ = timed(legacy, 1)
+        print(f"{n:>10} | {old_time:>12.6f} | {new_time:>14.6f} | {old_time / new_time:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 # bot_core.py - Versão Final com Correção de Sufixo '-op'
 
-import time
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import os
 import sys
@@ -10,24 +10,76 @@ import sys
 try:
     from iq_option_connection import IQOptionConnection
     from risk_management import RiskManagement
+    from indicators import IndicatorEngine, IndicatorStateBank
+    from candles import enable_copy_on_write, read_only_view
+    from order_tracker import OrderTracker
+    from candle_store import CandleStore
+    from metadata_cache import MetadataCache
+    import simulated_broker
+    from recording import ReplayBackend
+    from clock import get_clock
+    from app_paths import app_data_path
+    from asset_resolver import PreferredAssets
 except ImportError as e:
     logging.critical(f"ERRO CRÍTICO: Não foi possível importar módulos essenciais: {e}")
     raise
 
 class BotCore:
+    PREFERRED_ASSETS = ["EURUSD", "EURJPY", "GBPUSD", "AUDCAD", "USDJPY", "EURGBP", "USDCAD"]
+    OTC_ASSETS = [asset + "-OTC" for asset in PREFERRED_ASSETS]
+
     def __init__(self, settings, log_queue, update_queue, stop_event):
         self.settings = settings
         self.email = settings.get('email')
         self.password = settings.get('password')
         self.account_type = settings.get('account_type')
+        # Backend da API: None = IQ Option; 'simulated' = SimulatedBroker montado com settings['simulated_broker'];
+        # 'replay' = ReplayBackend de settings['replay_file'] (settings['replay_speed']: 'fast' ou 'recorded');
+        # ou qualquer objeto com a interface da IQ_Option
+        self.backend = settings.get('backend')
+        # Grava todas as chamadas à API neste arquivo, para reproduzir a sessão com o backend 'replay'
+        self.record_file = settings.get('record_file')
         self.log_queue = log_queue
         self.update_queue = update_queue
         self.stop_event = stop_event
-        self.PREFERRED_ASSETS = ["EURUSD", "EURJPY", "GBPUSD", "AUDCAD", "USDJPY", "EURGBP", "USDCAD"]
-        self.OTC_ASSETS = [asset + "-OTC" for asset in self.PREFERRED_ASSETS]
+        # Relógio do robô (clock.set_clock troca por um SimulatedClock antes de criar o BotCore)
+        self.clock = get_clock()
+        # Lista de ativos configurável (ex: centenas de ativos do simulador); os OTC seguem a mesma lista
+        if settings.get('preferred_assets'):
+            self.PREFERRED_ASSETS = list(settings['preferred_assets'])
+            self.OTC_ASSETS = [asset + "-OTC" for asset in self.PREFERRED_ASSETS]
+        # Consulta do par preferido de cada nome da API na descoberta de ativos
+        self.preferred_lookup = PreferredAssets(self.PREFERRED_ASSETS)
         self.TIMEFRAME = 60
         self.EXPIRATION_TIME = 1
         self.last_candle_times = {}
+        # Modo streaming: reage ao fechamento de cada vela pelo feed em tempo real
+        self.streaming_mode = settings.get('streaming_mode', False)
+        if self.streaming_mode and self.clock.simulated:
+            # O CandleStream observa o feed em tempo real; com relógio simulado vale o modo por minuto
+            logging.warning("Modo streaming não funciona com relógio simulado; usando o modo por minuto.")
+            self.streaming_mode = False
+        # A disponibilidade dos ativos é atualizada em segundo plano a cada N segundos (get_all_open_time é lenta)
+        self.asset_refresh_seconds = max(1, int(settings.get('asset_refresh_seconds', 300)))
+        # Máximo de requisições de velas simultâneas na busca paralela por ativo. Com a IQ_Option as
+        # chamadas à API são serializadas (IQOptionConnection._fetch_candles: a biblioteca não separa as
+        # respostas por pedido); o paralelismo fica para o cache, o histórico local e os backends locais.
+        self.max_parallel_requests = max(1, int(settings.get('max_parallel_requests', 4)))
+        # Estados incrementais de indicadores por ativo, mantidos entre ciclos (IndicatorEngine.latest)
+        self.indicator_states = IndicatorStateBank()
+        # Posições abertas simultâneas (liquidadas em segundo plano pelo OrderTracker).
+        # Com 'concurrent_positions' o RiskManagement mantém uma escada por ativo, então o padrão sobe.
+        self.concurrent_positions = settings.get('concurrent_positions', False)
+        self.max_open_positions = max(1, int(settings.get('max_open_positions', 5 if self.concurrent_positions else 1)))
+        self.order_tracker = None
+        self.risk_lock = threading.Lock()
+        # Histórico local de velas M1 (CandleStore): semeia o cache ao iniciar e guarda as velas fechadas.
+        # None desativa. Os padrões ficam na pasta do aplicativo (app_paths), não na pasta de trabalho.
+        self.candle_store_dir = settings.get('candle_store_dir', app_data_path('candle_store'))
+        # Cache dos opcodes e da disponibilidade dos ativos entre sessões (None desativa).
+        # Válido por 'metadata_cache_max_age' segundos; revalidado em segundo plano ao iniciar.
+        self.metadata_cache_file = settings.get('metadata_cache_file', app_data_path('metadata_cache.json'))
+        self.metadata_cache_max_age = settings.get('metadata_cache_max_age', 3600)
 
     def log(self, message):
         logging.info(message)
@@ -63,53 +115,61 @@ class BotCore:
         return strategies
 
     def get_market_type(self):
-        return 'OTC' if datetime.now().weekday() >= 5 else 'REGULAR'
+        return 'OTC' if self.clock.now().weekday() >= 5 else 'REGULAR'
 
     def find_active_assets(self, market_type, iq_conn):
-        iq_conn.update_open_assets()
+        # Snapshot mantido pela atualização em segundo plano: não espera pela API
+        snapshot = iq_conn.get_open_assets()
         active_assets = []
         self.log(f"--- MODO {market_type}: Buscando ativos ---")
 
-        all_open_binary = iq_conn.open_binary_assets
+        # Índice dos nomes abertos (par base, variante, suporte), remontado só quando os nomes mudam
+        resolver = snapshot.resolver
 
         if market_type == 'REGULAR':
-            for api_asset_name in all_open_binary.keys():
-                if '-OTC' in api_asset_name:
-                    continue
-
-                for preferred_asset in self.PREFERRED_ASSETS:
-                    if api_asset_name.startswith(preferred_asset):
-                        is_tradable = iq_conn.is_asset_available_for_trading(api_asset_name, 'binary')
-                        is_supported = iq_conn.is_asset_supported_by_library(preferred_asset)
-                        
-                        if is_tradable and is_supported:
-                            active_assets.append({'name': api_asset_name, 'type': 'binary'})
-                            self.log(f"✓ Ativo Encontrado: {api_asset_name} (Base p/ velas: {preferred_asset})")
-                            break 
+            for api_asset_name, info in resolver.assets.items():
+                if info.otc: continue
+                preferred_asset = self.preferred_lookup.match(info)
+                if preferred_asset is None: continue
+
+                is_tradable = iq_conn.is_asset_available_for_trading(api_asset_name, 'binary')
+                is_supported = resolver.is_supported(preferred_asset)
+
+                if is_tradable and is_supported:
+                    active_assets.append({'name': api_asset_name, 'type': 'binary'})
+                    self.log(f"✓ Ativo Encontrado: {api_asset_name} (Base p/ velas: {preferred_asset})")
         
         else: # market_type == 'OTC'
             for asset in self.OTC_ASSETS:
-                if iq_conn.is_asset_available_for_trading(asset, 'binary') and iq_conn.is_asset_supported_by_library(asset):
+                if iq_conn.is_asset_available_for_trading(asset, 'binary') and resolver.is_supported(asset):
                     active_assets.append({'name': asset, 'type': 'binary'})
                     self.log(f"✓ Ativo Encontrado: {asset}")
 
         if not active_assets and market_type == 'REGULAR':
             self.log("Nenhum ativo REGULAR preferido encontrado. PLANO C: Buscando por OTC disponíveis...")
-            for asset in all_open_binary.keys():
-                if '-OTC' in asset:
-                    if iq_conn.is_asset_available_for_trading(asset, 'binary'):
-                        active_assets.append({'name': asset, 'type': 'binary'})
-                        self.log(f"✓ Fallback OTC: {asset} (Binary)")
-                        if len(active_assets) >= 5: break
+            for asset in resolver.otc:
+                if iq_conn.is_asset_available_for_trading(asset, 'binary'):
+                    active_assets.append({'name': asset, 'type': 'binary'})
+                    self.log(f"✓ Fallback OTC: {asset} (Binary)")
+                    if len(active_assets) >= 5: break
 
         return active_assets
 
     def run(self):
         self.log("Iniciando o núcleo do robô...")
-        iq = IQOptionConnection(self.email, self.password)
+        # As estratégias recebem visões rasas das velas; o Copy-on-Write garante que não alterem o cache
+        enable_copy_on_write()
+        backend = self.backend
+        if backend == 'simulated': backend = simulated_broker.from_settings(self.settings.get('simulated_broker'))
+        elif backend == 'replay': backend = ReplayBackend(self.settings['replay_file'], self.settings.get('replay_speed', 'fast'))
+        metadata_cache = MetadataCache(self.metadata_cache_file, self.metadata_cache_max_age) if self.metadata_cache_file else None
+        iq = IQOptionConnection(self.email, self.password, backend, self.record_file, metadata_cache)
         if not iq.connect():
             self.log("ERRO: Falha na conexão."); self.update_ui({'status': 'Erro de Conexão'}); return
 
+        if self.candle_store_dir:
+            iq.attach_candle_store(CandleStore(self.candle_store_dir, self.TIMEFRAME))
+
         iq.api.change_balance(self.account_type)
         balance = iq.api.get_balance()
         if balance is None:
@@ -122,72 +182,153 @@ class BotCore:
         if not strategies:
             self.log("ERRO: Nenhuma estratégia carregada."); self.update_ui({'status': 'Erro de Estratégia'}); return
 
+        self.order_tracker = OrderTracker(iq, lambda order, profit: self.on_order_settled(order, profit, risk_manager))
+        iq.start_asset_refresh(self.asset_refresh_seconds)
+        fetch_pool = ThreadPoolExecutor(max_workers=self.max_parallel_requests, thread_name_prefix="CandleFetch")
         self.update_ui({'status': 'Rodando'})
         while not self.stop_event.is_set():
-            if risk_manager.check_stop_loss() or risk_manager.check_take_profit():
+            with self.risk_lock:
+                target_reached = risk_manager.check_stop_loss() or risk_manager.check_take_profit()
+            if target_reached:
                 self.log(f"Meta de P/L atingida. Encerrando."); break
 
             market_type = self.get_market_type()
             active_assets = self.find_active_assets(market_type, iq)
 
             if not active_assets:
-                self.log("Nenhum ativo operacional encontrado. Aguardando 1 minuto."); self.stop_event.wait(60); continue
+                self.log("Nenhum ativo operacional encontrado. Aguardando 1 minuto."); self.clock.wait(self.stop_event, 60); continue
+
+            if self.streaming_mode:
+                self.run_streaming_cycle(iq, active_assets, strategies, risk_manager)
+                continue
 
-            self.log(f"Monitorando: {[a['name'] for a in active_assets]}"); now = datetime.now()
+            self.log(f"Monitorando: {[a['name'] for a in active_assets]}"); now = self.clock.now()
             wait_seconds = 60 - now.second
-            if wait_seconds > 0: self.stop_event.wait(wait_seconds)
+            if wait_seconds > 0: self.clock.wait(self.stop_event, wait_seconds)
             
             if self.stop_event.is_set(): break
 
+            snapshot = self.fetch_candles_snapshot(iq, active_assets, strategies, fetch_pool)
             for asset in active_assets:
                 if self.stop_event.is_set(): break
                 
-                df_m1 = iq.get_candles(asset['name'], self.TIMEFRAME, 110, time.time())
-                if df_m1 is None or len(df_m1) < 100:
-                    self.log(f"Dados insuficientes para {asset['name']} em M1. Pulando."); continue
-
-                current_candle_timestamp = df_m1.index[-1]
-                if asset['name'] not in self.last_candle_times or current_candle_timestamp > self.last_candle_times.get(asset['name'], 0):
-                    self.last_candle_times[asset['name']] = current_candle_timestamp
-                    signal_found = False
-
-                    for name, strategy_func in strategies.items():
-                        signal = None
-                        try:
-                            if 'df_m5' in strategy_func.__code__.co_varnames:
-                                df_m5 = iq.get_candles(asset['name'], 300, 50, time.time())
-                                if df_m5 is not None: signal = strategy_func(df_m1.copy(), df_m5.copy())
-                            else: signal = strategy_func(df_m1.copy())
-                        except Exception as e: self.log(f"Erro na estratégia {name} para {asset['name']}: {e}")
-
-                        if signal:
-                            stake = risk_manager.calculate_stake()
-                            if stake <= 0: self.log("Valor de entrada é zero. Nenhuma ordem será aberta."); continue
-
-                            self.log(f"SINAL {signal} em {asset['name']} por {name} | Entrada: ${stake:.2f}")
-                            order_id = iq.buy_binary(stake, asset['name'], signal.lower(), self.EXPIRATION_TIME)
-                            if order_id:
-                                self.log(f"Ordem {order_id} enviada. Aguardando resultado...")
-                                self.update_ui({'status': f"Operando em {asset['name']}"})
-                                profit = iq.check_win(order_id)
-                                
-                                # --- CORREÇÃO APLICADA ---
-                                # Chamando o método correto para registrar o resultado do trade e atualizar o estado do gerenciador de risco.
-                                risk_manager.register_trade_result(profit)
-                                # --- FIM DA CORREÇÃO ---
-                                
-                                result_msg = "WIN" if profit > 0 else "LOSS" if profit < 0 else "DRAW"
-                                self.log(f"Resultado: {result_msg} | Valor: ${profit:.2f}. P/L Dia: ${risk_manager.daily_profit_loss:.2f}")
-                                
-                                # Esta chamada agora enviará os dados corretos e atualizados para a GUI
-                                self.update_ui({
-                                    'pnl': f"${risk_manager.daily_profit_loss:.2f}",
-                                    'wins': risk_manager.wins,
-                                    'losses': risk_manager.losses,
-                                    'assertiveness': f"{risk_manager.get_assertiveness():.2f}%",
-                                    'balance': f"${risk_manager.current_balance:.2f}"
-                                })
-                                signal_found = True; self.stop_event.wait(5); break
-                    if signal_found: break
-
-        self.log("Núcleo do robô finalizado."); self.update_ui({'status': 'Parado'})
\ No newline at end of file
+                df_m1, df_m5 = snapshot[asset['name']]
+                self.evaluate_asset(iq, asset, df_m1, strategies, risk_manager, df_m5)
+
+        fetch_pool.shutdown(wait=False)
+        iq.stop_asset_refresh()
+        if self.streaming_mode: iq.stop_candle_stream()
+        if iq.candle_store is not None: iq.candle_store.flush()
+        if self.order_tracker.open_count():
+            self.log(f"Aguardando o resultado de {self.order_tracker.open_count()} ordem(ns) aberta(s)...")
+            self.order_tracker.wait_all(self.EXPIRATION_TIME * 60 + 30)
+        iq.stop_recording()
+        self.log("Núcleo do robô finalizado."); self.update_ui({'status': 'Parado'})
+
+    def fetch_candles_snapshot(self, iq, active_assets, strategies, fetch_pool):
+        """
+        Busca as velas de todos os ativos em paralelo (limitado por max_parallel_requests)
+        e só retorna quando o snapshot estiver completo: {ativo: (df_m1, df_m5)}.
+        """
+        needs_m5 = any('df_m5' in func.__code__.co_varnames for func in strategies.values())
+
+        def fetch(asset_name):
+            now = self.clock.time()
+            df_m1 = iq.get_candles(asset_name, self.TIMEFRAME, 110, now)
+            df_m5 = iq.get_timeframe_candles(asset_name, 300, 50, now) if needs_m5 else None
+            return df_m1, df_m5
+
+        futures = {a['name']: fetch_pool.submit(fetch, a['name']) for a in active_assets}
+        snapshot = {}
+        for asset_name, future in futures.items():
+            try:
+                snapshot[asset_name] = future.result()
+            except Exception as e:
+                self.log(f"Erro ao buscar velas de {asset_name}: {e}")
+                snapshot[asset_name] = (None, None)
+        return snapshot
+
+    def run_streaming_cycle(self, iq, active_assets, strategies, risk_manager):
+        """
+        Modo streaming: em vez de dormir até a virada do minuto e buscar ativo por ativo,
+        reage ao evento de vela fechada de cada ativo durante um período de vela.
+        """
+        assets_by_name = {a['name']: a for a in active_assets}
+        iq.start_candle_stream(list(assets_by_name), self.TIMEFRAME)
+        self.log(f"Monitorando (stream): {list(assets_by_name)}")
+
+        deadline = self.clock.time() + self.TIMEFRAME
+        while not self.stop_event.is_set():
+            remaining = deadline - self.clock.time()
+            if remaining <= 0: break
+            asset_name = iq.wait_closed_candle(timeout=min(remaining, 1.0))
+            if asset_name is None or asset_name not in assets_by_name: continue
+
+            df_m1 = iq.get_streamed_candles(asset_name, self.TIMEFRAME, 110, self.clock.time())
+            self.evaluate_asset(iq, assets_by_name[asset_name], df_m1, strategies, risk_manager)
+
+    def on_order_settled(self, order, profit, risk_manager):
+        """Chamado pelo OrderTracker (em outra thread) quando uma ordem é liquidada."""
+        with self.risk_lock:
+            risk_manager.register_trade_result(profit, order['asset'], order['stake'])
+            pnl, wins, losses = risk_manager.daily_profit_loss, risk_manager.wins, risk_manager.losses
+            assertiveness, balance = risk_manager.get_assertiveness(), risk_manager.current_balance
+
+        result_msg = "WIN" if profit > 0 else "LOSS" if profit < 0 else "DRAW"
+        self.log(f"Resultado {order['asset']} ({order['order_id']}): {result_msg} | Valor: ${profit:.2f}. P/L Dia: ${pnl:.2f}")
+        
+        # Esta chamada agora enviará os dados corretos e atualizados para a GUI
+        update = {
+            'pnl': f"${pnl:.2f}",
+            'wins': wins,
+            'losses': losses,
+            'assertiveness': f"{assertiveness:.2f}%",
+            'balance': f"${balance:.2f}"
+        }
+        if not self.order_tracker.open_count() and not self.stop_event.is_set(): update['status'] = 'Rodando'
+        self.update_ui(update)
+
+    def evaluate_asset(self, iq, asset, df_m1, strategies, risk_manager, df_m5=None):
+        """Roda as estratégias sobre a vela mais recente do ativo. Retorna True se uma ordem foi operada."""
+        if df_m1 is None or len(df_m1) < 100:
+            self.log(f"Dados insuficientes para {asset['name']} em M1. Pulando."); return False
+
+        if self.order_tracker.has_open_position(asset['name']) or self.order_tracker.open_count() >= self.max_open_positions:
+            return False
+
+        current_candle_timestamp = df_m1.index[-1]
+        if asset['name'] in self.last_candle_times and current_candle_timestamp <= self.last_candle_times[asset['name']]:
+            return False
+        self.last_candle_times[asset['name']] = current_candle_timestamp
+
+        m5_loaded = df_m5 is not None
+        # Um motor por ativo e vela: indicadores iguais são calculados uma vez para todas as estratégias
+        indicators = IndicatorEngine(df_m1, asset=asset['name'], states=self.indicator_states)
+        for name, strategy_func in strategies.items():
+            signal = None
+            try:
+                kwargs = {'indicators': indicators} if 'indicators' in strategy_func.__code__.co_varnames else {}
+                if 'df_m5' in strategy_func.__code__.co_varnames:
+                    # M5 é obtido no máximo uma vez por ativo por ciclo, de preferência derivado do M1
+                    if not m5_loaded: df_m5 = iq.get_timeframe_candles(asset['name'], 300, 50, self.clock.time()); m5_loaded = True
+                    if df_m5 is not None: signal = strategy_func(read_only_view(df_m1), read_only_view(df_m5), **kwargs)
+                else: signal = strategy_func(read_only_view(df_m1), **kwargs)
+            except Exception as e: self.log(f"Erro na estratégia {name} para {asset['name']}: {e}")
+
+            if signal:
+                with self.risk_lock:
+                    # A entrada fica reservada até a liquidação, contando como exposição aberta
+                    stake = risk_manager.reserve_stake(asset['name'])
+                if stake <= 0: self.log("Valor de entrada é zero ou excederia o stop loss. Nenhuma ordem será aberta."); continue
+
+                self.log(f"SINAL {signal} em {asset['name']} por {name} | Entrada: ${stake:.2f}")
+                order_id = iq.buy_binary(stake, asset['name'], signal.lower(), self.EXPIRATION_TIME)
+                if order_id:
+                    # A liquidação corre em segundo plano; o loop segue avaliando os outros ativos
+                    self.order_tracker.submit(order_id, asset['name'], stake, signal, name, self.EXPIRATION_TIME)
+                    self.log(f"Ordem {order_id} enviada. Resultado será registrado ao expirar.")
+                    self.update_ui({'status': f"Operando em {asset['name']}"})
+                    return True
+                with self.risk_lock:
+                    risk_manager.release_stake(asset['name'], stake)
+        return False
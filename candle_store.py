@@ -0,0 +1,174 @@
+# candle_store.py - Armazenamento local de velas por ativo e dia, mapeado em memória
+
+import calendar
+import collections
+import os
+import threading
+import time
+
+import numpy as np
+
+from candles import CANDLE_FIELDS
+
+SECONDS_PER_DAY = 86400
+
+
+class CandlePartition:
+    """
+    Um dia de velas de um ativo em um arquivo binário de tamanho fixo, com uma posição por vela do
+    dia: os timestamps (int64, 0 = posição vazia) seguidos do bloco de valores (float64, 5 x posições,
+    na ordem de CANDLE_FIELDS), no mesmo layout em colunas do CandleBuffer. Gravar uma vela é escrever
+    na posição dela; não há reescrita do arquivo, nem quando o histórico é completado fora de ordem.
+    """
+
+    def __init__(self, path, slots, writable=False):
+        self.path = path
+        self.slots = slots
+        self.writable = writable
+        mode = 'r+' if writable else 'r'
+        self.timestamps = np.memmap(path, dtype=np.int64, mode=mode, shape=(slots,))
+        self.values = np.memmap(path, dtype=np.float64, mode=mode, offset=slots * 8,
+                                shape=(len(CANDLE_FIELDS), slots))
+
+    @staticmethod
+    def create(path, slots):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.truncate(slots * 8 * (1 + len(CANDLE_FIELDS)))
+
+    def flush(self):
+        self.timestamps.flush()
+        self.values.flush()
+
+
+class CandleStore:
+    """
+    Histórico de velas em disco: <pasta>/<ATIVO>/<AAAA-MM-DD>.bin, um CandlePartition por dia (UTC).
+    Leituras por intervalo só mapeiam os dias pedidos. Os arrays retornados são somente leitura;
+    só a leitura de um único dia sem lacunas é uma visão do arquivo mapeado, sem cópia. Trechos de
+    vários dias (ou com lacunas) são copiados ao juntar os pedaços.
+    """
+
+    def __init__(self, root, interval=60, max_open_partitions=256):
+        self.root = root
+        self.interval = interval
+        self.slots = SECONDS_PER_DAY // interval
+        self.max_open_partitions = max_open_partitions
+        self._partitions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, asset, day):
+        return os.path.join(self.root, asset, time.strftime('%Y-%m-%d', time.gmtime(day * SECONDS_PER_DAY)) + '.bin')
+
+    def _partition(self, asset, day, writable=False):
+        """
+        Partição do dia, mapeada somente leitura; com `writable` (só na gravação) o arquivo é criado
+        se preciso e mapeado para escrita, reabrindo uma partição já aberta para leitura.
+        """
+        key = (asset, day)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None and (partition.writable or not writable):
+                self._partitions.move_to_end(key)
+                return partition
+
+            path = self._path(asset, day)
+            if not os.path.exists(path):
+                if not writable: return None
+                CandlePartition.create(path, self.slots)
+            partition = CandlePartition(path, self.slots, writable=writable)
+            self._partitions[key] = partition
+            while len(self._partitions) > self.max_open_partitions:
+                evicted = self._partitions.popitem(last=False)[1]
+                if evicted.writable: evicted.flush()
+            return partition
+
+    def assets(self):
+        if not os.path.isdir(self.root): return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def days(self, asset):
+        """Dias (desde a época, UTC) com arquivo gravado para o ativo, em ordem."""
+        folder = os.path.join(self.root, asset)
+        if not os.path.isdir(folder): return []
+        days = []
+        for name in os.listdir(folder):
+            if not name.endswith('.bin'): continue
+            days.append(calendar.timegm(time.strptime(name[:-4], '%Y-%m-%d')) // SECONDS_PER_DAY)
+        return sorted(days)
+
+    def write(self, asset, timestamps, values):
+        """Grava velas fechadas (timestamps em segundos, valores 5 x n). Velas já gravadas são substituídas."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(timestamps): return
+        days = timestamps // SECONDS_PER_DAY
+        for day in np.unique(days):
+            selected = days == day
+            partition = self._partition(asset, int(day), writable=True)
+            slots = (timestamps[selected] - day * SECONDS_PER_DAY) // self.interval
+            partition.timestamps[slots] = timestamps[selected]
+            partition.values[:, slots] = values[:, selected]
+
+    def flush(self):
+        with self._lock:
+            for partition in self._partitions.values():
+                if partition.writable: partition.flush()
+
+    def _day_slice(self, asset, day, start=None, end=None):
+        """Velas gravadas de um dia com start <= from < end: visões do arquivo mapeado, ou None se não houver."""
+        partition = self._partition(asset, day)
+        if partition is None: return None
+        day_start = day * SECONDS_PER_DAY
+        first = 0 if start is None else max(0, -((day_start - start) // self.interval))
+        last = self.slots if end is None else min(self.slots, -((day_start - end) // self.interval))
+        timestamps, values = partition.timestamps[first:last], partition.values[:, first:last]
+        filled = timestamps != 0
+        if not filled.all():
+            timestamps, values = timestamps[filled], values[:, filled]
+        return (timestamps, values) if len(timestamps) else None
+
+    def read(self, asset, start=None, end=None):
+        """
+        Velas do ativo com start <= from < end (segundos; None = sem limite): (timestamps, valores 5 x n).
+        Um trecho contínuo de um só dia volta como visão do arquivo; mais de um dia é concatenado
+        numa cópia (memória proporcional ao período, não zero-copy).
+        """
+        pieces = []
+        for day in self.days(asset):
+            day_start = day * SECONDS_PER_DAY
+            if end is not None and day_start >= end: break
+            if start is not None and day_start + SECONDS_PER_DAY <= start: continue
+            piece = self._day_slice(asset, day, start, end)
+            if piece is not None: pieces.append(piece)
+        return self._join(pieces)
+
+    def tail(self, asset, count, end=None):
+        """As últimas `count` velas do ativo com from < end, abrindo só os dias mais recentes necessários."""
+        pieces, total = [], 0
+        for day in reversed(self.days(asset)):
+            if end is not None and day * SECONDS_PER_DAY >= end: continue
+            piece = self._day_slice(asset, day, end=end)
+            if piece is None: continue
+            pieces.insert(0, piece)
+            total += len(piece[0])
+            if total >= count: break
+        timestamps, values = self._join(pieces)
+        return timestamps[-count:], values[:, -count:]
+
+    @staticmethod
+    def _join(pieces):
+        if not pieces:
+            return np.zeros(0, dtype=np.int64), np.zeros((len(CANDLE_FIELDS), 0))
+        if len(pieces) == 1:
+            timestamps, values = np.asarray(pieces[0][0]), np.asarray(pieces[0][1])
+        else:
+            timestamps = np.concatenate([p[0] for p in pieces])
+            values = np.concatenate([p[1] for p in pieces], axis=1)
+        timestamps.flags.writeable = False
+        values.flags.writeable = False
+        return timestamps, values
+
+    def last_timestamp(self, asset):
+        timestamps, _ = self.tail(asset, 1)
+        return int(timestamps[-1]) if len(timestamps) else None
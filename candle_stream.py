@@ -0,0 +1,125 @@
+# candle_stream.py - Detecção de fechamento de velas sobre o feed em tempo real
+
+import logging
+import queue
+import threading
+
+from clock import get_clock
+
+
+class CandleStream:
+    """
+    Observa o feed de velas em tempo real (start_candles_stream / get_realtime_candles
+    da IQ_Option, ou qualquer objeto com a mesma interface) e emite um evento de
+    "vela fechada" por ativo assim que a vela seguinte aparece no feed.
+
+    A leitura de get_realtime_candles é local (a biblioteca mantém o dicionário
+    atualizado pelo websocket), então o polling curto não gera tráfego de rede.
+    """
+
+    def __init__(self, feed, interval=60, maxdict=3, poll_interval=0.05):
+        self.feed = feed
+        self.interval = interval
+        self.maxdict = maxdict
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self._assets = set()
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_assets(self, assets):
+        """Sincroniza as inscrições do feed com a lista de ativos informada."""
+        assets = set(assets)
+        with self._lock:
+            for asset in assets - self._assets:
+                self.feed.start_candles_stream(asset, self.interval, self.maxdict)
+                logging.info(f"STREAM: Inscrito em {asset} ({self.interval}s).")
+            for asset in self._assets - assets:
+                self.feed.stop_candles_stream(asset, self.interval)
+                self._last_seen.pop(asset, None)
+                logging.info(f"STREAM: Inscrição removida de {asset}.")
+            self._assets = assets
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="CandleStream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout=2)
+        self.set_assets([])
+
+    def wait_closed_candle(self, timeout=None):
+        """Bloqueia até o próximo evento de vela fechada. Retorna (ativo, timestamp) ou None."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def poll_once(self):
+        """Verifica todos os ativos inscritos uma vez e enfileira as velas que fecharam."""
+        with self._lock:
+            assets = list(self._assets)
+        for asset in assets:
+            try:
+                candles = self.feed.get_realtime_candles(asset, self.interval)
+                if not candles: continue
+                latest = max(list(candles.keys()))
+            except Exception as e:
+                logging.error(f"STREAM: Erro ao ler velas em tempo real de {asset}: {e}")
+                continue
+
+            previous = self._last_seen.get(asset)
+            self._last_seen[asset] = latest
+            if previous is not None and latest > previous:
+                self.events.put((asset, previous))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.poll_interval)
+
+
+class FakeCandleFeed:
+    """
+    Feed local com a mesma interface de velas em tempo real da IQ_Option.
+    Permite dirigir o CandleStream (e o BotCore em modo streaming) com ticks sintéticos.
+    """
+
+    def __init__(self):
+        self.candles = {}
+        self.maxdict = {}
+
+    def start_candles_stream(self, asset, size, maxdict):
+        self.candles.setdefault((asset, size), {})
+        self.maxdict[(asset, size)] = maxdict
+
+    def stop_candles_stream(self, asset, size):
+        self.candles.pop((asset, size), None)
+        self.maxdict.pop((asset, size), None)
+
+    def get_realtime_candles(self, asset, size):
+        return dict(self.candles.get((asset, size), {}))
+
+    def push_tick(self, asset, price, timestamp=None, size=60, volume=1):
+        """Agrega um tick na vela corrente do ativo, abrindo uma nova vela quando necessário."""
+        key = (asset, size)
+        if key not in self.candles: return
+        timestamp = get_clock().time() if timestamp is None else timestamp
+        bar_from = int(timestamp // size * size)
+        candles = self.candles[key]
+        candle = candles.get(bar_from)
+        if candle is None:
+            candles[bar_from] = {'from': bar_from, 'to': bar_from + size, 'open': price, 'close': price,
+                                 'min': price, 'max': price, 'volume': volume}
+            for old in sorted(candles)[:-self.maxdict[key]]:
+                del candles[old]
+        else:
+            candle['close'] = price
+            candle['min'] = min(candle['min'], price)
+            candle['max'] = max(candle['max'], price)
+            candle['volume'] += volume
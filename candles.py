@@ -0,0 +1,130 @@
+# candles.py - Utilitários de velas compartilhados pela conexão e pelo núcleo do robô
+
+import numpy as np
+import pandas as pd
+
+CANDLE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# Agregação OHLCV usada para montar timeframes maiores a partir de velas menores
+OHLCV_AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def resample_candles(df, interval, base_interval=60):
+    """
+    Reamostra velas de `base_interval` segundos (ex: M1) para `interval` segundos (M5, M15, H1).
+    Os buckets seguem o alinhamento da IQ Option (múltiplos do intervalo desde a época) e a
+    última vela pode estar em formação, como nas velas retornadas pela API. O primeiro bucket
+    é descartado se estiver incompleto, para não gerar uma vela com abertura errada.
+    """
+    grouped = df[list(OHLCV_AGGREGATION)].resample(f"{interval}s", label='left', closed='left')
+    resampled = grouped.agg(OHLCV_AGGREGATION)
+    counts = grouped['close'].count()
+
+    has_data = counts > 0
+    resampled, counts = resampled[has_data], counts[has_data]
+    if len(resampled) and counts.iloc[0] < interval // base_interval:
+        resampled = resampled.iloc[1:]
+    return resampled
+
+
+def candles_to_arrays(candles):
+    """Converte a lista de dicts da API em (timestamps int64, valores 5 x n), em ordem de tempo; None se vazia ou incompleta."""
+    if not candles: return None
+    required_cols = ['open', 'max', 'min', 'close', 'volume', 'from']
+    if not all(col in candles[0] for col in required_cols): return None
+    candles = sorted(candles, key=lambda c: c['from'])
+    timestamps = np.fromiter((c['from'] for c in candles), dtype=np.int64, count=len(candles))
+    values = np.array([[c['open'] for c in candles], [c['max'] for c in candles], [c['min'] for c in candles],
+                       [c['close'] for c in candles], [c['volume'] for c in candles]], dtype=np.float64)
+    return timestamps, values
+
+
+def to_frame(timestamps, values):
+    """DataFrame indexado por 'from' a partir de (timestamps em segundos, valores 5 x n), sem copiar os valores."""
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='s'), name='from')
+    return pd.DataFrame(values.T, index=index, columns=list(CANDLE_FIELDS), copy=False)
+
+
+def enable_copy_on_write():
+    """
+    Liga o Copy-on-Write do pandas 2.x (padrão a partir do pandas 3). Com ele, nenhuma escrita
+    feita por uma estratégia numa visão de velas chega ao cache da conexão ou às outras estratégias.
+    """
+    major = int(pd.__version__.split('.')[0])
+    if major == 2 and hasattr(pd.options.mode, 'copy_on_write'):
+        pd.options.mode.copy_on_write = True
+
+
+def read_only_view(df):
+    """
+    Visão das velas para uma estratégia, sem copiar os dados. Colunas derivadas adicionadas
+    pela estratégia ficam só na visão dela (área de rascunho), e os valores compartilhados
+    são protegidos pelo Copy-on-Write (ver enable_copy_on_write).
+    """
+    return df.copy(deep=False) if df is not None else None
+
+
+class CandleBuffer:
+    """
+    Buffer compacto de velas de um ativo: arrays NumPy pré-alocados para open, high, low,
+    close, volume (float64, um bloco 5 x N) e timestamps em segundos (int64), com capacidade fixa.
+
+    O espaço é o dobro da capacidade: as velas são anexadas em sequência e, quando o fim é
+    atingido, as últimas `capacity` velas são copiadas para arrays novos (custo O(1) amortizado).
+    Assim as últimas N velas estão sempre contíguas e to_frame() as expõe sem copiar. As visões
+    entregues continuam válidas após a compactação; só a vela em formação, reescrita a cada
+    atualização, pode mudar nelas.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._allocate()
+        self.start = 0
+        self.end = 0
+
+    def _allocate(self):
+        self.timestamps = np.zeros(2 * self.capacity, dtype=np.int64)
+        self.values = np.zeros((len(CANDLE_FIELDS), 2 * self.capacity), dtype=np.float64)
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[self.end - 1]) if len(self) else None
+
+    def append(self, timestamps, values):
+        """
+        Anexa velas em ordem crescente (`values` com shape 5 x n, na ordem de CANDLE_FIELDS).
+        Velas a partir do primeiro timestamp novo substituem as existentes (ex: a vela em formação).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[:, -self.capacity:]
+        if not len(timestamps): return
+
+        keep_end = self.start + int(np.searchsorted(self.timestamps[self.start:self.end], timestamps[0]))
+        count = len(timestamps)
+        if keep_end + count > len(self.timestamps):
+            kept = min(keep_end - self.start, self.capacity - count)
+            old_timestamps, old_values = self.timestamps, self.values
+            self._allocate()
+            self.timestamps[:kept] = old_timestamps[keep_end - kept:keep_end]
+            self.values[:, :kept] = old_values[:, keep_end - kept:keep_end]
+            self.start, keep_end = 0, kept
+
+        self.timestamps[keep_end:keep_end + count] = timestamps
+        self.values[:, keep_end:keep_end + count] = values
+        self.end = keep_end + count
+        self.start = max(self.start, self.end - self.capacity)
+
+    def arrays(self, count=None):
+        """Visões somente-leitura das últimas `count` velas: (timestamps, values 5 x n)."""
+        start = self.start if count is None else max(self.start, self.end - count)
+        timestamps, values = self.timestamps[start:self.end], self.values[:, start:self.end]
+        timestamps.flags.writeable = False
+        values.flags.writeable = False
+        return timestamps, values
+
+    def to_frame(self, count=None):
+        """DataFrame das últimas `count` velas, indexado por 'from', sem copiar os valores."""
+        return to_frame(*self.arrays(count))
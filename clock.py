@@ -0,0 +1,147 @@
+# clock.py - Relógio único do robô: o de parede ou um simulado que salta para o próximo evento
+
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+
+
+class SystemClock:
+    """O relógio de parede: time.time, datetime.now e esperas reais."""
+
+    simulated = False
+
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        if seconds > 0: time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """Como event.wait(timeout): retorna True se o evento foi sinalizado."""
+        return event.wait(timeout)
+
+    def wait_on(self, condition, timeout):
+        """Como condition.wait(timeout), para threads de fundo (chamar com a condição adquirida)."""
+        return condition.wait(timeout)
+
+    def thread_started(self):
+        pass
+
+    def thread_finished(self):
+        pass
+
+
+class SimulatedClock:
+    """
+    Relógio simulado: sleep e wait não esperam, avançam o tempo na hora. Threads de fundo que
+    dormem pelo relógio (wait_on, ex: o poller de liquidação) são acordadas quando o tempo passa
+    do prazo delas, e quem avançou o tempo só segue quando elas voltam a dormir ou terminam;
+    assim um dia inteiro roda em segundos e na mesma ordem de eventos do tempo real.
+    Threads novas que usam o relógio avisam com thread_started/thread_finished.
+    `stop_at(instante, evento)` sinaliza o evento quando o tempo chega ao instante (fim da simulação).
+    """
+
+    simulated = True
+
+    def __init__(self, start):
+        self._now = float(start)
+        self._lock = threading.Condition()
+        self._sleepers = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._alarms = []
+
+    def time(self):
+        return self._now
+
+    def now(self):
+        return datetime.fromtimestamp(self._now)
+
+    def stop_at(self, at, event):
+        with self._lock:
+            self._alarms.append((at, event))
+
+    def sleep(self, seconds):
+        self.advance_to(self._now + max(0.0, seconds))
+
+    def wait(self, event, timeout):
+        if not event.is_set() and timeout is not None:
+            # Como event.wait: volta quando um stop_at do evento dispara antes do prazo
+            target = self._now + max(0.0, timeout)
+            with self._lock:
+                target = min([target] + [at for at, alarm in self._alarms if alarm is event])
+            self.advance_to(target)
+        return event.is_set()
+
+    def advance_to(self, target):
+        """Avança até `target`, acordando em ordem as threads com prazo vencido e esperando cada uma voltar a dormir."""
+        while True:
+            with self._lock:
+                # Threads recém-iniciadas ainda não registraram o prazo delas
+                while self._running:
+                    self._lock.wait()
+                if self._sleepers and self._sleepers[0][0] <= target:
+                    deadline, _, sleeper = heapq.heappop(self._sleepers)
+                    self._now = max(self._now, deadline)
+                else:
+                    sleeper = None
+                    self._now = max(self._now, target)
+                for alarm in [a for a in self._alarms if a[0] <= self._now]:
+                    alarm[1].set(); self._alarms.remove(alarm)
+                if sleeper is None: return
+                if sleeper['woken']: continue
+                sleeper['woken'] = True
+                self._running += 1
+
+            with sleeper['condition']:
+                sleeper['condition'].notify_all()
+            with self._lock:
+                while self._running:
+                    self._lock.wait()
+
+    def wait_on(self, condition, timeout):
+        sleeper = {'condition': condition, 'woken': False}
+        with self._lock:
+            heapq.heappush(self._sleepers, (self._now + max(0.0, timeout), next(self._sequence), sleeper))
+            self._idle()
+        # Espera real até o relógio (ou outra thread, ex: uma ordem nova) notificar
+        condition.wait()
+        with self._lock:
+            if sleeper['woken']: return False
+            # Acordada por outra thread antes do prazo: sai da fila do relógio e fica ativa
+            sleeper['woken'] = True
+            self._running += 1
+        return True
+
+    def thread_started(self):
+        with self._lock:
+            self._running += 1
+
+    def thread_finished(self):
+        with self._lock:
+            self._idle()
+
+    def _idle(self):
+        # Chamado com self._lock adquirido
+        if self._running:
+            self._running -= 1
+            self._lock.notify_all()
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Troca o relógio do processo (ex: SimulatedClock num teste de carga). Retorna o anterior."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
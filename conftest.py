@@ -0,0 +1,149 @@
+# conftest.py - Fixtures compartilhadas pelos testes (pytest)
+
+import csv
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from clock import SimulatedClock, set_clock
+
+
+def asset_price(asset):
+    """Preço base que identifica o ativo nas velas das APIs falsas."""
+    return float(zlib.crc32(asset.encode()) % 9000 + 1000)
+
+
+PIP = 0.0001
+
+
+def synthetic_history(n=3000, seed=0, start=1704672000):
+    """
+    Histórico M1 sintético (timestamps, valores 5 x n) montado com trechos que disparam as
+    estratégias: saltos com correção lenta, picos fora da banda com gap de volta, tendências
+    ruidosas e lateralizações.
+    """
+    rng = np.random.default_rng(seed)
+    moves, gaps = [], []
+    while len(moves) < n:
+        kind = rng.integers(4)
+        sign = rng.choice([-1, 1])
+        if kind == 0:
+            seg = [sign * 9 * PIP] * 5 + [-sign * 1.3 * PIP] * 30
+            seg_gaps = [0.0] * len(seg)
+        elif kind == 1:
+            seg = [0.0] * 25 + [sign * 30 * PIP, sign * 1 * PIP] + [0.0] * 10
+            seg_gaps = [0.0] * 26 + [-sign * 34 * PIP] + [0.0] * 10
+        elif kind == 2:
+            seg = list(sign * 0.8 * PIP + rng.normal(0, 3 * PIP, 80))
+            seg_gaps = [0.0] * 80
+        else:
+            seg = [0.0] * 40
+            seg_gaps = [0.0] * 40
+        moves += seg; gaps += seg_gaps
+    moves = np.array(moves[:n]) + rng.normal(0, 0.8 * PIP, n)
+    gaps = np.array(gaps[:n])
+    opens, close = np.empty(n), np.empty(n)
+    price = 1.1
+    for i in range(n):
+        opens[i] = price + gaps[i]
+        close[i] = opens[i] + moves[i]
+        price = close[i]
+    wick = rng.exponential(0.15 * PIP, (2, n))
+    high = np.maximum(opens, close) + wick[0]
+    low = np.minimum(opens, close) - wick[1]
+    volume = np.round(rng.lognormal(4, 0.6, n))
+    timestamps = start + 60 * np.arange(n, dtype=np.int64)
+    return timestamps, np.vstack([opens, high, low, close, volume])
+
+
+def pullback_window(direction):
+    """
+    Variações de fechamento de 110 velas cuja última vela é um pullback válido (CALL com
+    direction=1, PUT com -1): alta antiga, queda no meio da janela e retomada recente, de modo
+    que o preço fique do lado da tendência nas EMAs com o RSI já do outro lado de 50.
+    """
+    moves = np.zeros(110)
+    moves[:50] = 3 * PIP
+    moves[75:85] = -2 * PIP
+    moves[97:109] = 0.25 * PIP
+    moves[-1] = -0.5 * PIP
+    return direction * moves
+
+
+def pullback_history(blocks=6, seed=0, start=1704672000):
+    """
+    Histórico M1 (timestamps, valores 5 x n) com janelas de pullback_window intercaladas com
+    trechos aleatórios; alguns trechos são curtos, para exercitar o intervalo mínimo entre sinais.
+    """
+    rng = np.random.default_rng(seed)
+    moves, wicks, volume = [], [], []
+    for block in range(blocks):
+        noise = int(rng.choice([2, 60]))
+        moves += list(rng.normal(0, 1.5 * PIP, noise)); wicks += [0.0] * noise; volume += list(rng.uniform(30, 80, noise))
+        direction = 1 if block % 2 == 0 else -1
+        window = pullback_window(direction)
+        # Pavio que marca a máxima (mínima) das 5 velas anteriores, sem mexer nos fechamentos
+        window_wicks = np.zeros(110); window_wicks[-4] = direction * 8 * PIP
+        moves += list(window); wicks += list(window_wicks); volume += [50.0] * 109 + [200.0]
+    moves, wicks = np.array(moves), np.array(wicks)
+    close = 1.1 + np.cumsum(moves)
+    opens = close - moves
+    high = np.maximum(opens, close) + 0.1 * PIP + np.maximum(wicks, 0)
+    low = np.minimum(opens, close) - 0.1 * PIP + np.minimum(wicks, 0)
+    timestamps = start + 60 * np.arange(len(moves), dtype=np.int64)
+    return timestamps, np.vstack([opens, high, low, close, np.array(volume)])
+
+
+def write_csv(path, timestamps, values):
+    """Grava o histórico no formato de CSV lido pelo backtest (colunas como as velas da API)."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['from', 'open', 'high', 'low', 'close', 'volume'])
+        for i in range(len(timestamps)):
+            writer.writerow([timestamps[i], *values[:, i]])
+
+
+class SharedSlotAPI:
+    """
+    API falsa com o defeito da IQ_Option: a resposta de get_candles passa por um único campo
+    compartilhado (api.candles.candles_data), sem identificar o pedido. Chamadas simultâneas
+    trocam as velas entre ativos, como na biblioteca real. As velas de cada ativo têm todas o
+    preço de asset_price(ativo), e só existem a partir de `first`.
+    """
+
+    def __init__(self, first=0, delay=0.002):
+        self.first = first
+        self.delay = delay
+        self.candles_data = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_candles(self, asset, interval, count, endtime):
+        with self._lock:
+            self.calls += 1
+        last = int(endtime) // interval * interval
+        froms = [ts for ts in range(last - (count - 1) * interval, last + interval, interval) if ts >= self.first]
+        price = asset_price(asset)
+        self.candles_data = None
+        time.sleep(self.delay)
+        self.candles_data = [{'from': ts, 'open': price, 'max': price, 'min': price, 'close': price, 'volume': 1}
+                             for ts in froms]
+        time.sleep(self.delay)
+        return self.candles_data
+
+
+@pytest.fixture
+def shared_slot_api():
+    return SharedSlotAPI()
+
+
+@pytest.fixture
+def simulated_clock():
+    """SimulatedClock em 2024-01-08 00:00 UTC como relógio do processo durante o teste."""
+    clock = SimulatedClock(1704672000)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
@@ -0,0 +1,204 @@
+# download_history.py - Baixa o histórico M1 da IQ Option para o CandleStore local
+#
+# Uso: python download_history.py --email EMAIL --password SENHA [--days 90] [--store candle_store]
+#                                 [--assets EURUSD GBPUSD-OTC] [--workers 4] [--rate 5]
+#                                 [--checkpoint download_checkpoint.json]
+#
+# Sem --assets, baixa BotCore.PREFERRED_ASSETS e BotCore.OTC_ASSETS. A API entrega no máximo
+# 1000 velas por chamada, então cada ativo é paginado de trás para frente por `endtime`.
+# O progresso vai para o checkpoint a cada página: se a conexão cair, rodar o mesmo comando
+# continua de onde parou.
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app_paths import app_data_path
+from candle_store import CandleStore
+from candles import candles_to_arrays
+
+PAGE_SIZE = 1000
+
+
+class RateLimiter:
+    """Token bucket compartilhado entre as threads: no máximo `rate` chamadas por segundo, com rajadas de até `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadCheckpoint:
+    """
+    Progresso por ativo num JSON: o período pedido (start, end), o cursor (vela mais antiga já
+    gravada) e se o ativo terminou. Salvo de forma atômica (arquivo temporário + os.replace).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def cursor(self, asset, start, end):
+        """Onde retomar o ativo: o cursor salvo, se o período for o mesmo; senão o fim do período."""
+        with self._lock:
+            entry = self.entries.get(asset)
+        if entry and entry['start'] == start and entry['end'] == end:
+            return entry['cursor'], entry['done']
+        return end, False
+
+    def update(self, asset, start, end, cursor, done=False):
+        with self._lock:
+            self.entries[asset] = {'start': start, 'end': end, 'cursor': cursor, 'done': done}
+            if not self.path: return
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(temporary, self.path)
+
+
+class HistoryDownloader:
+    """
+    Pagina get_candles de trás para frente, de `end` até `start`, e grava as velas no CandleStore.
+    `api` é qualquer objeto com get_candles(ativo, intervalo, quantidade, endtime) no formato da
+    biblioteca (IQ_Option ou um substituto local). Os ativos correm em paralelo (até `workers`),
+    as páginas de um ativo em sequência, e todas as chamadas passam pelo mesmo RateLimiter.
+    A IQ_Option devolve as velas num campo compartilhado, sem identificar o pedido: as chamadas a
+    get_candles são serializadas (os workers sobrepõem só a gravação e as esperas), a menos que a
+    API declare `concurrent_get_candles`, como os backends locais.
+    """
+
+    def __init__(self, api, store, checkpoint=None, workers=4, rate=5.0, page_size=PAGE_SIZE,
+                 retries=5, retry_delay=2.0):
+        self.api = api
+        self.store = store
+        self.checkpoint = checkpoint or DownloadCheckpoint(None)
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.page_size = page_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.interval = store.interval
+        self._api_lock = threading.Lock()
+
+    def get_candles(self, asset, endtime):
+        if getattr(self.api, 'concurrent_get_candles', False):
+            return self.api.get_candles(asset, self.interval, self.page_size, endtime)
+        with self._api_lock:
+            return self.api.get_candles(asset, self.interval, self.page_size, endtime)
+
+    def fetch_page(self, asset, endtime):
+        """Uma página terminando em `endtime`, com novas tentativas (espera crescente) em erro ou resposta vazia."""
+        for attempt in range(self.retries):
+            self.limiter.acquire()
+            try:
+                page = candles_to_arrays(self.get_candles(asset, endtime))
+                if page is not None: return page
+            except Exception as e:
+                logging.warning(f"Erro ao baixar {asset} até {endtime} (tentativa {attempt + 1}/{self.retries}): {e}")
+            if attempt < self.retries - 1: time.sleep(self.retry_delay * 2 ** attempt)
+        return None
+
+    def download_asset(self, asset, start, end):
+        """Baixa [start, end) de um ativo. Retorna quantas velas foram gravadas nesta execução."""
+        cursor, done = self.checkpoint.cursor(asset, start, end)
+        if done:
+            logging.info(f"{asset}: já baixado, pulando."); return 0
+
+        written = 0
+        while cursor > start:
+            # A página termina na vela anterior ao cursor; o que sobrepõe o já gravado é descartado
+            page = self.fetch_page(asset, cursor - self.interval)
+            if page is None:
+                logging.error(f"{asset}: falha ao baixar até {cursor}; rode de novo para continuar do checkpoint.")
+                return written
+
+            timestamps, values = page
+            if not (timestamps < cursor).any():
+                # Nada mais antigo disponível (início do histórico do ativo)
+                break
+            keep = (timestamps >= start) & (timestamps < cursor)
+            timestamps, values = timestamps[keep], values[:, keep]
+            timestamps, unique = np.unique(timestamps, return_index=True)
+            values = values[:, unique]
+            if not len(timestamps):
+                # Velas mais antigas existem, mas nenhuma no período: não dá para afirmar que terminou
+                logging.error(f"{asset}: página até {cursor} sem velas a partir de {start}; rode de novo para continuar do checkpoint.")
+                return written
+
+            self.store.write(asset, timestamps, values)
+            written += len(timestamps)
+            cursor = int(timestamps[0])
+            self.checkpoint.update(asset, start, end, cursor)
+
+        self.store.flush()
+        self.checkpoint.update(asset, start, end, cursor, done=True)
+        logging.info(f"{asset}: concluído ({written} velas nesta execução).")
+        return written
+
+    def download(self, assets, start, end):
+        """Baixa [start, end) de todos os ativos (timestamps em segundos). Retorna {ativo: velas gravadas}."""
+        start = start // self.interval * self.interval
+        end = end // self.interval * self.interval
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="HistoryDownload") as pool:
+            futures = {asset: pool.submit(self.download_asset, asset, start, end) for asset in assets}
+            return {asset: future.result() for asset, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixa o histórico M1 para o CandleStore local")
+    parser.add_argument('--email', default=os.environ.get('IQ_EMAIL'))
+    parser.add_argument('--password', default=os.environ.get('IQ_PASSWORD'))
+    parser.add_argument('--assets', nargs='+')
+    parser.add_argument('--days', type=int, default=90, help="Dias de histórico até agora")
+    parser.add_argument('--store', default=app_data_path('candle_store'), help="Pasta do CandleStore (padrão: na pasta do aplicativo)")
+    parser.add_argument('--workers', type=int, default=4, help="Ativos baixados em paralelo")
+    parser.add_argument('--rate', type=float, default=5.0, help="Máximo de chamadas à API por segundo")
+    parser.add_argument('--checkpoint', default=app_data_path('download_checkpoint.json'))
+    args = parser.parse_args()
+
+    from bot_core import BotCore
+    from iq_option_connection import IQOptionConnection
+
+    iq = IQOptionConnection(args.email, args.password)
+    if not iq.connect(): raise SystemExit(1)
+
+    # Com ativos pendentes no checkpoint, retoma o mesmo período; senão baixa até agora
+    assets = args.assets or BotCore.PREFERRED_ASSETS + BotCore.OTC_ASSETS
+    checkpoint = DownloadCheckpoint(args.checkpoint)
+    pending = [entry['end'] for entry in checkpoint.entries.values() if not entry['done']]
+    end = max(pending) if pending else int(time.time()) // 60 * 60
+    start = end - args.days * 86400
+
+    downloader = HistoryDownloader(iq.api, CandleStore(args.store), checkpoint, args.workers, args.rate)
+    started = time.time()
+    totals = downloader.download(assets, start, end)
+    logging.info(f"{sum(totals.values())} velas de {len(totals)} ativo(s) em {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
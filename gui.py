@@ -252,7 +252,15 @@ class App(ctk.CTk):
         
         self.filter_news_var = ctk.BooleanVar(value=True)
         news_checkbox = ctk.CTkCheckBox(card, text="📰 Pausar durante notícias importantes", variable=self.filter_news_var, fg_color=self.colors['accent_secondary'], font=self.fonts['body'])
-        news_checkbox.grid(row=1, column=0, padx=15, pady=(5, 15), sticky="w")
+        news_checkbox.grid(row=1, column=0, padx=15, pady=(5, 5), sticky="w")
+
+        self.streaming_mode_var = ctk.BooleanVar(value=False)
+        streaming_checkbox = ctk.CTkCheckBox(card, text="⚡ Modo streaming (reage ao fechamento de cada vela)", variable=self.streaming_mode_var, fg_color=self.colors['accent_secondary'], font=self.fonts['body'])
+        streaming_checkbox.grid(row=2, column=0, padx=15, pady=(5, 5), sticky="w")
+
+        self.concurrent_positions_var = ctk.BooleanVar(value=False)
+        concurrent_checkbox = ctk.CTkCheckBox(card, text="🔀 Operar vários ativos ao mesmo tempo (Soros/Martingale por ativo)", variable=self.concurrent_positions_var, fg_color=self.colors['accent_secondary'], font=self.fonts['body'])
+        concurrent_checkbox.grid(row=3, column=0, padx=15, pady=(5, 15), sticky="w")
 
     def create_risk_section(self, parent, row):
         card = self.create_modern_card(parent, "METAS DIÁRIAS", "⚖️", row)
@@ -374,6 +382,8 @@ class App(ctk.CTk):
                 'stop_loss': float(self.stop_loss_entry.get() or 10.0),
                 'take_profit': float(self.take_profit_entry.get() or 5.0),
                 'filter_news': self.filter_news_var.get(),
+                'streaming_mode': self.streaming_mode_var.get(),
+                'concurrent_positions': self.concurrent_positions_var.get(),
                 'capital_strategy': self.capital_strategy_var.get(),
                 'soros_levels': max(1, sum(1 for var in self.soros_level_vars if var.get())) if self.capital_strategy_var.get() == 'soros' else 0,
                 'martingale_multiplier': float(self.martingale_multiplier_entry.get() or 2.0),
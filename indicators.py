@@ -0,0 +1,671 @@
+# indicators.py - Motor de indicadores compartilhado entre as estratégias
+
+import math
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class IndicatorEngine:
+    """
+    Calcula indicadores sobre as velas de um ativo em uma vela específica e memoriza
+    os resultados, para que várias estratégias compartilhem o mesmo cálculo.
+
+    As estratégias pedem indicadores por nome e parâmetros, ex:
+        engine.get('bbands', length=20, std=2.0)
+        engine.get('rsi', length=4)
+
+    Primitivas como média móvel e desvio padrão são memorizadas separadamente, então
+    bbands(20, 2.0), bbands(20, 2.5) e sma(20) usam uma única média e um único desvio.
+    As fórmulas reproduzem as do pandas_ta (nomes de colunas incluídos), para que os
+    valores lidos pelas estratégias não mudem.
+
+    Para avaliar uma série inteira como o robô na virada do minuto (generate_signals), vários
+    indicadores aceitam `last`: a última vela de cada janela é a vela em formação, com o preço
+    da coluna `last` (ex: 'open') ou um valor fixo, em vez da vela fechada (ver forming_windows).
+    """
+
+    def __init__(self, df, asset=None, states=None):
+        self.df = df
+        self.asset = asset
+        self.states = states
+        self._cache = {}
+
+    def get(self, name, **params):
+        key = (name, tuple(sorted(params.items())))
+        if key not in self._cache:
+            calc = getattr(self, f"_calc_{name}", None)
+            if calc is None:
+                raise ValueError(f"Indicador desconhecido: '{name}'")
+            self._cache[key] = calc(**params)
+        return self._cache[key]
+
+    def latest(self, name, **params):
+        """
+        Valor do indicador na última vela. Com um IndicatorStateBank o custo é O(1) por vela nova;
+        sem ele, cai no cálculo vetorizado completo. Indicadores que dependem do início da janela
+        (WINDOW_DEPENDENT: EMA, RSI) sempre usam o cálculo sobre as velas recebidas, como as
+        estratégias e o pandas_ta. Indicadores de várias colunas retornam um dict.
+        """
+        if self.states is not None and self.asset is not None and name not in WINDOW_DEPENDENT:
+            return self.states.latest(self.asset, self.df, name, **params)
+        result = self.get(name, **params)
+        if isinstance(result, dict):
+            return result
+        if isinstance(result, pd.DataFrame):
+            return result.iloc[-1].to_dict()
+        return result.iloc[-1]
+
+    # --- Primitivas ---
+
+    def _last_values(self, last):
+        """Preços da vela em formação de cada janela: uma coluna do DataFrame ou um valor fixo."""
+        if isinstance(last, str): return self.df[last].to_numpy(dtype=float)
+        return np.full(len(self.df), float(last))
+
+    def _forming(self, column, length, last, reduce):
+        windows = forming_windows(self.df[column].to_numpy(dtype=float), self._last_values(last), length)
+        return pd.Series(reduce(windows), index=self.df.index)
+
+    def _calc_rolling_mean(self, length, column='close', last=None):
+        if last is not None: return self._forming(column, length, last, lambda w: w.mean(axis=1))
+        return self.df[column].rolling(length, min_periods=length).mean()
+
+    def _calc_rolling_std(self, length, column='close', ddof=0, last=None):
+        if last is not None: return self._forming(column, length, last, lambda w: w.std(axis=1, ddof=ddof))
+        return self.df[column].rolling(length, min_periods=length).std(ddof=ddof)
+
+    def _calc_rolling_max(self, length, column='high', last=None):
+        if last is not None: return self._forming(column, length, last, lambda w: w.max(axis=1))
+        return self.df[column].rolling(length, min_periods=length).max()
+
+    def _calc_rolling_min(self, length, column='low', last=None):
+        if last is not None: return self._forming(column, length, last, lambda w: w.min(axis=1))
+        return self.df[column].rolling(length, min_periods=length).min()
+
+    def _calc_ewm(self, span, column='close'):
+        """Média exponencial simples do pandas (sem semente), como em Series.ewm(span, adjust=False)."""
+        return self.df[column].ewm(span=span, adjust=False).mean()
+
+    # --- Indicadores ---
+
+    def _calc_sma(self, length, column='close', last=None):
+        return self.get('rolling_mean', length=length, column=column, last=last)
+
+    def _calc_ema(self, length, column='close', window=None, offset=0, last=None):
+        """
+        EMA com semente SMA nas primeiras `length` velas (padrão do pandas_ta).
+        Com `window`, cada vela recebe o valor que a EMA teria na posição -1-offset de uma janela
+        de `window` velas terminando nela (ver windowed_ema); `last` só vale com `window`.
+        """
+        if window is not None:
+            last = None if last is None else self._last_values(last)
+            return pd.Series(windowed_ema(self.df[column].to_numpy(dtype=float), length, window, offset, last), index=self.df.index)
+        close = self.df[column].astype(float)
+        if len(close) < length:
+            return pd.Series(float('nan'), index=close.index)
+        close.iloc[:length - 1] = float('nan')
+        close.iloc[length - 1] = self.df[column].iloc[:length].mean()
+        return close.ewm(span=length, adjust=False).mean()
+
+    def _calc_bbands(self, length=20, std=2.0, last=None):
+        mid = self.get('rolling_mean', length=length, last=last)
+        dev = self.get('rolling_std', length=length, last=last)
+        suffix = f"{length}_{float(std)}"
+        return pd.DataFrame({
+            f'BBL_{suffix}': mid - std * dev,
+            f'BBM_{suffix}': mid,
+            f'BBU_{suffix}': mid + std * dev,
+        })
+
+    def _calc_rsi(self, length=14, column='close', window=None, offset=0, last=None):
+        """RSI com médias RMA (ewm alpha=1/length), como no pandas_ta. `window`/`offset`/`last`: ver windowed_rsi."""
+        if window is not None:
+            last = None if last is None else self._last_values(last)
+            return pd.Series(windowed_rsi(self.df[column].to_numpy(dtype=float), length, window, offset, last), index=self.df.index)
+        change = self.df[column].diff()
+        gains = change.clip(lower=0)
+        losses = change.clip(upper=0).abs()
+        alpha = 1.0 / length
+        avg_gain = gains.ewm(alpha=alpha, min_periods=length).mean()
+        avg_loss = losses.ewm(alpha=alpha, min_periods=length).mean()
+        return 100 * avg_gain / (avg_gain + avg_loss)
+
+    def _calc_stoch(self, k=14, d=3, smooth_k=3, last=None):
+        """Estocástico lento do pandas_ta. Com `last`, a vela em formação tem máxima, mínima e fechamento iguais a ele."""
+        columns = f'STOCHk_{k}_{d}_{smooth_k}', f'STOCHd_{k}_{d}_{smooth_k}'
+        lowest_low = self.get('rolling_min', length=k, column='low')
+        highest_high = self.get('rolling_max', length=k, column='high')
+        price_range = highest_high - lowest_low
+        if price_range.eq(0).any():
+            price_range = price_range + sys.float_info.epsilon
+        stoch = 100 * (self.df['close'] - lowest_low) / price_range
+        stoch_k = stoch.rolling(smooth_k, min_periods=smooth_k).mean()
+        if last is None:
+            stoch_d = stoch_k.rolling(d, min_periods=d).mean()
+            return pd.DataFrame({columns[0]: stoch_k, columns[1]: stoch_d})
+
+        # Só a última posição de cada janela muda: o %K cru da vela em formação entra nas médias
+        price = self._last_values(last)
+        forming_low = self.get('rolling_min', length=k, column='low', last=last).to_numpy()
+        forming_range = self.get('rolling_max', length=k, column='high', last=last).to_numpy() - forming_low
+        with np.errstate(invalid='ignore'):
+            raw = 100 * (price - forming_low) / np.where(forming_range == 0, sys.float_info.epsilon, forming_range)
+        forming_k = forming_windows(stoch.to_numpy(dtype=float), raw, smooth_k).mean(axis=1)
+        forming_d = forming_windows(stoch_k.to_numpy(dtype=float), forming_k, d).mean(axis=1)
+        return pd.DataFrame({columns[0]: forming_k, columns[1]: forming_d}, index=self.df.index)
+
+    def _calc_swings(self, window=110, lookback=20):
+        """Versão vetorizada do SwingTrackerState, para a última vela (mesmo formato de saída)."""
+        recent = self.df.iloc[-window:]
+        fractal_highs, fractal_lows = find_fractals(recent['high'].to_numpy(), recent['low'].to_numpy())
+        high_point = low_point = None
+        if len(self.df) >= lookback:
+            tail = self.df.iloc[-lookback:]
+            high_idx, low_idx = tail['high'].idxmax(), tail['low'].idxmin()
+            high_point = {'price': tail.loc[high_idx, 'high'], 'index': high_idx}
+            low_point = {'price': tail.loc[low_idx, 'low'], 'index': low_idx}
+        return {
+            'high_point': high_point,
+            'low_point': low_point,
+            'bullish': find_last_swing(fractal_highs, fractal_lows, 'bullish'),
+            'bearish': find_last_swing(fractal_highs, fractal_lows, 'bearish'),
+        }
+
+
+def find_fractals(high, low):
+    """
+    Fractais de 5 velas (máxima/mínima maior/menor que as duas velas de cada lado), vetorizado.
+    Retorna dois arrays float do tamanho da série: o preço do fractal onde houver e NaN no resto.
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    fractal_highs = np.full(len(high), np.nan)
+    fractal_lows = np.full(len(low), np.nan)
+    if len(high) < 5:
+        return fractal_highs, fractal_lows
+
+    center = high[2:-2]
+    is_high = (center > high[:-4]) & (center > high[1:-3]) & (center > high[3:-1]) & (center > high[4:])
+    fractal_highs[2:-2][is_high] = center[is_high]
+
+    center = low[2:-2]
+    is_low = (center < low[:-4]) & (center < low[1:-3]) & (center < low[3:-1]) & (center < low[4:])
+    fractal_lows[2:-2][is_low] = center[is_low]
+    return fractal_highs, fractal_lows
+
+
+def find_last_swing(fractal_highs, fractal_lows, trend_type):
+    """
+    Último swing a partir dos arrays de find_fractals. Retorna (swing_low, swing_high) ou (None, None).
+    'bullish': último topo e o último fundo anterior a ele; 'bearish': último fundo e o último topo anterior.
+    """
+    high_positions = np.flatnonzero(~np.isnan(fractal_highs))
+    low_positions = np.flatnonzero(~np.isnan(fractal_lows))
+    if len(high_positions) < 1 or len(low_positions) < 1:
+        return None, None
+
+    if trend_type == 'bullish':
+        high_pos = high_positions[-1]
+        earlier = np.searchsorted(low_positions, high_pos)
+        if earlier == 0: return None, None
+        low_pos = low_positions[earlier - 1]
+    elif trend_type == 'bearish':
+        low_pos = low_positions[-1]
+        earlier = np.searchsorted(high_positions, low_pos)
+        if earlier == 0: return None, None
+        high_pos = high_positions[earlier - 1]
+    else:
+        return None, None
+    return float(fractal_lows[low_pos]), float(fractal_highs[high_pos])
+
+
+# =============================================================================
+# Indicadores por janela, vetorizados
+# =============================================================================
+#
+# O robô calcula EMA e RSI sobre uma janela fixa (110 velas), e o valor depende de onde a
+# janela começa. Para avaliar uma série inteira de uma vez (generate_signals das estratégias),
+# estas funções devolvem, para cada vela t, o valor que o cálculo teria na janela terminando em t,
+# como soma ponderada das últimas velas (convolução com o núcleo exponencial truncado).
+# Velas sem janela completa ficam NaN. Com `last`, a última vela de cada janela é a vela em
+# formação (o robô avalia na virada do minuto): o preço dela substitui o fechamento da vela t.
+
+def forming_windows(closed, last, length):
+    """
+    (n, length): para cada vela t, os valores closed[t-length+1 .. t-1] seguidos de last[t], isto é,
+    as `length` últimas posições de uma janela cuja vela final ainda está em formação. NaN sem histórico.
+    """
+    closed = np.asarray(closed, dtype=float)
+    windows = np.full((len(closed), length), np.nan)
+    windows[:, -1] = last
+    if length > 1 and len(closed) >= length:
+        windows[length - 1:, :-1] = np.lib.stride_tricks.sliding_window_view(closed, length - 1)[:len(closed) - length + 1]
+    return windows
+
+
+def windowed_ema(values, length, window, offset=0, last=None):
+    """
+    EMA com semente SMA (como IndicatorEngine.ema) sobre a janela de `window` velas terminando
+    em cada vela t, lida na posição -1-offset da janela (offset=1: penúltima vela). `last` (só com
+    offset=0) é o preço da vela em formação de cada janela.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    steps = window - length - offset  # passos da EMA entre a semente e a posição lida
+    if steps < 0 or len(values) < window: return out
+
+    alpha = 2.0 / (length + 1)
+    decay = 1.0 - alpha
+    seeds = np.lib.stride_tricks.sliding_window_view(values, length).mean(axis=1)  # seeds[j]: média até j+length-1
+    weighted = np.convolve(values, alpha * decay ** np.arange(steps))[:len(values)] if steps else np.zeros(len(values))
+
+    positions = np.arange(window - 1, len(values)) - offset
+    out[window - 1:] = decay ** steps * seeds[positions - steps - (length - 1)] + weighted[positions]
+    if last is not None and offset == 0:
+        # A vela final entra com peso alpha no último passo (ou 1/length na semente, se não houver passos)
+        weight = alpha if steps else 1.0 / length
+        out[window - 1:] += weight * (np.asarray(last, dtype=float)[window - 1:] - values[window - 1:])
+    return out
+
+
+def windowed_rsi(values, length, window, offset=0, last=None):
+    """
+    RSI com médias RMA (como IndicatorEngine.rsi) sobre a janela de `window` velas terminando
+    em cada vela t, lido na posição -1-offset da janela. `last` (só com offset=0) é o preço da
+    vela em formação de cada janela.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    changes = window - 1 - offset  # variações dentro da janela até a posição lida
+    if changes < length or len(values) < window: return out
+
+    change = np.diff(values, prepend=np.nan)
+    change[0] = 0.0
+    kernel = (1.0 - 1.0 / length) ** np.arange(changes)
+    # A normalização da média ponderada (ewm adjust=True) se cancela na razão do RSI
+    gains = np.convolve(np.clip(change, 0, None), kernel)[:len(values)]
+    losses = np.convolve(np.clip(-change, 0, None), kernel)[:len(values)]
+
+    positions = np.arange(window - 1, len(values)) - offset
+    gains, losses = gains[positions], losses[positions]
+    if last is not None and offset == 0:
+        # A última variação (peso 1 no núcleo) passa a ser a da vela em formação
+        forming = np.asarray(last, dtype=float)[positions] - values[positions - 1]
+        gains = gains - np.clip(change[positions], 0, None) + np.clip(forming, 0, None)
+        losses = losses - np.clip(-change[positions], 0, None) + np.clip(-forming, 0, None)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[window - 1:] = 100 * gains / (gains + losses)
+    return out
+
+
+# =============================================================================
+# Indicadores incrementais (O(1) por vela)
+# =============================================================================
+#
+# Cada estado recebe as velas uma a uma por update(bar) e mantém o necessário entre
+# ciclos. peek(bar) calcula o valor como se a vela fosse anexada, sem registrá-la, o que
+# serve para a vela ainda em formação. Alimentados com a mesma série desde o início,
+# os valores coincidem (até arredondamento) com as colunas do pandas_ta / IndicatorEngine.
+# EMA e RSI dependem de onde a série começa, então um estado alimentado com todo o histórico
+# difere do cálculo sobre uma janela fixa de 110 velas: por isso ficam em WINDOW_DEPENDENT e o
+# IndicatorEngine.latest não os tira do IndicatorStateBank.
+
+NAN = float('nan')
+
+
+class RollingMeanStdState:
+    """Média e desvio padrão móveis com somas acumuladas, recalculadas a cada `length` velas contra deriva."""
+
+    def __init__(self, length, column='close', ddof=0):
+        self.length = length
+        self.column = column
+        self.ddof = ddof
+        self.window = deque()
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._updates = 0
+        self.value = (NAN, NAN)
+
+    def _stats(self, total, total_sq, n):
+        if n < self.length: return NAN, NAN
+        variance = max(total_sq - total * total / n, 0.0) / (n - self.ddof)
+        return total / n, math.sqrt(variance)
+
+    def _push(self, x):
+        total, total_sq, n = self._sum + x, self._sumsq + x * x, len(self.window) + 1
+        if n > self.length:
+            old = self.window[0]
+            total, total_sq, n = total - old, total_sq - old * old, n - 1
+        return total, total_sq, n
+
+    def peek(self, bar):
+        return self._stats(*self._push(bar[self.column]))
+
+    def update(self, bar):
+        x = bar[self.column]
+        self._sum, self._sumsq, _ = self._push(x)
+        self.window.append(x)
+        if len(self.window) > self.length: self.window.popleft()
+        self._updates += 1
+        if self._updates % self.length == 0:
+            self._sum = math.fsum(self.window)
+            self._sumsq = math.fsum(v * v for v in self.window)
+        self.value = self._stats(self._sum, self._sumsq, len(self.window))
+        return self.value
+
+
+class SMAState(RollingMeanStdState):
+    def peek(self, bar): return super().peek(bar)[0]
+
+    def update(self, bar): return super().update(bar)[0]
+
+
+class RollingStdState(RollingMeanStdState):
+    def peek(self, bar): return super().peek(bar)[1]
+
+    def update(self, bar): return super().update(bar)[1]
+
+
+class RollingExtremeState:
+    """Máxima (ou mínima) móvel com deque monotônica: O(1) amortizado por vela."""
+
+    def __init__(self, length, column='high', mode='max'):
+        self.length = length
+        self.column = column
+        self.better = (lambda a, b: a >= b) if mode == 'max' else (lambda a, b: a <= b)
+        self.window = deque()  # (posição, valor), valores monotônicos
+        self.count = 0
+        self.value = NAN
+
+    def peek(self, bar):
+        x = bar[self.column]
+        if self.count + 1 < self.length: return NAN
+        oldest_kept = self.count + 1 - self.length
+        for position, value in self.window:
+            if position >= oldest_kept:
+                return value if self.better(value, x) else x
+        return x
+
+    def update(self, bar):
+        x = bar[self.column]
+        while self.window and self.better(x, self.window[-1][1]):
+            self.window.pop()
+        self.window.append((self.count, x))
+        self.count += 1
+        while self.window[0][0] <= self.count - 1 - self.length:
+            self.window.popleft()
+        self.value = self.window[0][1] if self.count >= self.length else NAN
+        return self.value
+
+
+class EMAState:
+    """EMA com semente SMA (pandas_ta) ou, com sma_seed=False, igual a Series.ewm(span, adjust=False)."""
+
+    def __init__(self, length, column='close', sma_seed=True):
+        self.length = length
+        self.column = column
+        self.sma_seed = sma_seed
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self._seed_sum = 0.0
+        self.value = NAN
+
+    def _next(self, x):
+        if self.sma_seed and self.count < self.length:
+            return (self._seed_sum + x) / self.length if self.count + 1 == self.length else NAN
+        if self.count == 0: return x
+        return self.value + self.alpha * (x - self.value)
+
+    def peek(self, bar):
+        return self._next(bar[self.column])
+
+    def update(self, bar):
+        x = bar[self.column]
+        self.value = self._next(x)
+        if self.sma_seed and self.count < self.length: self._seed_sum += x
+        self.count += 1
+        return self.value
+
+
+class RMAState:
+    """Média RMA como no pandas_ta: ewm(alpha=1/length, adjust=True, min_periods=length)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.num = 0.0
+        self.den = 0.0
+        self.count = 0
+
+    def peek_value(self, x):
+        if self.count + 1 < self.length: return NAN
+        return (x + self.decay * self.num) / (1.0 + self.decay * self.den)
+
+    def update_value(self, x):
+        value = self.peek_value(x)
+        self.num = x + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+        self.count += 1
+        return value
+
+
+class RSIState:
+    def __init__(self, length=14, column='close'):
+        self.column = column
+        self.gains = RMAState(length)
+        self.losses = RMAState(length)
+        self.prev_close = None
+        self.value = NAN
+
+    @staticmethod
+    def _rsi(gain, loss):
+        total = gain + loss
+        return 100 * gain / total if total else NAN
+
+    def peek(self, bar):
+        if self.prev_close is None: return NAN
+        change = bar[self.column] - self.prev_close
+        return self._rsi(self.gains.peek_value(max(change, 0.0)), self.losses.peek_value(max(-change, 0.0)))
+
+    def update(self, bar):
+        x = bar[self.column]
+        if self.prev_close is not None:
+            change = x - self.prev_close
+            self.value = self._rsi(self.gains.update_value(max(change, 0.0)), self.losses.update_value(max(-change, 0.0)))
+        self.prev_close = x
+        return self.value
+
+
+class BBandsState:
+    def __init__(self, length=20, std=2.0):
+        self.std = std
+        self.stats = RollingMeanStdState(length)
+        self.suffix = f"{length}_{float(std)}"
+
+    def _bands(self, mean, dev):
+        return {f'BBL_{self.suffix}': mean - self.std * dev, f'BBM_{self.suffix}': mean,
+                f'BBU_{self.suffix}': mean + self.std * dev}
+
+    def peek(self, bar): return self._bands(*self.stats.peek(bar))
+
+    def update(self, bar): return self._bands(*self.stats.update(bar))
+
+
+class StochasticState:
+    def __init__(self, k=14, d=3, smooth_k=3):
+        self.highest = RollingExtremeState(k, 'high', 'max')
+        self.lowest = RollingExtremeState(k, 'low', 'min')
+        self.smooth = SMAState(smooth_k, column='value')
+        self.signal = SMAState(d, column='value')
+        self.k_col, self.d_col = f'STOCHk_{k}_{d}_{smooth_k}', f'STOCHd_{k}_{d}_{smooth_k}'
+
+    @staticmethod
+    def _raw(close, high, low):
+        if math.isnan(high) or math.isnan(low): return NAN
+        return 100 * (close - low) / ((high - low) or sys.float_info.epsilon)
+
+    def peek(self, bar):
+        raw = self._raw(bar['close'], self.highest.peek(bar), self.lowest.peek(bar))
+        if math.isnan(raw): return {self.k_col: NAN, self.d_col: NAN}
+        stoch_k = self.smooth.peek({'value': raw})
+        stoch_d = self.signal.peek({'value': stoch_k}) if not math.isnan(stoch_k) else NAN
+        return {self.k_col: stoch_k, self.d_col: stoch_d}
+
+    def update(self, bar):
+        raw = self._raw(bar['close'], self.highest.update(bar), self.lowest.update(bar))
+        stoch_k = stoch_d = NAN
+        if not math.isnan(raw):
+            stoch_k = self.smooth.update({'value': raw})
+            if not math.isnan(stoch_k): stoch_d = self.signal.update({'value': stoch_k})
+        return {self.k_col: stoch_k, self.d_col: stoch_d}
+
+
+class SwingTrackerState:
+    """
+    Rastreador de swings por ativo, O(1) amortizado por vela, para as estratégias de Fibonacci:
+
+    - máxima/mínima das últimas `lookback` velas (deque monotônica; empates ficam com a vela
+      mais antiga, como idxmax/idxmin), equivalente a tail(lookback) em find_swing_points;
+    - lista de fractais de 5 velas já confirmados, limitada às últimas `window` velas, para o
+      último swing de alta/baixa, equivalente a find_fractals + find_last_swing na mesma janela.
+    """
+
+    def __init__(self, window=110, lookback=20):
+        self.window = window
+        self.lookback = lookback
+        self.count = 0
+        self.recent = deque(maxlen=4)  # últimas velas fechadas: (posição, high, low)
+        self.fractal_highs = deque()   # (posição, preço)
+        self.fractal_lows = deque()
+        self.max_high = deque()        # (posição, timestamp, high), decrescente
+        self.min_low = deque()         # (posição, timestamp, low), crescente
+
+    @staticmethod
+    def _center_fractals(bars):
+        """Dadas 5 velas consecutivas, retorna (topo, fundo) do centro, ou None para cada."""
+        if len(bars) < 5: return None, None
+        (pos, high, low), others = bars[2], bars[:2] + bars[3:]
+        is_high = all(high > other[1] for other in others)
+        is_low = all(low < other[2] for other in others)
+        return ((pos, high) if is_high else None), ((pos, low) if is_low else None)
+
+    def update(self, bar):
+        pos, high, low = self.count, bar['high'], bar['low']
+        fractal_high, fractal_low = self._center_fractals(list(self.recent) + [(pos, high, low)])
+        if fractal_high: self.fractal_highs.append(fractal_high)
+        if fractal_low: self.fractal_lows.append(fractal_low)
+        self.recent.append((pos, high, low))
+
+        while self.max_high and self.max_high[-1][2] < high: self.max_high.pop()
+        self.max_high.append((pos, bar.get('from'), high))
+        while self.min_low and self.min_low[-1][2] > low: self.min_low.pop()
+        self.min_low.append((pos, bar.get('from'), low))
+
+        self.count += 1
+        # Poda o que não pode mais entrar em nenhuma consulta futura
+        oldest_fractal = self.count + 3 - self.window
+        for fractals in (self.fractal_highs, self.fractal_lows):
+            while fractals and fractals[0][0] < oldest_fractal: fractals.popleft()
+        oldest_bar = self.count + 1 - self.lookback
+        for extremes in (self.max_high, self.min_low):
+            while extremes and extremes[0][0] < oldest_bar: extremes.popleft()
+
+    def _extreme(self, extremes, pos, ts, price, is_better):
+        if pos + 1 < self.lookback: return None
+        oldest_bar = pos + 1 - self.lookback
+        for old_pos, old_ts, old_price in extremes:
+            if old_pos < oldest_bar: continue
+            if is_better(price, old_price): break
+            return {'price': old_price, 'index': old_ts}
+        return {'price': price, 'index': ts}
+
+    @staticmethod
+    def _last_before(fractals, limit_pos):
+        for pos, price in reversed(fractals):
+            if pos < limit_pos: return price
+        return None
+
+    def peek(self, bar):
+        pos, ts, high, low = self.count, bar.get('from'), bar['high'], bar['low']
+        oldest_fractal = pos + 3 - self.window
+        highs = [f for f in self.fractal_highs if f[0] >= oldest_fractal]
+        lows = [f for f in self.fractal_lows if f[0] >= oldest_fractal]
+        fractal_high, fractal_low = self._center_fractals(list(self.recent) + [(pos, high, low)])
+        if fractal_high and fractal_high[0] >= oldest_fractal: highs.append(fractal_high)
+        if fractal_low and fractal_low[0] >= oldest_fractal: lows.append(fractal_low)
+
+        bullish = bearish = (None, None)
+        if highs and lows:
+            swing_low = self._last_before(lows, highs[-1][0])
+            if swing_low is not None: bullish = (swing_low, highs[-1][1])
+            swing_high = self._last_before(highs, lows[-1][0])
+            if swing_high is not None: bearish = (lows[-1][1], swing_high)
+
+        return {
+            'high_point': self._extreme(self.max_high, pos, ts, high, lambda new, old: new > old),
+            'low_point': self._extreme(self.min_low, pos, ts, low, lambda new, old: new < old),
+            'bullish': bullish,
+            'bearish': bearish,
+        }
+
+
+# Indicadores cujo valor depende de onde a série começa (memória infinita)
+WINDOW_DEPENDENT = frozenset({'ema', 'ewm', 'rsi'})
+
+# Mesmos nomes e parâmetros de IndicatorEngine.get
+STATE_FACTORIES = {
+    'sma': lambda length, column='close': SMAState(length, column),
+    'rolling_std': lambda length, column='close', ddof=0: RollingStdState(length, column, ddof),
+    'rolling_max': lambda length, column='high': RollingExtremeState(length, column, 'max'),
+    'rolling_min': lambda length, column='low': RollingExtremeState(length, column, 'min'),
+    'ema': lambda length, column='close': EMAState(length, column),
+    'ewm': lambda span, column='close': EMAState(span, column, sma_seed=False),
+    'rsi': lambda length=14, column='close': RSIState(length, column),
+    'bbands': lambda length=20, std=2.0: BBandsState(length, std),
+    'stoch': lambda k=14, d=3, smooth_k=3: StochasticState(k, d, smooth_k),
+    'swings': lambda window=110, lookback=20: SwingTrackerState(window, lookback),
+}
+
+
+class IndicatorStateBank:
+    """
+    Estados incrementais por (ativo, indicador, parâmetros), mantidos entre ciclos.
+    A cada consulta só as velas fechadas novas são registradas; a última vela do
+    DataFrame (em formação) entra via peek, sem alterar o estado. Os estados de
+    WINDOW_DEPENDENT seguem a série desde a semente, não a janela de cada consulta.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def latest(self, asset, df, name, **params):
+        if name not in STATE_FACTORIES:
+            raise ValueError(f"Indicador incremental desconhecido: '{name}'")
+        key = (asset, name, tuple(sorted(params.items())))
+        entry = self._entries.get(key)
+        closed = df.iloc[:-1]
+
+        # Sem estado, ou o histórico em mãos não encosta no estado: semeia com a janela disponível
+        if entry is None or entry['last_ts'] is None or len(closed) == 0 or closed.index[0] > entry['last_ts']:
+            entry = {'state': STATE_FACTORIES[name](**params), 'last_ts': None}
+            self._entries[key] = entry
+            new_bars = closed
+        else:
+            new_bars = closed[closed.index > entry['last_ts']]
+
+        # As velas levam o timestamp em 'from' para estados que devolvem pontos no tempo (swings)
+        state = entry['state']
+        for ts, bar in zip(new_bars.index, new_bars.to_dict('records')):
+            bar['from'] = ts
+            state.update(bar)
+        if len(new_bars): entry['last_ts'] = new_bars.index[-1]
+        forming = df.iloc[-1].to_dict()
+        forming['from'] = df.index[-1]
+        return state.peek(forming)
+
+    def reset(self, asset=None):
+        for key in [k for k in self._entries if asset is None or k[0] == asset]:
+            del self._entries[key]
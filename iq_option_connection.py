@@ -1,35 +1,289 @@
 # iq_option_connection.py - VERSÃO DE DIAGNÓSTICO
 
-from iqoptionapi.stable_api import IQ_Option
 import logging
-import pandas as pd
+import numpy as np
+import threading
 import time
+from collections import namedtuple
 from datetime import datetime
 
+from asset_resolver import AssetResolver
+from candle_stream import CandleStream
+from clock import get_clock
+from candles import CandleBuffer, candles_to_arrays, resample_candles
+from recording import RecordingBackend
+
+try:
+    from iqoptionapi.stable_api import IQ_Option
+except ImportError:
+    # Sem a biblioteca só funcionam backends locais (ex: simulated_broker.SimulatedBroker)
+    IQ_Option = None
+
+# Disponibilidade dos ativos num instante: trocada inteira, então quem lê nunca vê uma mistura.
+# `resolver` é o AssetResolver dos nomes de `binary`, reaproveitado enquanto os nomes não mudam.
+AssetSnapshot = namedtuple('AssetSnapshot', ['binary', 'digital', 'refreshed_at', 'resolver'])
+
+# Quantidade mínima de velas mantida em cache por (ativo, timeframe).
+# 300 velas de M1 cobrem as 50 velas de M5 que as estratégias recebem, derivadas localmente.
+CANDLE_CACHE_SIZE = 300
+
+
+def window_covered(cached, missing, count):
+    """
+    Se `cached` velas contínuas mais as `missing` a buscar (a última em cache é buscada de novo,
+    pode ter vindo em formação) cobrem a janela de `count` velas com uma busca incremental.
+    """
+    missing = max(missing, 1)
+    return missing <= count and cached + missing - 1 >= count
+
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+class SettlementPoller:
+    """
+    Liquida todas as ordens pendentes com uma única thread. Cada ordem só é consultada a partir
+    da sua expiração prevista; depois disso o intervalo entre consultas cresce (0.5s, 1s, 2s... até
+    `max_interval`). Entre expirações a thread dorme até a próxima, então a carga na API não
+    cresce com o número de posições abertas.
+    """
+
+    def __init__(self, conn, min_interval=0.5, max_interval=5.0):
+        self.conn = conn
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.pending = {}
+        self._wakeup = threading.Condition()
+        self._thread = None
+
+    @staticmethod
+    def expected_expiration(opened_at, duration):
+        """Expiração das opções turbo: virada do minuto, pulando para a seguinte se faltar menos de 30s."""
+        expiration = (int(opened_at) // 60 + duration) * 60
+        return expiration + 60 if expiration - opened_at < 30 else expiration
+
+    def watch(self, order_id, duration, on_result, opened_at=None):
+        opened_at = get_clock().time() if opened_at is None else opened_at
+        with self._wakeup:
+            self.pending[order_id] = {
+                'on_result': on_result,
+                'next_check': self.expected_expiration(opened_at, duration),
+                'interval': self.min_interval,
+            }
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="SettlementPoller", daemon=True)
+                get_clock().thread_started()
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _run(self):
+        # As esperas passam pelo relógio do robô: com um SimulatedClock, as expirações chegam na hora
+        clock = get_clock()
+        try:
+            self._poll_until_empty(clock)
+        finally:
+            clock.thread_finished()
+
+    def _poll_until_empty(self, clock):
+        while True:
+            with self._wakeup:
+                if not self.pending:
+                    self._thread = None
+                    return
+                now = clock.time()
+                due = [(order_id, entry) for order_id, entry in self.pending.items() if entry['next_check'] <= now]
+                if not due:
+                    clock.wait_on(self._wakeup, min(entry['next_check'] for entry in self.pending.values()) - now)
+                    continue
+
+            # Uma passada resolve todas as ordens vencidas
+            for order_id, entry in due:
+                try:
+                    settled, profit = self.conn.poll_order_result(order_id)
+                except Exception as e:
+                    logging.error(f"Erro ao consultar a ordem {order_id}: {e}")
+                    settled, profit = False, None
+
+                if settled:
+                    with self._wakeup:
+                        self.pending.pop(order_id, None)
+                    entry['on_result'](profit if profit is not None else 0)
+                else:
+                    with self._wakeup:
+                        entry['next_check'] = clock.time() + entry['interval']
+                        entry['interval'] = min(entry['interval'] * 2, self.max_interval)
+
+
+class AssetRefresher:
+    """
+    Atualiza a disponibilidade dos ativos (get_all_open_time, uma das chamadas mais lentas da
+    biblioteca) numa thread própria a cada `ttl` segundos, fora do caminho crítico do loop.
+    Em caso de erro o snapshot anterior continua valendo até a próxima tentativa. Se os
+    metadados vieram do cache (conn.metadata_pending), a primeira atualização é imediata.
+    """
+
+    def __init__(self, conn, ttl):
+        self.conn = conn
+        self.ttl = ttl
+        self._wakeup = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None: return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="AssetRefresher", daemon=True)
+        get_clock().thread_started()
+        self._thread.start()
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        self._thread = None
+
+    def _run(self):
+        clock = get_clock()
+        try:
+            while True:
+                with self._wakeup:
+                    if not self._stopped and not self.conn.metadata_pending: clock.wait_on(self._wakeup, self.ttl)
+                    if self._stopped: return
+                self.conn.update_open_assets()
+        finally:
+            clock.thread_finished()
+
+
 class IQOptionConnection:
-    def __init__(self, email, password):
+    """
+    Fachada do robô sobre a API. Por padrão usa a IQ_Option da iqoptionapi; `backend` troca por
+    qualquer objeto com a mesma interface (connect, get_all_open_time, get_all_ACTIVES_OPCODE,
+    get_candles, buy, check_win_v4...), como o SimulatedBroker, para rodar e medir sem conta real.
+    Com `record_file`, todas as chamadas à API são gravadas (recording.RecordingBackend) para
+    reproduzir a sessão depois com recording.ReplayBackend.
+    Com `metadata_cache` (metadata_cache.MetadataCache), o connect usa os opcodes e a
+    disponibilidade dos ativos salvos na última sessão, sem esperar pela API, e a primeira
+    atualização em segundo plano os revalida.
+    """
+
+    def __init__(self, email, password, backend=None, record_file=None, metadata_cache=None):
         self.email = email
         self.password = password
+        self.backend = backend
+        self.record_file = record_file
+        self.metadata_cache = metadata_cache
+        # Metadados vieram do cache e ainda não foram conferidos com a API
+        self.metadata_pending = False
         self.api = None
-        self.open_binary_assets = {}
-        self.open_digital_assets = {}
+        # Snapshot da disponibilidade dos ativos (AssetSnapshot), atualizado a cada `asset_ttl` segundos
+        self.asset_snapshot = None
+        self.asset_ttl = 300
+        self.asset_refresher = None
         self.supported_assets = []
+        # Cache incremental de velas: (ativo, intervalo) -> CandleBuffer
+        self.candle_cache = {}
+        self._cache_lock = threading.Lock()
+        # A IQ_Option guarda a resposta de get_candles num único campo (api.candles.candles_data), sem
+        # identificar o pedido: duas chamadas simultâneas podem trocar as velas entre ativos. Só
+        # backends que declaram concurrent_get_candles (simulador, replay) recebem chamadas em paralelo.
+        self._candles_lock = threading.Lock()
+        self.candle_stream = None
+        # Histórico local opcional (CandleStore): semeia o cache e guarda as velas fechadas
+        self.candle_store = None
+        self.settlement_poller = SettlementPoller(self)
 
     def connect(self):
         logging.info("Tentando conectar à IQ Option...")
-        self.api = IQ_Option(self.email, self.password)
+        if self.backend is not None:
+            self.api = self.backend
+        elif IQ_Option is None:
+            logging.error("Falha na conexão: biblioteca iqoptionapi não instalada.")
+            return False
+        else:
+            self.api = IQ_Option(self.email, self.password)
+        if self.record_file:
+            self.api = RecordingBackend(self.api, self.record_file)
+            logging.info(f"Gravando as chamadas à API em {self.record_file}")
         check, reason = self.api.connect()
 
         if check:
             logging.info("Conexão bem-sucedida!")
+            if self._load_metadata(): return True
             self.supported_assets = self.api.get_all_ACTIVES_OPCODE()
+            if self.asset_snapshot is not None:
+                # Reconexão: o índice precisa dos opcodes novos
+                snapshot = self.asset_snapshot
+                self.asset_snapshot = self._make_snapshot(snapshot.binary, snapshot.digital, snapshot.refreshed_at)
             return True
         else:
             logging.error(f"Falha na conexão: {reason}")
             return False
 
+    def _metadata_source(self):
+        return 'IQ_Option' if self.backend is None else type(self.backend).__name__
+
+    def _load_metadata(self):
+        """Carrega opcodes e disponibilidade do cache, se válido; a revalidação fica para o AssetRefresher."""
+        cached = self.metadata_cache.load(self._metadata_source()) if self.metadata_cache else None
+        if cached is None: return False
+        self.supported_assets = cached['opcodes']
+        self.asset_snapshot = self._make_snapshot(cached['binary'], cached['digital'], cached['saved_at'])
+        self.metadata_pending = True
+        logging.info(f"Metadados de {len(cached['binary'])} ativos carregados do cache "
+                     f"(salvo há {get_clock().time() - cached['saved_at']:.0f}s); revalidando em segundo plano.")
+        return True
+
+    def stop_recording(self):
+        """Fecha o arquivo de gravação (necessário para um .gz íntegro)."""
+        if isinstance(self.api, RecordingBackend): self.api.close()
+
+    @property
+    def open_binary_assets(self):
+        snapshot = self.asset_snapshot
+        return snapshot.binary if snapshot else {}
+
+    @property
+    def open_digital_assets(self):
+        snapshot = self.asset_snapshot
+        return snapshot.digital if snapshot else {}
+
+    @property
+    def asset_resolver(self):
+        snapshot = self.asset_snapshot
+        return snapshot.resolver if snapshot else AssetResolver((), self.supported_assets)
+
+    def _make_snapshot(self, binary, digital, refreshed_at):
+        """Monta o AssetSnapshot, remontando o AssetResolver só se os nomes ou os opcodes mudaram."""
+        previous = self.asset_snapshot
+        resolver = previous.resolver if previous else None
+        if resolver is None or not resolver.matches(binary.keys(), self.supported_assets):
+            resolver = AssetResolver(binary, self.supported_assets)
+        return AssetSnapshot(binary, digital, refreshed_at, resolver)
+
+    def start_asset_refresh(self, ttl):
+        """Busca a disponibilidade dos ativos agora e passa a atualizá-la em segundo plano a cada `ttl` segundos."""
+        self.asset_ttl = ttl
+        if self.asset_snapshot is None: self.update_open_assets()
+        if self.asset_refresher is None:
+            self.asset_refresher = AssetRefresher(self, ttl)
+            self.asset_refresher.start()
+
+    def stop_asset_refresh(self):
+        if self.asset_refresher is not None:
+            self.asset_refresher.stop()
+            self.asset_refresher = None
+
+    def get_open_assets(self):
+        """
+        O snapshot atual da disponibilidade dos ativos, sem esperar pela API quando a atualização
+        em segundo plano está ligada. Sem ela, atualiza aqui quando o snapshot passa do TTL.
+        """
+        snapshot = self.asset_snapshot
+        is_stale = snapshot is None or get_clock().time() - snapshot.refreshed_at >= self.asset_ttl
+        if snapshot is None or (is_stale and self.asset_refresher is None):
+            self.update_open_assets()
+            snapshot = self.asset_snapshot
+        return snapshot or self._make_snapshot({}, {}, get_clock().time())
+
     def update_open_assets(self):
         """
         Função modificada para diagnóstico.
@@ -37,13 +291,18 @@ class IQOptionConnection:
         """
         logging.info("--- DIAGNÓSTICO: ATUALIZANDO ATIVOS ---")
         try:
+            if self.metadata_pending:
+                # Primeira atualização depois de carregar o cache: confere também os opcodes
+                # (a marca sai antes da chamada, para um erro não virar um laço de novas tentativas)
+                self.metadata_pending = False
+                self.supported_assets = self.api.get_all_ACTIVES_OPCODE()
+
             all_assets = self.api.get_all_open_time()
 
             # --- INÍCIO DO BLOCO DE DIAGNÓSTICO 1 ---
             if not all_assets or not isinstance(all_assets, dict):
                 logging.error("DIAGNÓSTICO CRÍTICO: A chamada get_all_open_time() retornou um resultado vazio ou em formato inesperado!")
-                self.open_binary_assets = {}
-                self.open_digital_assets = {}
+                self.asset_snapshot = self._make_snapshot({}, {}, get_clock().time())
                 return
 
             logging.info(f"DIAGNÓSTICO: API retornou as seguintes categorias de ativos: {list(all_assets.keys())}")
@@ -52,16 +311,19 @@ class IQOptionConnection:
             binary_assets = all_assets.get('binary', {})
             turbo_assets = all_assets.get('turbo', {})
 
-            self.open_binary_assets = {**binary_assets, **turbo_assets}
-            self.open_digital_assets = all_assets.get('digital', {})
-            
-            if not self.open_binary_assets:
+            # Uma única atribuição: o loop principal lê o snapshot sem trava
+            snapshot = self._make_snapshot({**binary_assets, **turbo_assets}, all_assets.get('digital', {}), get_clock().time())
+            self.asset_snapshot = snapshot
+            if self.metadata_cache and snapshot.binary:
+                self.metadata_cache.save(self._metadata_source(), self.supported_assets, snapshot.binary, snapshot.digital)
+
+            if not snapshot.binary:
                 logging.warning("DIAGNÓSTICO: Nenhum ativo foi encontrado nas categorias 'binary' ou 'turbo'.")
             else:
                 # --- INÍCIO DO BLOCO DE DIAGNÓSTICO 2 ---
-                logging.info(f"DIAGNÓSTICO: Encontrados {len(self.open_binary_assets)} ativos no total (binários + turbo).")
+                logging.info(f"DIAGNÓSTICO: Encontrados {len(snapshot.binary)} ativos no total (binários + turbo).")
                 # Mostra uma amostra dos primeiros 15 ativos encontrados para ver a nomenclatura
-                sample_assets = list(self.open_binary_assets.keys())[:15]
+                sample_assets = list(snapshot.binary.keys())[:15]
                 logging.info(f"DIAGNÓSTICO: Amostra de nomes de ativos encontrados: {sample_assets}")
                 # --- FIM DO BLOCO DE DIAGNÓSTICO 2 ---
 
@@ -74,18 +336,158 @@ class IQOptionConnection:
         return asset_name in assets and assets.get(asset_name, {}).get('open', False)
 
     def is_asset_supported_by_library(self, asset_name):
-        return asset_name.upper() in self.supported_assets
+        return self.asset_resolver.is_supported(asset_name)
+
+    def _fetch_candles(self, asset, interval, count, endtime):
+        if getattr(self.api, 'concurrent_get_candles', False):
+            return candles_to_arrays(self.api.get_candles(asset, interval, count, endtime))
+        with self._candles_lock:
+            candles = self.api.get_candles(asset, interval, count, endtime)
+        return candles_to_arrays(candles)
 
     def get_candles(self, asset, interval, count, endtime):
-        candles = self.api.get_candles(asset, interval, count, endtime)
-        if not candles: return None
-        df = pd.DataFrame(candles)
-        df.rename(columns={'max': 'high', 'min': 'low'}, inplace=True)
-        required_cols = ['open', 'high', 'low', 'close', 'volume', 'from']
-        if not all(col in df.columns for col in required_cols): return None
-        df['from'] = pd.to_datetime(df['from'], unit='s')
-        df.set_index('from', inplace=True)
-        return df
+        """
+        Retorna as últimas `count` velas do ativo usando um cache incremental (CandleBuffer).
+        A primeira chamada semeia o cache (a partir do histórico local, se houver); as seguintes
+        pedem à API apenas as velas posteriores à última vela em cache (incluindo ela, que pode
+        ter sido recebida ainda em formação) e as anexam ao cache.
+        """
+        key = (asset, interval)
+        buffer = self._get_cached(key)
+        if buffer is None: buffer = self._seed_from_store(asset, interval, count, endtime)
+
+        if buffer is not None:
+            missing = int((endtime - buffer.last_timestamp) // interval) + 1
+            if window_covered(len(buffer), missing, count):
+                new = self._fetch_candles(asset, interval, max(missing, 1), endtime)
+                if new is None: return None
+                buffer.append(*new)
+                self._persist_closed(asset, interval, new, endtime)
+                if len(buffer) >= count: return buffer.to_frame(count)
+
+        # Cache vazio, curto demais ou com lacuna maior que a janela: semeia de novo
+        new = self._fetch_candles(asset, interval, max(count, CANDLE_CACHE_SIZE), endtime)
+        if new is None: return None
+        buffer = CandleBuffer(max(count, CANDLE_CACHE_SIZE))
+        buffer.append(*new)
+        self._store_cached(key, buffer)
+        self._persist_closed(asset, interval, new, endtime)
+        return buffer.to_frame(count)
+
+    def attach_candle_store(self, store):
+        """Liga um CandleStore: get_candles passa a partir dele no início e a gravar as velas fechadas."""
+        self.candle_store = store
+
+    def _seed_from_store(self, asset, interval, count, endtime):
+        """
+        Semeia o cache com as velas mais recentes do histórico local, desde que só falte buscar
+        na API o trecho até `endtime` e que o total cubra a janela pedida. Retorna o buffer ou None.
+        """
+        store = self.candle_store
+        if store is None or store.interval != interval: return None
+        try:
+            timestamps, values = store.tail(asset, max(count, CANDLE_CACHE_SIZE), end=endtime)
+        except Exception as e:
+            logging.error(f"Erro ao ler o histórico local de {asset}: {e}")
+            return None
+        if not len(timestamps): return None
+
+        # Só o trecho final sem lacunas serve de base para o cache incremental
+        gaps = np.flatnonzero(np.diff(timestamps) != interval)
+        start = gaps[-1] + 1 if len(gaps) else 0
+        timestamps, values = timestamps[start:], values[:, start:]
+        missing = int((endtime - timestamps[-1]) // interval) + 1
+        if not window_covered(len(timestamps), missing, count): return None
+
+        buffer = CandleBuffer(max(count, CANDLE_CACHE_SIZE))
+        buffer.append(timestamps, values)
+        self._store_cached((asset, interval), buffer)
+        return buffer
+
+    def _persist_closed(self, asset, interval, new, endtime):
+        """Grava no histórico local as velas recebidas que já fecharam até `endtime`."""
+        store = self.candle_store
+        if store is None or store.interval != interval: return
+        timestamps, values = new
+        closed = timestamps + interval <= endtime
+        if not closed.any(): return
+        try:
+            store.write(asset, timestamps[closed], values[:, closed])
+        except Exception as e:
+            logging.error(f"Erro ao gravar velas de {asset} no histórico local: {e}")
+
+    def get_timeframe_candles(self, asset, interval, count, endtime, base_interval=60):
+        """
+        Velas de timeframe maior (M5, M15, H1). Quando o cache de `base_interval` está atualizado
+        e cobre a janela, as velas são reamostradas localmente, sem chamada à API; caso contrário
+        recai em get_candles (que também é incremental).
+        """
+        base = self._get_cached((asset, base_interval))
+        if base is not None and interval > base_interval and interval % base_interval == 0:
+            ratio = interval // base_interval
+            is_fresh = endtime - base.last_timestamp < 2 * base_interval
+            if is_fresh and len(base) >= (count + 1) * ratio:
+                df = resample_candles(base.to_frame((count + 1) * ratio), interval, base_interval)
+                if len(df) >= count: return df.iloc[-count:]
+        return self.get_candles(asset, interval, count, endtime)
+
+    def start_candle_stream(self, assets, interval, feed=None):
+        """
+        Ativa o modo streaming: inscreve os ativos no feed de velas em tempo real
+        (por padrão a própria API) e passa a emitir eventos de vela fechada.
+        """
+        if self.candle_stream is None:
+            self.candle_stream = CandleStream(feed or self.api, interval)
+            self.candle_stream.start()
+        self.candle_stream.set_assets(assets)
+
+    def stop_candle_stream(self):
+        if self.candle_stream is not None:
+            self.candle_stream.stop()
+            self.candle_stream = None
+
+    def wait_closed_candle(self, timeout=None):
+        """Retorna o nome do próximo ativo cuja vela fechou, ou None se o tempo esgotar."""
+        if self.candle_stream is None: return None
+        event = self.candle_stream.wait_closed_candle(timeout)
+        return event[0] if event else None
+
+    def get_streamed_candles(self, asset, interval, count, endtime):
+        """
+        Igual a get_candles, mas completa o cache com as velas já recebidas pelo stream,
+        sem ida e volta à API. Se o cache não cobrir a janela, recai em get_candles.
+        """
+        buffer = self._get_cached((asset, interval))
+        if self.candle_stream is None or buffer is None or len(buffer) < count:
+            return self.get_candles(asset, interval, count, endtime)
+
+        new = candles_to_arrays(list(self.candle_stream.feed.get_realtime_candles(asset, interval).values()))
+        if new is None: return self.get_candles(asset, interval, count, endtime)
+        if new[0][0] > buffer.last_timestamp + interval:
+            # Lacuna entre o cache e o stream: busca o que falta pela API
+            return self.get_candles(asset, interval, count, endtime)
+
+        buffer.append(*new)
+        self._persist_closed(asset, interval, new, endtime)
+        return buffer.to_frame(count)
+
+    def clear_candle_cache(self, asset=None):
+        """Descarta o cache de velas de um ativo (ou de todos, se `asset` for None)."""
+        with self._cache_lock:
+            if asset is None:
+                self.candle_cache.clear()
+            else:
+                for key in [k for k in self.candle_cache if k[0] == asset]:
+                    del self.candle_cache[key]
+
+    # O cache é lido e escrito pelas threads da busca paralela de velas do BotCore
+    def _get_cached(self, key):
+        with self._cache_lock:
+            return self.candle_cache.get(key)
+
+    def _store_cached(self, key, buffer):
+        with self._cache_lock:
+            self.candle_cache[key] = buffer
 
     def buy_binary(self, amount, asset, action, duration):
         logging.info(f"ORDEM BINÁRIA/TURBO: {action} em {asset} | Valor: ${amount:.2f}")
@@ -100,10 +502,32 @@ class IQOptionConnection:
     def check_win(self, order_id):
         status, profit = self.api.check_win_v4(order_id)
         while status == 'pending':
-            time.sleep(1)
+            get_clock().sleep(1)
             status, profit = self.api.check_win_v4(order_id)
         return profit if profit is not None else 0
 
+    def poll_order_result(self, order_id):
+        """
+        Consulta sem bloquear se a ordem já foi liquidada. Retorna (liquidada, lucro).
+        Usa o evento de posição fechada que a biblioteca guarda em socket_option_closed,
+        sem ida à API; sem ele, recai em check_win_v4.
+        """
+        closed_events = getattr(getattr(self.api, 'api', None), 'socket_option_closed', None)
+        if isinstance(closed_events, dict):
+            event = closed_events.get(order_id)
+            if not event: return False, None
+            msg = event['msg']
+            if msg['win'] == 'equal': return True, 0
+            if msg['win'] == 'loose': return True, -float(msg['sum'])
+            return True, float(msg['win_amount']) - float(msg['sum'])
+
+        status, profit = self.api.check_win_v4(order_id)
+        return status != 'pending', profit
+
+    def watch_order(self, order_id, duration, on_result, opened_at=None):
+        """Entrega o resultado da ordem a `on_result(lucro)` pelo poller único de liquidação."""
+        self.settlement_poller.watch(order_id, duration, on_result, opened_at)
+
     def get_balance(self):
         try:
             balance = self.api.get_balance()
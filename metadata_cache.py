@@ -0,0 +1,50 @@
+# metadata_cache.py - Cache local dos metadados dos ativos (opcodes e horários de abertura)
+
+import json
+import logging
+import os
+
+from clock import get_clock
+
+# Sobe quando o formato do arquivo muda: caches de outra versão são ignorados
+METADATA_CACHE_VERSION = 1
+
+
+class MetadataCache:
+    """
+    Guarda num JSON o mapa de opcodes (get_all_ACTIVES_OPCODE) e a disponibilidade dos ativos
+    (get_all_open_time já separada em binary e digital), com a versão do formato, o instante em que
+    foi salvo (`saved_at`, no relógio do robô) e a origem (`source`, ex: IQ_Option ou SimulatedBroker).
+    `load` só aceita um cache da mesma versão e origem, salvo há menos de `max_age` segundos.
+    Salvo de forma atômica (arquivo temporário + os.replace).
+    """
+
+    def __init__(self, path, max_age=3600):
+        self.path = path
+        self.max_age = max_age
+
+    def load(self, source):
+        """O conteúdo salvo (dict com opcodes, binary, digital e saved_at) ou None se ausente, inválido ou velho."""
+        if not self.path or not os.path.exists(self.path): return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cache de metadados ilegível ({self.path}): {e}"); return None
+        if not isinstance(data, dict) or data.get('version') != METADATA_CACHE_VERSION or data.get('source') != source:
+            return None
+        age = get_clock().time() - data.get('saved_at', 0)
+        if not 0 <= age < self.max_age:
+            logging.info(f"Cache de metadados descartado: salvo há {age:.0f}s (máximo {self.max_age}s)."); return None
+        return data
+
+    def save(self, source, opcodes, binary, digital):
+        data = {'version': METADATA_CACHE_VERSION, 'source': source, 'saved_at': get_clock().time(),
+                'opcodes': opcodes, 'binary': binary, 'digital': digital}
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temporary, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Falha ao salvar o cache de metadados ({self.path}): {e}")
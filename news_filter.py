@@ -1,8 +1,10 @@
 import investpy
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
 import logging
 
+from clock import get_clock
+
 class NewsFilter:
     def __init__(self, impact_level=['high'], minutes_before=15, minutes_after=15):
         """
@@ -29,7 +31,7 @@ class NewsFilter:
 
     def _fetch_economic_calendar(self):
         """Busca e armazena o calendário econômico para o dia atual."""
-        today = datetime.now().date()
+        today = get_clock().now().date()
         # Só busca as notícias uma vez por dia para evitar sobrecarregar o site
         if self.last_fetch_date == today and self.news_data is not None:
             return
@@ -71,7 +73,7 @@ class NewsFilter:
         if not countries_in_asset:
             return True # Se o ativo não tem moedas mapeadas (ex: cripto), permite a operação
 
-        now = datetime.now()
+        now = get_clock().now()
 
         # Itera sobre as notícias de alto impacto do dia
         for index, news_item in self.news_data.iterrows():
@@ -0,0 +1,55 @@
+# order_tracker.py - Ciclo de vida das ordens abertas, liquidadas em segundo plano
+
+import logging
+import threading
+
+from clock import get_clock
+
+
+class OrderTracker:
+    """
+    Registra as posições abertas e as liquida em segundo plano, para que o loop principal
+    continue avaliando os ativos enquanto as ordens expiram. Todas as ordens são resolvidas
+    pelo poller único da conexão (IQOptionConnection.watch_order); quando o resultado chega,
+    `on_settled(order, profit)` é chamado na thread do poller.
+    """
+
+    def __init__(self, iq, on_settled):
+        self.iq = iq
+        self.on_settled = on_settled
+        self.open_orders = {}
+        self._lock = threading.Lock()
+
+    def submit(self, order_id, asset, stake, action, strategy, expiration):
+        order = {
+            'order_id': order_id, 'asset': asset, 'stake': stake, 'action': action,
+            'strategy': strategy, 'expiration': expiration, 'opened_at': get_clock().time(),
+        }
+        with self._lock:
+            self.open_orders[order_id] = order
+        self.iq.watch_order(order_id, expiration, lambda profit: self._settle(order, profit), order['opened_at'])
+        return order
+
+    def _settle(self, order, profit):
+        with self._lock:
+            self.open_orders.pop(order['order_id'], None)
+        try:
+            self.on_settled(order, profit)
+        except Exception as e:
+            logging.error(f"Erro ao registrar o resultado da ordem {order['order_id']}: {e}")
+
+    def has_open_position(self, asset):
+        with self._lock:
+            return any(o['asset'] == asset for o in self.open_orders.values())
+
+    def open_count(self):
+        with self._lock:
+            return len(self.open_orders)
+
+    def wait_all(self, timeout):
+        """Espera as ordens abertas liquidarem, até `timeout` segundos. Retorna quantas ficaram abertas."""
+        clock = get_clock()
+        deadline = clock.time() + timeout
+        while self.open_count() and clock.time() < deadline:
+            clock.sleep(0.5)
+        return self.open_count()
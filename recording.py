@@ -0,0 +1,221 @@
+# recording.py - Gravação das chamadas à API e replay determinístico de uma sessão
+#
+# Formato: uma linha JSON compacta por chamada, só acrescentada ao fim do arquivo (.gz comprime):
+#   {"t": instante da chamada, "m": método, "a": argumentos, "r": resposta, "d": duração em s}
+
+import collections
+import gzip
+import json
+import logging
+import threading
+import time
+
+from clock import get_clock
+
+# Chamadas gravadas; o resto da interface passa direto para o backend
+RECORDED_METHODS = ('connect', 'get_all_ACTIVES_OPCODE', 'get_all_open_time', 'get_candles', 'buy',
+                    'buy_digital_spot', 'check_win_v4', 'get_balance')
+
+
+def _open(path, mode):
+    return gzip.open(path, mode + 't', encoding='utf-8') if path.endswith('.gz') else open(path, mode, encoding='utf-8')
+
+
+def _to_json(value):
+    # Escalares numpy (ex: preços vindos de arrays) viram tipos nativos
+    if hasattr(value, 'item'): return value.item()
+    raise TypeError(f"Tipo não serializável na gravação: {type(value).__name__}")
+
+
+def read_recording(path):
+    """Lê todas as chamadas gravadas, em ordem."""
+    with _open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class RecordingBackend:
+    """
+    Envolve o backend da API (IQ_Option ou outro) e grava cada chamada de RECORDED_METHODS com
+    instante, argumentos, resposta e duração. É seguro entre threads (busca paralela, poller).
+    O atributo interno `api` da biblioteca não é exposto: a liquidação passa por check_win_v4,
+    que aqui não bloqueia (responde 'pending' até a biblioteca receber o fechamento) e fica gravada.
+    """
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self._file = _open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == 'api': raise AttributeError(name)
+        attribute = getattr(self.backend, name)
+        if name not in RECORDED_METHODS: return attribute
+
+        def recorded(*args):
+            started, timer = get_clock().time(), time.perf_counter()
+            response = attribute(*args)
+            self._write(started, name, args, response, time.perf_counter() - timer)
+            return response
+        return recorded
+
+    def check_win_v4(self, order_id):
+        started, timer = get_clock().time(), time.perf_counter()
+        closed = getattr(getattr(self.backend, 'api', None), 'socket_option_closed', None)
+        if isinstance(closed, dict) and not closed.get(order_id):
+            response = ('pending', None)
+        else:
+            response = self.backend.check_win_v4(order_id)
+        self._write(started, 'check_win_v4', (order_id,), response, time.perf_counter() - timer)
+        return response
+
+    def _write(self, started, method, args, response, duration):
+        line = json.dumps({'t': round(started, 3), 'm': method, 'a': list(args), 'r': response, 'd': round(duration, 4)},
+                          separators=(',', ':'), default=_to_json)
+        with self._lock:
+            if self._file.closed: return
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayBackend:
+    """
+    Backend que responde com uma gravação de RecordingBackend, na linha do tempo da gravação:
+    o relógio do robô (ou `clock`, se informado) é deslocado em minutos inteiros para o instante
+    gravado; com um SimulatedClock iniciado em `start_time`, o deslocamento é zero.
+
+    - get_candles monta a resposta de todas as velas gravadas do ativo: para cada vela, a versão
+      recebida mais perto do instante pedido (a vela em formação muda ao longo do minuto).
+    - get_all_open_time, get_balance, get_all_ACTIVES_OPCODE: a resposta gravada mais recente.
+    - buy/buy_digital_spot: as respostas gravadas em ordem, por (ativo, direção, duração); as
+      ordens mantêm os ids gravados, então as liquidações casam com as compras.
+    - check_win_v4: o resultado gravado da ordem, depois do instante em que foi recebido.
+
+    speed='recorded' segue o relógio de parede, alinhado ao segundo do minuto gravado, e repete a
+    duração gravada de cada chamada; speed='fast' responde na hora e entrega o resultado das
+    ordens assim que consultado, para rodar com um SimulatedClock.
+    """
+
+    # As respostas saem da gravação, sem estado compartilhado entre chamadas
+    concurrent_get_candles = True
+
+    def __init__(self, path, speed='fast', clock=None):
+        self.path = path
+        self.speed = speed
+        self.clock = clock
+        self.offset = 0
+        records = read_recording(path)
+        self.start_time = records[0]['t'] if records else self._clock_time()
+        self.end_time = records[-1]['t'] if records else self.start_time
+        self.responses = collections.defaultdict(list)
+        self.orders = collections.defaultdict(collections.deque)
+        self.results = collections.defaultdict(list)
+        self.candles = collections.defaultdict(lambda: collections.defaultdict(list))
+        self.candle_calls = collections.defaultdict(list)
+        for record in records:
+            method, args = record['m'], record['a']
+            if method == 'get_candles':
+                self.candle_calls[(args[0], args[1])].append(record)
+                for candle in record['r'] or []:
+                    self.candles[(args[0], args[1])][candle['from']].append((record['t'], candle))
+            elif method == 'buy':
+                self.orders[('buy',) + tuple(args[1:])].append(record)
+            elif method == 'buy_digital_spot':
+                self.orders[('buy_digital_spot', args[0]) + tuple(args[2:])].append(record)
+            elif method == 'check_win_v4':
+                if record['r'][0] != 'pending': self.results[args[0]].append(record)
+            else:
+                self.responses[method].append(record)
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Instante atual na linha do tempo da gravação."""
+        return self._clock_time() + self.offset
+
+    def _clock_time(self):
+        return self.clock() if self.clock else get_clock().time()
+
+    def _latency(self, record):
+        if self.speed == 'recorded' and record is not None: time.sleep(record['d'])
+
+    def _latest(self, method):
+        records = self.responses.get(method)
+        if not records: return None
+        now = self.now()
+        record = next((r for r in reversed(records) if r['t'] <= now), records[0])
+        self._latency(record)
+        return record['r']
+
+    def connect(self):
+        if self.speed == 'recorded':
+            # Começa no mesmo segundo do minuto em que a gravação começou
+            time.sleep((self.start_time - self._clock_time()) % 60)
+        self.offset = round((self.start_time - self._clock_time()) / 60) * 60
+        response = self._latest('connect')
+        return tuple(response) if response else (True, None)
+
+    def change_balance(self, balance_mode):
+        pass
+
+    def get_balance(self):
+        return self._latest('get_balance')
+
+    def get_all_ACTIVES_OPCODE(self):
+        return self._latest('get_all_ACTIVES_OPCODE') or {}
+
+    def get_all_open_time(self):
+        return self._latest('get_all_open_time')
+
+    def get_candles(self, asset, interval, count, endtime):
+        versions = self.candles.get((asset, interval))
+        if not versions:
+            logging.warning(f"REPLAY: sem velas gravadas de {asset} ({interval}s)"); return []
+        at = min(endtime + self.offset, self.now()) if self.speed == 'recorded' else endtime + self.offset
+        last = int(at) // interval * interval
+        froms = sorted(ts for ts in versions if ts <= last)[-count:]
+        candles = []
+        for ts in froms:
+            # A versão recebida mais perto do instante pedido (tolera a diferença de relógio do replay)
+            candle = min(versions[ts], key=lambda version: abs(version[0] - at))[1]
+            candles.append(dict(candle, **{'from': ts - self.offset}))
+        if self.speed == 'recorded':
+            self._latency(next((c for c in reversed(self.candle_calls[(asset, interval)]) if c['t'] <= at), None))
+        return candles
+
+    def _order(self, key):
+        with self._lock:
+            queue = self.orders.get(key)
+            record = queue.popleft() if queue else None
+        if record is None:
+            logging.warning(f"REPLAY: ordem sem gravação: {key}"); return False, None
+        self._latency(record)
+        return tuple(record['r'])
+
+    def buy(self, amount, asset, action, duration):
+        return self._order(('buy', asset, action, duration))
+
+    def buy_digital_spot(self, asset, amount, action, duration):
+        return self._order(('buy_digital_spot', asset, action, duration))
+
+    def check_win_v4(self, order_id):
+        results = self.results.get(order_id)
+        if not results: return 'pending', None
+        record = results[-1]
+        if self.speed == 'recorded':
+            if record['t'] > self.now(): return 'pending', None
+            self._latency(record)
+        return tuple(record['r'])
+
+    # O feed em tempo real não é gravado: no replay o modo streaming não recebe velas
+    def start_candles_stream(self, asset, interval, maxdict):
+        pass
+
+    def stop_candles_stream(self, asset, interval):
+        pass
+
+    def get_realtime_candles(self, asset, interval):
+        return {}
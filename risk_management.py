@@ -2,7 +2,82 @@
 
 import csv
 import os
-from datetime import datetime
+
+from clock import get_clock
+
+class CapitalLadder:
+    """
+    Estado de Soros/Martingale de uma sequência de operações. No modo sequencial há uma
+    escada só; com posições simultâneas, cada ativo tem a sua, para que resultados de
+    ativos diferentes não se misturem no mesmo ciclo.
+    """
+
+    def __init__(self, capital_strategy, soros_max_levels, martingale_multiplier):
+        self.capital_strategy = capital_strategy
+
+        # --- MUDANÇA 1: Simplificação das variáveis de Soros ---
+        self.soros_max_levels = soros_max_levels
+        self.soros_current_level = 0
+        self.soros_initial_stake = 0.0
+        self.soros_profit_to_reinvest = 0.0 # Usaremos esta variável em vez de 'accumulated_profit'
+
+        self.martingale_multiplier = martingale_multiplier
+        self.martingale_current_level = 0
+        self.martingale_base_stake = 0.0
+
+    @property
+    def level(self):
+        if self.capital_strategy == 'soros': return self.soros_current_level
+        if self.capital_strategy == 'martingale': return self.martingale_current_level
+        return 0
+
+    def calculate_stake(self, initial_stake, available_balance):
+        """Calcula o valor da próxima entrada com base na estratégia de capital selecionada."""
+
+        # --- MUDANÇA 2: A fórmula de cálculo dos Soros foi corrigida ---
+        if self.capital_strategy == 'soros' and self.soros_current_level > 0:
+            # A próxima entrada é o VALOR INICIAL do ciclo + o LUCRO da operação anterior.
+            stake = self.soros_initial_stake + self.soros_profit_to_reinvest
+            return min(stake, available_balance)
+
+        if self.capital_strategy == 'martingale' and self.martingale_current_level > 0:
+            stake = self.martingale_base_stake * (self.martingale_multiplier ** self.martingale_current_level)
+            return min(stake, available_balance)
+
+        if self.capital_strategy == 'soros':
+            # Define o valor base que será usado durante todo o ciclo de Soros
+            self.soros_initial_stake = initial_stake
+        elif self.capital_strategy == 'martingale':
+            self.martingale_base_stake = initial_stake
+
+        return initial_stake
+
+    def register_result(self, profit_loss):
+        # --- MUDANÇA 3: A lógica de atualização do estado de Soros foi corrigida ---
+        if self.capital_strategy == 'soros':
+            if profit_loss > 0: # WIN
+                # Guarda apenas o lucro da última operação para reinvestir
+                self.soros_profit_to_reinvest = profit_loss
+                self.soros_current_level += 1
+                # Se atingiu o nível máximo de Soros, reseta o ciclo para pegar os lucros.
+                if self.soros_current_level > self.soros_max_levels:
+                    self.reset_soros_cycle()
+            else: # LOSS or DRAW
+                # Se perder, o ciclo de Soros é interrompido imediatamente.
+                self.reset_soros_cycle()
+
+        elif self.capital_strategy == 'martingale':
+            if profit_loss > 0:
+                self.martingale_current_level = 0
+            elif profit_loss < 0:
+                self.martingale_current_level += 1
+
+    def reset_soros_cycle(self):
+        # --- MUDANÇA 4: A função de reset foi atualizada ---
+        self.soros_current_level = 0
+        self.soros_initial_stake = 0.0
+        self.soros_profit_to_reinvest = 0.0 # Zera o lucro a ser reinvestido
+
 
 class RiskManagement:
     def __init__(self, initial_balance, settings):
@@ -16,24 +91,56 @@ class RiskManagement:
         self.daily_take_profit_percentage = settings.get('take_profit', 5.0)
         
         self.capital_strategy = settings.get('capital_strategy', 'none')
-        
-        # --- MUDANÇA 1: Simplificação das variáveis de Soros ---
         self.soros_max_levels = settings.get('soros_levels', 2)
-        self.soros_current_level = 0
-        self.soros_initial_stake = 0.0
-        self.soros_profit_to_reinvest = 0.0 # Usaremos esta variável em vez de 'accumulated_profit'
-        
         self.martingale_multiplier = settings.get('martingale_multiplier', 2.0)
-        self.martingale_current_level = 0
-        self.martingale_base_stake = 0.0
+
+        # Posições simultâneas: uma escada de Soros/Martingale por ativo e entradas reservadas
+        # no envio da ordem, para o saldo e as metas considerarem o que ainda está em aberto.
+        self.concurrent_positions = settings.get('concurrent_positions', False)
+        self.ladder = self._new_ladder()
+        self.ladders = {}
+        self.open_exposure = {}
 
         self.daily_profit_loss = 0.0
         self.wins = 0
         self.losses = 0
         self.operations = 0
         
-        self.csv_filename = "trade_history.csv"
-        self._initialize_csv()
+        # Sem arquivo (None), nada é gravado: usado pelo backtest
+        self.csv_filename = settings.get('trade_history_file', "trade_history.csv")
+        if self.csv_filename: self._initialize_csv()
+
+    def _new_ladder(self):
+        return CapitalLadder(self.capital_strategy, self.soros_max_levels, self.martingale_multiplier)
+
+    def get_ladder(self, asset=None):
+        """Escada de capital do ativo (ou a escada única, no modo sequencial)."""
+        if not self.concurrent_positions or asset is None: return self.ladder
+        if asset not in self.ladders: self.ladders[asset] = self._new_ladder()
+        return self.ladders[asset]
+
+    # Atributos do modo sequencial, mantidos para quem lê o estado da escada diretamente
+    soros_current_level = property(lambda self: self.ladder.soros_current_level)
+    soros_initial_stake = property(lambda self: self.ladder.soros_initial_stake)
+    soros_profit_to_reinvest = property(lambda self: self.ladder.soros_profit_to_reinvest)
+    martingale_current_level = property(lambda self: self.ladder.martingale_current_level)
+    martingale_base_stake = property(lambda self: self.ladder.martingale_base_stake)
+
+    @property
+    def total_open_exposure(self):
+        return sum(self.open_exposure.values())
+
+    @property
+    def open_risk(self):
+        """
+        Exposição aberta considerada no saldo disponível e nas metas: só com posições simultâneas.
+        No modo sequencial, como antes, o saldo e o P/L só mudam na liquidação.
+        """
+        return self.total_open_exposure if self.concurrent_positions else 0.0
+
+    @property
+    def available_balance(self):
+        return self.current_balance - self.open_risk
 
     def _initialize_csv(self):
         if not os.path.exists(self.csv_filename):
@@ -47,14 +154,10 @@ class RiskManagement:
     def log_trade_to_csv(self, asset, action, stake, result, profit_loss):
         with open(self.csv_filename, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp = get_clock().now().strftime('%Y-%m-%d %H:%M:%S')
             
             strategy_name = self.capital_strategy.capitalize()
-            level = 0
-            if self.capital_strategy == 'soros':
-                level = self.soros_current_level
-            elif self.capital_strategy == 'martingale':
-                level = self.martingale_current_level
+            level = self.get_ladder(asset).level
 
             writer.writerow([
                 timestamp, asset, action, f"{stake:.2f}", result,
@@ -63,39 +166,42 @@ class RiskManagement:
             ])
 
     def calculate_initial_stake(self):
-        if self.current_balance <= 0: return 0
+        balance = self.available_balance
+        if balance <= 0: return 0
         
         if self.stake_mode == 'percentage':
-            return self.current_balance * (self.stake_value / 100)
+            return balance * (self.stake_value / 100)
         elif self.stake_mode == 'fixed':
-            return min(self.stake_value, self.current_balance)
+            return min(self.stake_value, balance)
         return 1.0
 
-    def calculate_stake(self):
+    def calculate_stake(self, asset=None):
         """Calcula o valor da próxima entrada com base na estratégia de capital selecionada."""
-        
-        # --- MUDANÇA 2: A fórmula de cálculo dos Soros foi corrigida ---
-        if self.capital_strategy == 'soros' and self.soros_current_level > 0:
-            # A próxima entrada é o VALOR INICIAL do ciclo + o LUCRO da operação anterior.
-            stake = self.soros_initial_stake + self.soros_profit_to_reinvest
-            return min(stake, self.current_balance)
-
-        if self.capital_strategy == 'martingale' and self.martingale_current_level > 0:
-            stake = self.martingale_base_stake * (self.martingale_multiplier ** self.martingale_current_level)
-            return min(stake, self.current_balance)
-
-        initial_stake = self.calculate_initial_stake()
-        
-        if self.capital_strategy == 'soros':
-            # Define o valor base que será usado durante todo o ciclo de Soros
-            self.soros_initial_stake = initial_stake
-        elif self.capital_strategy == 'martingale':
-            self.martingale_base_stake = initial_stake
-            
-        return initial_stake
-
-    def register_trade_result(self, profit_loss):
+        return self.get_ladder(asset).calculate_stake(self.calculate_initial_stake(), self.available_balance)
+
+    def reserve_stake(self, asset):
+        """
+        Calcula a entrada do ativo e a reserva como exposição aberta até a liquidação.
+        Com posições simultâneas, retorna 0 se, no pior caso (todas as posições abertas
+        perdidas), a entrada ultrapassaria o stop loss diário.
+        """
+        stake = self.calculate_stake(asset)
+        if stake <= 0: return 0
+        if self.concurrent_positions:
+            max_loss = self.initial_balance * (self.daily_stop_loss_percentage / 100)
+            if self.daily_profit_loss - self.total_open_exposure - stake < -max_loss: return 0
+        self.open_exposure[asset] = self.open_exposure.get(asset, 0.0) + stake
+        return stake
+
+    def release_stake(self, asset, stake):
+        """Libera uma entrada reservada (ordem recusada ou já liquidada)."""
+        remaining = self.open_exposure.get(asset, 0.0) - stake
+        if remaining > 1e-9: self.open_exposure[asset] = remaining
+        else: self.open_exposure.pop(asset, None)
+
+    def register_trade_result(self, profit_loss, asset=None, stake=None):
         if profit_loss is None: profit_loss = 0
+        if stake is not None: self.release_stake(asset, stake)
         
         self.daily_profit_loss += profit_loss
         self.current_balance += profit_loss
@@ -105,41 +211,25 @@ class RiskManagement:
         elif profit_loss < 0:
             self.losses += 1
 
-        # --- MUDANÇA 3: A lógica de atualização do estado de Soros foi corrigida ---
-        if self.capital_strategy == 'soros':
-            if profit_loss > 0: # WIN
-                # Guarda apenas o lucro da última operação para reinvestir
-                self.soros_profit_to_reinvest = profit_loss
-                self.soros_current_level += 1
-                # Se atingiu o nível máximo de Soros, reseta o ciclo para pegar os lucros.
-                if self.soros_current_level > self.soros_max_levels:
-                    self.reset_soros_cycle()
-            else: # LOSS or DRAW
-                # Se perder, o ciclo de Soros é interrompido imediatamente.
-                self.reset_soros_cycle()
-        
-        elif self.capital_strategy == 'martingale':
-            if profit_loss > 0:
-                self.martingale_current_level = 0
-            elif profit_loss < 0:
-                self.martingale_current_level += 1
+        self.get_ladder(asset).register_result(profit_loss)
 
-    def reset_soros_cycle(self):
-        # --- MUDANÇA 4: A função de reset foi atualizada ---
-        self.soros_current_level = 0
-        self.soros_initial_stake = 0.0
-        self.soros_profit_to_reinvest = 0.0 # Zera o lucro a ser reinvestido
+    def reset_soros_cycle(self, asset=None):
+        self.get_ladder(asset).reset_soros_cycle()
 
     def get_assertiveness(self):
         if self.operations == 0: return 0.0
         return (self.wins / self.operations) * 100
 
     def check_stop_loss(self):
-        if self.daily_profit_loss >= 0: return False
+        # Pior caso (posições simultâneas): as posições ainda abertas são todas perdidas
+        worst_case = self.daily_profit_loss - self.open_risk
+        if worst_case >= 0: return False
         max_loss = self.initial_balance * (self.daily_stop_loss_percentage / 100)
-        return self.daily_profit_loss <= -max_loss
+        return worst_case <= -max_loss
 
     def check_take_profit(self):
-        if self.daily_profit_loss <= 0: return False
+        # Com posições simultâneas, a meta só conta se continuar de pé mesmo perdendo as abertas
+        worst_case = self.daily_profit_loss - self.open_risk
+        if worst_case <= 0: return False
         min_profit = self.initial_balance * (self.daily_take_profit_percentage / 100)
-        return self.daily_profit_loss >= min_profit
\ No newline at end of file
+        return worst_case >= min_profit
@@ -0,0 +1,250 @@
+# ruin_simulator.py - Monte Carlo de ruína para as configurações de Soros/Martingale
+#
+# Uso: python ruin_simulator.py --win-rate 0.56 --payout 0.85 [--capital-strategy martingale]
+#                               [--martingale-multiplier 2.2] [--soros-levels 2] [--stake-mode percentage]
+#                               [--stake-value 1] [--stop-loss 10] [--take-profit 5] [--balance 1000]
+#                               [--paths 200000] [--trades-per-day 100] [--days 20] [--verify 200]
+#
+# Simula, em paralelo como arrays NumPy, milhares de sequências de operações com a mesma lógica
+# de entrada do RiskManagement no modo sequencial (calculate_stake, reserve_stake,
+# register_trade_result, check_stop_loss, check_take_profit), um RiskManagement novo por dia.
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from risk_management import RiskManagement
+
+# Motivos de encerramento do dia
+OPEN, STOP_LOSS, TAKE_PROFIT, BLOCKED, RUINED = 0, 1, 2, 3, 4
+END_REASONS = {OPEN: 'limite de operações', STOP_LOSS: 'stop loss', TAKE_PROFIT: 'take profit',
+               BLOCKED: 'entrada recusada', RUINED: 'ruína'}
+
+
+def draw_outcomes(rng, shape, win_rate, draw_rate=0.0):
+    """+1 vitória, -1 derrota, 0 empate."""
+    u = rng.random(shape)
+    return np.where(u < win_rate, 1, np.where(u < win_rate + draw_rate, 0, -1)).astype(np.int8)
+
+
+def simulate_day(balance, outcomes, settings, payout, min_stake=1.0):
+    """
+    Um dia de operações para todos os caminhos de uma vez. `balance` (n,) é o saldo no início
+    do dia e `outcomes` (n, t) os resultados das operações. Reproduz o RiskManagement vetorizado;
+    retorna (saldo final, P/L do dia, motivo de encerramento, operações feitas).
+    """
+    n, trades = outcomes.shape
+    stake_mode = settings.get('stake_mode', 'percentage')
+    stake_value = settings.get('stake_value', 1.0)
+    capital_strategy = settings.get('capital_strategy', 'none')
+    soros_max_levels = settings.get('soros_levels', 2)
+    multiplier = settings.get('martingale_multiplier', 2.0)
+
+    initial = balance.copy()
+    balance = balance.copy()
+    max_loss = initial * (settings.get('stop_loss', 10.0) / 100)
+    min_profit = initial * (settings.get('take_profit', 5.0) / 100)
+
+    pnl = np.zeros(n)
+    level = np.zeros(n, dtype=np.int64)
+    cycle_stake = np.zeros(n)   # soros_initial_stake / martingale_base_stake
+    reinvest = np.zeros(n)      # soros_profit_to_reinvest
+    reason = np.where(balance < min_stake, RUINED, OPEN)
+    done = reason != OPEN
+    count = np.zeros(n, dtype=np.int64)
+
+    # Resultados por caminho; o laço trabalha só com os caminhos ainda abertos (rows)
+    out_balance, out_pnl, out_reason, out_count = balance.copy(), pnl.copy(), reason.copy(), count.copy()
+    rows = np.arange(n)
+
+    for t in range(trades):
+        if done.all(): break
+        if done.mean() > 0.5:
+            # Grava os caminhos encerrados e segue só com os abertos
+            out_balance[rows], out_pnl[rows], out_reason[rows], out_count[rows] = balance, pnl, reason, count
+            keep = ~done
+            rows, balance, pnl, reason, count = rows[keep], balance[keep], pnl[keep], reason[keep], count[keep]
+            level, cycle_stake, reinvest, done = level[keep], cycle_stake[keep], reinvest[keep], done[keep]
+            max_loss, min_profit = max_loss[keep], min_profit[keep]
+        active = ~done
+
+        # calculate_initial_stake
+        if stake_mode == 'percentage': initial_stake = balance * (stake_value / 100)
+        elif stake_mode == 'fixed': initial_stake = np.minimum(stake_value, balance)
+        else: initial_stake = np.ones(len(balance))
+        initial_stake = np.where(balance <= 0, 0.0, initial_stake)
+
+        # calculate_stake: em nível 0 o valor inicial vira a base do ciclo
+        in_cycle = level > 0
+        if capital_strategy == 'soros':
+            stake = np.where(in_cycle, np.minimum(cycle_stake + reinvest, balance), initial_stake)
+        elif capital_strategy == 'martingale':
+            stake = np.where(in_cycle, np.minimum(cycle_stake * multiplier ** level, balance), initial_stake)
+        else:
+            stake = initial_stake
+        if capital_strategy in ('soros', 'martingale'):
+            cycle_stake = np.where(active & ~in_cycle, initial_stake, cycle_stake)
+
+        # reserve_stake (modo sequencial): entrada zero não é aberta (o dia trava aí)
+        refused = active & (stake <= 0)
+        reason[refused] = BLOCKED
+        done |= refused
+        trading = active & ~refused
+
+        # register_trade_result
+        outcome = outcomes[rows, t]
+        profit = np.where(outcome > 0, stake * payout, np.where(outcome < 0, -stake, 0.0))
+        profit = np.where(trading, profit, 0.0)
+        pnl += profit
+        balance += profit
+        count += trading
+        won, lost = trading & (profit > 0), trading & (profit < 0)
+
+        if capital_strategy == 'soros':
+            reinvest = np.where(won, profit, reinvest)
+            level = np.where(won, level + 1, level)
+            reset = trading & (~won | (level > soros_max_levels))
+            level, cycle_stake, reinvest = (np.where(reset, 0, level), np.where(reset, 0.0, cycle_stake),
+                                            np.where(reset, 0.0, reinvest))
+        elif capital_strategy == 'martingale':
+            level = np.where(won, 0, np.where(lost, level + 1, level))
+
+        # check_stop_loss / check_take_profit, como no início do próximo ciclo do robô
+        stop = trading & (pnl < 0) & (pnl <= -max_loss)
+        take = trading & (pnl > 0) & (pnl >= min_profit)
+        ruined = trading & (balance < min_stake)
+        reason[stop], reason[take], reason[ruined] = STOP_LOSS, TAKE_PROFIT, RUINED
+        done |= stop | take | ruined
+
+    out_balance[rows], out_pnl[rows], out_reason[rows], out_count[rows] = balance, pnl, reason, count
+    return out_balance, out_pnl, out_reason, out_count
+
+
+def simulate(settings, win_rate, payout, paths=100_000, trades_per_day=100, days=1, draw_rate=0.0,
+             min_stake=1.0, seed=None):
+    """
+    Roda `paths` caminhos por `days` dias. Retorna um dict com saldos finais, P/L diário (paths x days),
+    motivos de encerramento, operações por dia e o dia da ruína (-1 se não arruinou).
+    """
+    rng = np.random.default_rng(seed)
+    balance = np.full(paths, float(settings.get('balance', 1000.0)))
+    daily_pnl = np.zeros((paths, days))
+    reasons = np.zeros((paths, days), dtype=np.int8)
+    trades = np.zeros((paths, days), dtype=np.int64)
+    ruin_day = np.full(paths, -1)
+
+    for day in range(days):
+        alive = ruin_day < 0
+        outcomes = draw_outcomes(rng, (paths, trades_per_day), win_rate, draw_rate)
+        new_balance, pnl, reason, count = simulate_day(balance, outcomes, settings, payout, min_stake)
+        balance = np.where(alive, new_balance, balance)
+        daily_pnl[:, day] = np.where(alive, pnl, 0.0)
+        reasons[:, day] = np.where(alive, reason, RUINED)
+        trades[:, day] = np.where(alive, count, 0)
+        ruin_day[alive & (reason == RUINED)] = day
+
+    return {'balance': balance, 'daily_pnl': daily_pnl, 'reasons': reasons, 'trades': trades, 'ruin_day': ruin_day}
+
+
+def verify_against_risk_management(settings, win_rate, payout, paths=200, trades_per_day=100, min_stake=1.0, seed=0):
+    """
+    Confere simulate_day contra o RiskManagement de verdade, com os mesmos resultados sorteados.
+    Retorna o maior desvio de saldo final encontrado.
+    """
+    rng = np.random.default_rng(seed)
+    outcomes = draw_outcomes(rng, (paths, trades_per_day), win_rate, 0.1)
+    start = float(settings.get('balance', 1000.0))
+    balance, _, _, _ = simulate_day(np.full(paths, start), outcomes, settings, payout, min_stake)
+
+    worst = 0.0
+    with tempfile.TemporaryDirectory() as folder:
+        risk_settings = dict(settings, trade_history_file=os.path.join(folder, 'trade_history.csv'))
+        for path in range(paths):
+            risk_manager = RiskManagement(start, risk_settings)
+            for outcome in outcomes[path]:
+                if risk_manager.current_balance < min_stake: break
+                stake = risk_manager.reserve_stake('ATIVO')
+                if stake <= 0: break
+                profit = stake * payout if outcome > 0 else -stake if outcome < 0 else 0.0
+                risk_manager.register_trade_result(profit, 'ATIVO', stake)
+                if risk_manager.check_stop_loss() or risk_manager.check_take_profit(): break
+            worst = max(worst, abs(risk_manager.current_balance - balance[path]))
+    return worst
+
+
+def summarize(result, settings, trades_per_hour=None):
+    start = settings.get('balance', 1000.0)
+    paths, days = result['daily_pnl'].shape
+    ruined = result['ruin_day'] >= 0
+    lines = [f"Caminhos: {paths} | dias: {days} | saldo inicial: ${start:.2f}",
+             f"Probabilidade de ruína: {ruined.mean() * 100:.3f}%"]
+
+    final = result['balance']
+    q = np.percentile(final, [5, 25, 50, 75, 95])
+    lines.append("Saldo final (p5/p25/p50/p75/p95): " + ' / '.join(f"${v:.2f}" for v in q))
+
+    alive_days = result['reasons'] != RUINED
+    pnl = result['daily_pnl'][alive_days]
+    if len(pnl):
+        q = np.percentile(pnl, [5, 25, 50, 75, 95])
+        lines.append(f"P/L diário: média ${pnl.mean():.2f} | desvio ${pnl.std():.2f} | "
+                     "p5/p25/p50/p75/p95: " + ' / '.join(f"${v:.2f}" for v in q))
+
+    reasons, trades = result['reasons'], result['trades']
+    total_days = reasons.size
+    for code in (TAKE_PROFIT, STOP_LOSS, BLOCKED, OPEN, RUINED):
+        hit = reasons == code
+        if not hit.any(): continue
+        line = f"  Dias encerrados por {END_REASONS[code]}: {hit.sum() / total_days * 100:.2f}%"
+        if code in (TAKE_PROFIT, STOP_LOSS):
+            counts = trades[hit]
+            line += f" | operações até a meta: mediana {np.median(counts):.0f}, p90 {np.percentile(counts, 90):.0f}"
+            if trades_per_hour:
+                line += f" (~{np.median(counts) / trades_per_hour:.1f}h)"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo de ruína para o gerenciamento de capital")
+    parser.add_argument('--win-rate', type=float, required=True, help="Probabilidade de vitória por operação (0-1)")
+    parser.add_argument('--draw-rate', type=float, default=0.0)
+    parser.add_argument('--payout', type=float, default=0.85)
+    parser.add_argument('--balance', type=float, default=1000.0)
+    parser.add_argument('--stake-mode', choices=['percentage', 'fixed'], default='percentage')
+    parser.add_argument('--stake-value', type=float, default=1.0)
+    parser.add_argument('--capital-strategy', choices=['none', 'soros', 'martingale'], default='none')
+    parser.add_argument('--soros-levels', type=int, default=2)
+    parser.add_argument('--martingale-multiplier', type=float, default=2.0)
+    parser.add_argument('--stop-loss', type=float, default=10.0)
+    parser.add_argument('--take-profit', type=float, default=5.0)
+    parser.add_argument('--min-stake', type=float, default=1.0, help="Entrada mínima da corretora; saldo abaixo disso é ruína")
+    parser.add_argument('--paths', type=int, default=100_000)
+    parser.add_argument('--trades-per-day', type=int, default=100)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--trades-per-hour', type=float, help="Converte operações até a meta em horas")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verify', type=int, metavar='CAMINHOS',
+                        help="Confere a simulação contra o RiskManagement em CAMINHOS caminhos antes de rodar")
+    args = parser.parse_args()
+
+    settings = {
+        'balance': args.balance, 'stake_mode': args.stake_mode, 'stake_value': args.stake_value,
+        'capital_strategy': args.capital_strategy, 'soros_levels': args.soros_levels,
+        'martingale_multiplier': args.martingale_multiplier,
+        'stop_loss': args.stop_loss, 'take_profit': args.take_profit,
+    }
+    if args.verify:
+        worst = verify_against_risk_management(settings, args.win_rate, args.payout, args.verify,
+                                               args.trades_per_day, args.min_stake)
+        print(f"Conferência com o RiskManagement ({args.verify} caminhos): maior desvio de saldo ${worst:.2e}")
+
+    result = simulate(settings, args.win_rate, args.payout, args.paths, args.trades_per_day, args.days,
+                      args.draw_rate, args.min_stake, args.seed)
+    print(summarize(result, settings, args.trades_per_hour))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# simulated_broker.py - Corretora simulada em processo, com a interface da IQ_Option
+
+import itertools
+import logging
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from candle_store import CandleStore
+from clock import get_clock
+from iq_option_connection import SettlementPoller
+
+BASE_INTERVAL = 60
+
+
+def _aggregate(timestamps, values, interval):
+    """Agrupa velas M1 em velas de `interval` segundos (buckets alinhados à época, como na API)."""
+    buckets = timestamps // interval * interval
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    aggregated = np.empty((len(values), len(starts)))
+    aggregated[0] = values[0, starts]
+    aggregated[1] = np.maximum.reduceat(values[1], starts)
+    aggregated[2] = np.minimum.reduceat(values[2], starts)
+    aggregated[3] = values[3, ends]
+    aggregated[4] = np.add.reduceat(values[4], starts)
+    return buckets[starts], aggregated
+
+
+class SimulatedBroker:
+    """
+    Substituto local da IQ_Option para IQOptionConnection(backend=...): serve get_all_open_time,
+    get_all_ACTIVES_OPCODE, get_candles, buy/buy_digital_spot, check_win_v4 e o feed em tempo real
+    (start_candles_stream / get_realtime_candles) sem rede.
+
+    As velas vêm de um CandleStore (`store`, histórico gravado) ou, sem ele, de uma série sintética
+    determinística por ativo. Com histórico gravado, o relógio da corretora é deslocado para que a
+    sessão comece em `start` (padrão: 300 velas depois da primeira vela gravada) e os timestamps
+    voltem no tempo de quem chama. `latency` é a espera por chamada, em segundos (número ou dict
+    por método, ex: {'get_candles': 0.08, 'buy': 0.2}), com variação aleatória de até `jitter`.
+    As ordens pagam `payout` e liquidam pela regra de expiração das opções turbo. O tempo é o do
+    relógio do robô (clock.get_clock), ou `clock` (função que retorna o instante), se informado.
+    """
+
+    # Cada get_candles monta a própria resposta: pode ser chamado de várias threads ao mesmo tempo
+    concurrent_get_candles = True
+
+    def __init__(self, assets=None, store=None, payout=0.85, latency=0.0, jitter=0.0, balance=10000.0,
+                 start=None, seed=0, clock=None):
+        self.store = store
+        self.assets = list(assets) if assets else (store.assets() if store else [])
+        self.payout = payout
+        self.latency = latency
+        self.jitter = jitter
+        self.balances = {'PRACTICE': balance, 'REAL': balance}
+        self.balance_mode = 'PRACTICE'
+        self.start = start
+        self.seed = seed
+        self.clock = clock
+        self.offset = 0
+        self.orders = {}
+        self.streams = {}
+        self._order_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    # --- Tempo e latência ---
+
+    def now(self):
+        """Tempo da corretora (no calendário do histórico gravado, se houver)."""
+        return self._clock_time() + self.offset
+
+    def _clock_time(self):
+        return self.clock() if self.clock else get_clock().time()
+
+    def _delay(self, method):
+        latency = self.latency.get(method, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency <= 0: return
+        with self._lock:
+            variation = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        time.sleep(max(0.0, latency * (1 + variation)))
+
+    # --- Preços ---
+
+    def _asset_params(self, asset):
+        h = zlib.crc32(f"{asset}:{self.seed}".encode())
+        return 0.5 + (h % 1000) / 500, (h >> 10) % 628 / 100
+
+    def _synthetic_price(self, asset, t):
+        """Preço contínuo em t: ondas lentas de tendência + ruído determinístico por segundo."""
+        base, phase = self._asset_params(asset)
+        t = np.asarray(t, dtype=np.float64)
+        trend = 0.004 * np.sin(t / 5400 + phase) + 0.002 * np.sin(t / 1300 + 2 * phase) + 0.0008 * np.sin(t / 170 + 3 * phase)
+        noise = np.sin(np.floor(t) * 12.9898 + phase * 78.233) * 43758.5453
+        return base * (1 + trend + 0.0004 * (noise - np.floor(noise) - 0.5))
+
+    def _synthetic_m1(self, asset, first, last, now):
+        timestamps = np.arange(first, last + BASE_INTERVAL, BASE_INTERVAL, dtype=np.int64)
+        opens = self._synthetic_price(asset, timestamps)
+        closes = self._synthetic_price(asset, np.minimum(timestamps + BASE_INTERVAL, now))
+        wiggle = np.abs(self._synthetic_price(asset, timestamps + 17) - opens)
+        highs = np.maximum(opens, closes) + wiggle
+        lows = np.minimum(opens, closes) - wiggle
+        volumes = 50 + (timestamps // BASE_INTERVAL * 7919 % 97)
+        return timestamps, np.vstack([opens, highs, lows, closes, volumes.astype(np.float64)])
+
+    def _m1(self, asset, count, now):
+        """As últimas `count` velas M1 até `now` (tempo da corretora), a última em formação."""
+        last = int(now) // BASE_INTERVAL * BASE_INTERVAL
+        if self.store is None:
+            return self._synthetic_m1(asset, last - (count - 1) * BASE_INTERVAL, last, now)
+
+        timestamps, values = self.store.tail(asset, count, end=last + BASE_INTERVAL)
+        if len(timestamps) and timestamps[-1] == last and now < last + BASE_INTERVAL:
+            # Da vela em formação só a abertura é conhecida
+            values = values.copy()
+            values[1:4, -1] = values[0, -1]; values[4, -1] = 0.0
+        return timestamps, values
+
+    def price_at(self, asset, t):
+        if self.store is None: return float(self._synthetic_price(asset, t))
+        timestamps, values = self.store.tail(asset, 1, end=int(t) // BASE_INTERVAL * BASE_INTERVAL + BASE_INTERVAL)
+        return float(values[0, -1]) if len(timestamps) else None
+
+    # --- Interface da IQ_Option ---
+
+    def connect(self):
+        self._delay('connect')
+        if self.store is not None:
+            if self.start is None:
+                firsts = [self.store.read(asset)[0][:1] for asset in self.assets]
+                firsts = [int(first[0]) for first in firsts if len(first)]
+                self.start = min(firsts) + 300 * BASE_INTERVAL if firsts else self._clock_time()
+            # Deslocamento em minutos inteiros: os segundos da hora local continuam iguais
+            self.offset = int(self.start - self._clock_time()) // BASE_INTERVAL * BASE_INTERVAL
+        logging.info(f"SIMULADOR: {len(self.assets)} ativos, payout {self.payout:.0%}, "
+                     f"{'histórico gravado' if self.store is not None else 'velas sintéticas'}.")
+        return True, None
+
+    def change_balance(self, balance_mode):
+        self.balance_mode = balance_mode
+
+    def get_balance(self):
+        self._delay('get_balance')
+        self._settle_due()
+        return self.balances.get(self.balance_mode)
+
+    def get_all_open_time(self):
+        self._delay('get_all_open_time')
+        opened = {asset: {'open': True} for asset in self.assets}
+        return {'binary': dict(opened), 'turbo': dict(opened), 'digital': dict(opened)}
+
+    def get_all_ACTIVES_OPCODE(self):
+        self._delay('get_all_ACTIVES_OPCODE')
+        return {asset.upper(): opcode for opcode, asset in enumerate(self.assets, 1)}
+
+    def get_candles(self, asset, interval, count, endtime):
+        self._delay('get_candles')
+        if asset not in self.assets: return []
+        now = min(endtime + self.offset, self.now())
+        ratio = max(1, interval // BASE_INTERVAL)
+        timestamps, values = self._m1(asset, count * ratio + ratio, now)
+        if ratio > 1: timestamps, values = _aggregate(timestamps, values, interval)
+        timestamps, values = timestamps[-count:] - self.offset, values[:, -count:]
+        return [{'from': int(ts), 'open': o, 'max': h, 'min': l, 'close': c, 'volume': v}
+                for ts, o, h, l, c, v in zip(timestamps, *values.tolist())]
+
+    def buy(self, amount, asset, action, duration):
+        self._delay('buy')
+        if asset not in self.assets or amount <= 0: return False, None
+        opened_at = self.now()
+        entry = self.price_at(asset, opened_at)
+        if entry is None: return False, None
+        with self._lock:
+            if amount > self.balances[self.balance_mode]: return False, None
+            order_id = next(self._order_ids)
+            self.balances[self.balance_mode] -= amount
+            self.orders[order_id] = {
+                'asset': asset, 'amount': amount, 'action': action.lower(), 'entry': entry,
+                'expiration': SettlementPoller.expected_expiration(opened_at, duration),
+                'balance_mode': self.balance_mode, 'result': None,
+            }
+        return True, order_id
+
+    def buy_digital_spot(self, asset, amount, action, duration):
+        return self.buy(amount, asset, action, duration)
+
+    def check_win_v4(self, order_id):
+        self._delay('check_win_v4')
+        self._settle_due()
+        order = self.orders.get(order_id)
+        if order is None or order['result'] is None: return 'pending', None
+        return order['result']
+
+    def _settle_due(self):
+        now = self.now()
+        with self._lock:
+            due = [order for order in self.orders.values() if order['result'] is None and order['expiration'] <= now]
+        for order in due:
+            close = self.price_at(order['asset'], order['expiration'])
+            won = close > order['entry'] if order['action'] == 'call' else close < order['entry']
+            if close == order['entry']: result = ('equal', 0.0)
+            elif won: result = ('win', round(order['amount'] * self.payout, 2))
+            else: result = ('loose', -order['amount'])
+            with self._lock:
+                if order['result'] is not None: continue
+                order['result'] = result
+                self.balances[order['balance_mode']] += order['amount'] + result[1]
+
+    # --- Feed em tempo real ---
+
+    def start_candles_stream(self, asset, interval, maxdict):
+        self.streams[(asset, interval)] = maxdict
+
+    def stop_candles_stream(self, asset, interval):
+        self.streams.pop((asset, interval), None)
+
+    def get_realtime_candles(self, asset, interval):
+        maxdict = self.streams.get((asset, interval))
+        if maxdict is None: return {}
+        return {candle['from']: candle for candle in self.get_candles(asset, interval, maxdict, self._clock_time())}
+
+
+def synthetic_assets(count, otc=False):
+    """Nomes para testes de carga: SIM0001, SIM0002... (com -OTC se `otc`)."""
+    return [f"SIM{i:04d}" + ("-OTC" if otc else "") for i in range(1, count + 1)]
+
+
+def from_settings(options):
+    """Monta o SimulatedBroker a partir de settings['simulated_broker'] (dict); 'store' é a pasta do CandleStore."""
+    options = dict(options or {})
+    if options.get('store'): options['store'] = CandleStore(options['store'])
+    if isinstance(options.get('assets'), int): options['assets'] = synthetic_assets(options['assets'])
+    return SimulatedBroker(**options)
@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
 import logging
-import pandas_ta as ta
 
-def check_signal(df_m1, df_m5=None):
+from indicators import IndicatorEngine
+
+def check_signal(df_m1, df_m5=None, indicators=None):
     """
     Estratégia Berman: Reversão com Bandas de Bollinger e SMA.
     """
@@ -10,15 +12,17 @@ def check_signal(df_m1, df_m5=None):
     if df_m1.empty or len(df_m1) < 21:
         return None
 
-    # --- Cálculo dos Indicadores ---
+    # --- Cálculo dos Indicadores (compartilhados via motor de indicadores) ---
+    indicators = indicators or IndicatorEngine(df_m1)
     try:
-        df_m1.ta.bbands(close='close', length=20, std=2.0, append=True)
-        df_m1.ta.sma(length=20, append=True)
+        for col, values in indicators.get('bbands', length=20, std=2.0).items():
+            df_m1[col] = values
+        df_m1['SMA_20'] = indicators.get('sma', length=20)
     except Exception as e:
         logging.error(f"[Berman] Erro ao calcular indicadores: {e}")
         return None
 
-    # Nomes das colunas geradas pelo pandas-ta
+    # Nomes das colunas no padrão do pandas-ta
     bb_lower_col = 'BBL_20_2.0'
     bb_upper_col = 'BBU_20_2.0'
     sma_col = 'SMA_20'
@@ -66,4 +70,32 @@ def check_signal(df_m1, df_m5=None):
         signal = "PUT"
         logging.warning(f"SINAL DE VENDA (PUT) DETECTADO! [Estratégia Berman]")
 
-    return signal
\ No newline at end of file
+    return signal
+
+
+def generate_signals(df, window=110):
+    """
+    Versão vetorizada de check_signal para uma série inteira: o sinal de cada vela t é o que
+    check_signal daria na janela que o robô monta na abertura de t, as `window` - 1 velas
+    fechadas anteriores mais t em formação (só a abertura conhecida). Retorna um array com
+    "CALL", "PUT" ou None por vela (None onde não há janela completa).
+    """
+    signals = np.full(len(df), None, dtype=object)
+    if len(df) < window or window < 21:
+        return signals
+
+    indicators = IndicatorEngine(df)
+    bands = indicators.get('bbands', length=20, std=2.0)
+    # Vela atual em formação: abertura = fechamento, e a SMA a inclui
+    sma = indicators.get('sma', length=20, last='open').to_numpy()
+    open_price = close_price = df['open'].to_numpy()
+    close_prev = df['close'].shift(1).to_numpy()
+    bb_lower_prev = bands['BBL_20_2.0'].shift(1).to_numpy()
+    bb_upper_prev = bands['BBU_20_2.0'].shift(1).to_numpy()
+
+    call = (close_prev < bb_lower_prev) & (open_price > sma) & (close_price > sma)
+    put = (close_prev > bb_upper_prev) & (open_price < sma) & (close_price < sma)
+    signals[call] = "CALL"
+    signals[put] = "PUT"
+    signals[:window - 1] = None
+    return signals
@@ -1,22 +1,38 @@
 # strategies/strategy_bollinger_rsi.py (Versão Final Corrigida)
 
+import numpy as np
 import pandas as pd
 import logging
-import pandas_ta as ta
 
-def check_signal(df_m1, df_m5=None):
-    """Estratégia 1: Reversão com Bandas de Bollinger e RSI."""
-    if df_m1.empty or len(df_m1) < 21:
+from indicators import IndicatorEngine
+
+# --- Parâmetros da Estratégia ---
+BB_LENGTH = 20
+BB_STD = 2.5 # std 2.5 é o padrão
+RSI_PERIOD = 4
+RSI_OVERSOLD = 20 # Nível padrão de sobrevenda
+RSI_OVERBOUGHT = 80 # Nível padrão de sobrecompra
+
+# Valores padrão dos parâmetros ajustáveis (sweep.py pode sobrescrevê-los via `params`)
+DEFAULT_PARAMS = {'bb_length': BB_LENGTH, 'bb_std': BB_STD, 'rsi_period': RSI_PERIOD,
+                  'rsi_oversold': RSI_OVERSOLD, 'rsi_overbought': RSI_OVERBOUGHT}
+
+def check_signal(df_m1, df_m5=None, indicators=None, params=None):
+    """Estratégia 1: Reversão com Bandas de Bollinger e RSI. `params` sobrescreve parte de DEFAULT_PARAMS."""
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    if df_m1.empty or len(df_m1) < p['bb_length'] + 1:
         return None
 
-    # --- CÁLCULO DOS INDICADORES ---
-    df_m1.ta.bbands(close='close', length=20, std=2.5, append=True) # std 2.5 é o padrão
-    df_m1.ta.rsi(close='close', length=4, append=True)
+    # --- CÁLCULO DOS INDICADORES (compartilhados via motor de indicadores) ---
+    indicators = indicators or IndicatorEngine(df_m1)
+    for col, values in indicators.get('bbands', length=p['bb_length'], std=p['bb_std']).items():
+        df_m1[col] = values
+    rsi_col = f"RSI_{p['rsi_period']}"
+    df_m1[rsi_col] = indicators.get('rsi', length=p['rsi_period'])
 
     # Nomes das colunas devem corresponder EXATAMENTE ao cálculo acima
-    bb_lower_col = 'BBL_20_2.5'
-    bb_upper_col = 'BBU_20_2.5'
-    rsi_col = 'RSI_4'
+    bb_lower_col = f"BBL_{p['bb_length']}_{float(p['bb_std'])}"
+    bb_upper_col = f"BBU_{p['bb_length']}_{float(p['bb_std'])}"
 
     if not all([bb_lower_col in df_m1.columns, bb_upper_col in df_m1.columns, rsi_col in df_m1.columns]):
         logging.error("[Bollinger+RSI] Falha ao calcular indicadores.")
@@ -33,16 +49,43 @@ def check_signal(df_m1, df_m5=None):
     
     # Condição de Compra (CALL) com RSI < 20
     is_below_band = open_price_current < bb_lower_current
-    is_oversold = rsi_previous < 20 # Nível padrão de sobrevenda
+    is_oversold = rsi_previous < p['rsi_oversold']
     if is_below_band and is_oversold:
         signal = "CALL"
         logging.warning(f"SINAL DE COMPRA (CALL) DETECTADO! [Bollinger+RSI]")
 
     # Condição de Venda (PUT) com RSI > 80
     is_above_band = open_price_current > bb_upper_current
-    is_overbought = rsi_previous > 80 # Nível padrão de sobrecompra
+    is_overbought = rsi_previous > p['rsi_overbought']
     if is_above_band and is_overbought:
         signal = "PUT"
         logging.warning(f"SINAL DE VENDA (PUT) DETECTADO! [Bollinger+RSI]")
 
-    return signal
\ No newline at end of file
+    return signal
+
+
+def generate_signals(df, window=110, params=None, indicators=None):
+    """
+    Versão vetorizada de check_signal para uma série inteira: o sinal de cada vela t é o que
+    check_signal daria na janela que o robô monta na abertura de t (`window` - 1 velas fechadas
+    mais t em formação, só com a abertura). As bandas incluem a vela em formação; o RSI da vela
+    anterior é calculado como na janela (ver windowed_rsi). Retorna "CALL", "PUT" ou None por vela.
+    Um IndicatorEngine da série pode ser reaproveitado entre chamadas com `params` diferentes.
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    signals = np.full(len(df), None, dtype=object)
+    if len(df) < window or window < p['bb_length'] + 1:
+        return signals
+
+    indicators = indicators or IndicatorEngine(df)
+    bands = indicators.get('bbands', length=p['bb_length'], std=p['bb_std'], last='open')
+    suffix = f"{p['bb_length']}_{float(p['bb_std'])}"
+    rsi_previous = indicators.get('rsi', length=p['rsi_period'], window=window, offset=1).to_numpy()
+    open_price = df['open'].to_numpy()
+
+    call = (open_price < bands[f'BBL_{suffix}'].to_numpy()) & (rsi_previous < p['rsi_oversold'])
+    put = (open_price > bands[f'BBU_{suffix}'].to_numpy()) & (rsi_previous > p['rsi_overbought'])
+    signals[call] = "CALL"
+    signals[put] = "PUT"
+    signals[:window - 1] = None
+    return signals
@@ -1,60 +1,20 @@
 import pandas as pd
-import pandas_ta as ta
 import logging
 
+from indicators import IndicatorEngine
+
 # --- Parâmetros da Estratégia ---
 EMA_PERIOD = 100
 RSI_PERIOD = 14
 FIB_LOW = 0.382
 FIB_HIGH = 0.618
 
-# --- Funções Auxiliares ---
-
-def _manual_fractal(df):
-    """
-    Calcula manualmente o indicador Fractal para identificar topos e fundos.
-    Isso garante que a estratégia funcione independentemente da versão da biblioteca.
-    """
-    df['FRACTALS_5_high'] = None
-    df['FRACTALS_5_low'] = None
-    for i in range(2, len(df) - 2):
-        is_high_fractal = (df['high'].iloc[i] > df['high'].iloc[i-2] and df['high'].iloc[i] > df['high'].iloc[i-1] and
-                           df['high'].iloc[i] > df['high'].iloc[i+1] and df['high'].iloc[i] > df['high'].iloc[i+2])
-        if is_high_fractal:
-            df.loc[df.index[i], 'FRACTALS_5_high'] = df['high'].iloc[i]
-
-        is_low_fractal = (df['low'].iloc[i] < df['low'].iloc[i-2] and df['low'].iloc[i] < df['low'].iloc[i-1] and
-                          df['low'].iloc[i] < df['low'].iloc[i+1] and df['low'].iloc[i] < df['low'].iloc[i+2])
-        if is_low_fractal:
-            df.loc[df.index[i], 'FRACTALS_5_low'] = df['low'].iloc[i]
-    return df
+# Valores padrão dos parâmetros ajustáveis (sweep.py pode sobrescrevê-los via `params`)
+DEFAULT_PARAMS = {'ema_period': EMA_PERIOD, 'rsi_period': RSI_PERIOD, 'fib_low': FIB_LOW, 'fib_high': FIB_HIGH}
 
-def _find_last_swing(df, trend_type):
-    """
-    Encontra o último swing de alta (low -> high) ou de baixa (high -> low) usando fractais.
-    """
-    fractal_highs = df[df['FRACTALS_5_high'].notna()]
-    fractal_lows = df[df['FRACTALS_5_low'].notna()]
-    
-    if trend_type == 'bullish':
-        if len(fractal_lows) < 1 or len(fractal_highs) < 1: return None, None
-        last_high_time = fractal_highs.index[-1]
-        relevant_lows = fractal_lows[fractal_lows.index < last_high_time]
-        if relevant_lows.empty: return None, None
-        last_low_time = relevant_lows.index[-1]
-        return df.loc[last_low_time, 'low'], df.loc[last_high_time, 'high']
-
-    elif trend_type == 'bearish':
-        if len(fractal_lows) < 1 or len(fractal_highs) < 1: return None, None
-        last_low_time = fractal_lows.index[-1]
-        relevant_highs = fractal_highs[fractal_highs.index < last_low_time]
-        if relevant_highs.empty: return None, None
-        last_high_time = relevant_highs.index[-1]
-        return df.loc[last_low_time, 'low'], df.loc[last_high_time, 'high']
-        
-    return None, None
+# --- Funções Auxiliares ---
 
-def _calculate_fib(swing_high, swing_low):
+def _calculate_fib(swing_high, swing_low, fib_low=FIB_LOW, fib_high=FIB_HIGH):
     """
     Calcula os níveis de Fibonacci para um movimento de preço.
     """
@@ -62,46 +22,51 @@ def _calculate_fib(swing_high, swing_low):
         return None
     diff = swing_high - swing_low
     return {
-        'bullish_38_2': swing_high - FIB_LOW * diff,
-        'bullish_61_8': swing_high - FIB_HIGH * diff,
-        'bearish_38_2': swing_low + FIB_LOW * diff,
-        'bearish_61_8': swing_low + FIB_HIGH * diff,
+        'bullish_38_2': swing_high - fib_low * diff,
+        'bullish_61_8': swing_high - fib_high * diff,
+        'bearish_38_2': swing_low + fib_low * diff,
+        'bearish_61_8': swing_low + fib_high * diff,
     }
 
 # --- Função Principal da Estratégia ---
 
-def check_signal(df_m1, df_m5=None):
+def check_signal(df_m1, df_m5=None, indicators=None, params=None):
     """
     Estratégia aprimorada que combina EMA, Fibonacci em swings de Fractais e RSI.
+    `params` sobrescreve parte de DEFAULT_PARAMS (usado pelo sweep.py).
     """
     try:
-        if len(df_m1) < EMA_PERIOD:
+        p = dict(DEFAULT_PARAMS, **(params or {}))
+        if len(df_m1) < p['ema_period']:
             return None
 
-        df = df_m1.copy()
+        # df_m1 é uma visão das velas só desta estratégia: as colunas derivadas ficam nela
+        df = df_m1
+        indicators = indicators or IndicatorEngine(df_m1)
         
-        # --- 1. Calcular Indicadores ---
-        df.ta.ema(length=EMA_PERIOD, append=True, col_names=('EMA_100',))
-        df.ta.rsi(length=RSI_PERIOD, append=True, col_names=('RSI_14',))
-        df = _manual_fractal(df) # Usa nossa função manual de fractal
+        # --- 1. Calcular Indicadores (compartilhados via motor de indicadores) ---
+        ema_col, rsi_col = f"EMA_{p['ema_period']}", f"RSI_{p['rsi_period']}"
+        df[ema_col] = indicators.get('ema', length=p['ema_period'])
+        df[rsi_col] = indicators.get('rsi', length=p['rsi_period'])
 
         # --- 2. Coletar Dados da Vela Atual ---
         current_close = df['close'].iloc[-1]
-        current_ema = df['EMA_100'].iloc[-1]
-        current_rsi = df['RSI_14'].iloc[-1]
+        current_ema = df[ema_col].iloc[-1]
+        current_rsi = df[rsi_col].iloc[-1]
         
         if pd.isna(current_ema) or pd.isna(current_rsi):
             return None
 
         # --- 3. Determinar a Tendência e Encontrar o Swing Relevante ---
         trend = 'bullish' if current_close > current_ema else 'bearish'
-        swing_low, swing_high = _find_last_swing(df, trend)
+        # Swings de fractais: rastreador incremental por ativo quando disponível, vetorizado caso contrário
+        swing_low, swing_high = indicators.latest('swings', window=len(df))[trend]
         
         if swing_low is None or swing_high is None:
             return None # Não encontrou um swing válido para traçar Fibonacci
 
         # --- 4. Calcular Fibonacci com base no Swing ---
-        fib_levels = _calculate_fib(swing_high, swing_low)
+        fib_levels = _calculate_fib(swing_high, swing_low, p['fib_low'], p['fib_high'])
         if fib_levels is None:
             return None
 
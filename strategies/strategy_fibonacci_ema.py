@@ -10,6 +10,8 @@ import numpy as np
 from typing import Tuple, Optional, Dict, Any
 import logging
 
+from indicators import IndicatorEngine
+
 class FibonacciEMAStrategy:
     """
     Estratégia de Opções Binárias - Fibonacci EMA (1 Minuto)
@@ -30,19 +32,25 @@ class FibonacciEMAStrategy:
         """Calcula a Média Móvel Exponencial"""
         return prices.ewm(span=period, adjust=False).mean()
     
-    def find_swing_points(self, data: pd.DataFrame, lookback: int = 10) -> Tuple[Optional[Dict], Optional[Dict]]:
+    def find_swing_points(self, data: pd.DataFrame, lookback: int = 10,
+                          indicators: Optional[IndicatorEngine] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
         """
         Identifica pontos de máxima e mínima recentes para traçar Fibonacci
         
         Args:
             data: DataFrame com OHLC
             lookback: Períodos para trás para buscar pontos significativos
+            indicators: Motor de indicadores compartilhado (opcional); usa o rastreador de swings
         
         Returns:
             Tuple com (ponto_alto, ponto_baixo)
         """
         if len(data) < lookback * 2:
             return None, None
+
+        if indicators is not None:
+            swings = indicators.latest('swings', window=len(data), lookback=lookback * 2)
+            return swings['high_point'], swings['low_point']
             
         # Últimas velas para análise
         recent_data = data.tail(lookback * 2)
@@ -124,12 +132,13 @@ class FibonacciEMAStrategy:
         
         return 'up' if current_price > ema_value else 'down'
     
-    def generate_signal(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def generate_signal(self, data: pd.DataFrame, indicators: Optional[IndicatorEngine] = None) -> Dict[str, Any]:
         """
         Gera sinal de entrada baseado na estratégia Fibonacci EMA
         
         Args:
             data: DataFrame com colunas ['open', 'high', 'low', 'close', 'timestamp']
+            indicators: Motor de indicadores compartilhado (opcional)
         
         Returns:
             Dict com informações do sinal
@@ -147,9 +156,12 @@ class FibonacciEMAStrategy:
             signal_info['reasoning'] = 'Dados insuficientes para análise'
             return signal_info
         
-        # Calcular EMA 100
-        data = data.copy()
-        data['ema_100'] = self.calculate_ema(data['close'], self.ema_period)
+        # Calcular EMA 100 (cópia rasa: a coluna derivada não vaza para o DataFrame do chamador)
+        data = data.copy(deep=False)
+        if indicators is not None:
+            data['ema_100'] = indicators.get('ewm', span=self.ema_period)
+        else:
+            data['ema_100'] = self.calculate_ema(data['close'], self.ema_period)
         
         # Preço e EMA atuais
         current_price = data['close'].iloc[-1]
@@ -164,7 +176,7 @@ class FibonacciEMAStrategy:
             return signal_info
         
         # Encontrar pontos de swing para Fibonacci
-        high_point, low_point = self.find_swing_points(data)
+        high_point, low_point = self.find_swing_points(data, indicators=indicators)
         
         if not high_point or not low_point or high_point['price'] == low_point['price']:
             signal_info['reasoning'] = 'Pontos de swing inválidos ou não encontrados'
@@ -292,14 +304,14 @@ class FibonacciEMAStrategy:
 # entre as chamadas da função check_signal.
 _strategy_instance = FibonacciEMAStrategy()
 
-def check_signal(df_m1, df_m5=None):
+def check_signal(df_m1, df_m5=None, indicators=None):
     """
     Função wrapper que o bot_core irá chamar.
     Ela utiliza a instância da classe para gerar o sinal.
     """
     try:
         # Gera o dicionário de sinal completo a partir da classe
-        signal_dict = _strategy_instance.generate_signal(df_m1.copy())
+        signal_dict = _strategy_instance.generate_signal(df_m1, indicators)
         
         # Extrai o sinal ('CALL', 'PUT' ou None) para retornar ao bot_core
         signal = signal_dict.get('signal')
@@ -1,9 +1,12 @@
+import numpy as np
 import pandas as pd
-import pandas_ta as ta  # Alterado de 'ta' para 'pandas_ta'
 from typing import Dict, Optional
 from datetime import datetime
 import logging
 
+from clock import get_clock
+from indicators import IndicatorEngine
+
 class PullbackStrategy:
     """
     Estratégia de Pullback para Opções Binárias - Gráfico 1 minuto
@@ -14,36 +17,42 @@ class PullbackStrategy:
     - Confirma entrada com volume e padrão de candlestick
     """
     
+    DEFAULT_CONFIG = {
+        'ema_fast': 20,
+        'ema_slow': 50,
+        'rsi_period': 14,
+        'stoch_k': 14,
+        'stoch_d': 3,
+        'volume_threshold': 1.2,  # Volume 20% acima da média de 20 períodos
+        'min_pullback_size': 0.0003, # Pullback mínimo (ajustado para ser uma fração do preço)
+        'max_pullback_size': 0.0080, # Pullback máximo
+        'time_between_signals_seconds': 300, # 5 minutos entre sinais
+    }
+
     def __init__(self, config: Dict = None):
-        self.config = config or {
-            'ema_fast': 20,
-            'ema_slow': 50,
-            'rsi_period': 14,
-            'stoch_k': 14,
-            'stoch_d': 3,
-            'volume_threshold': 1.2,  # Volume 20% acima da média de 20 períodos
-            'min_pullback_size': 0.0003, # Pullback mínimo (ajustado para ser uma fração do preço)
-            'max_pullback_size': 0.0080, # Pullback máximo
-            'time_between_signals_seconds': 300, # 5 minutos entre sinais
-        }
+        # Uma configuração parcial completa-se com os valores padrão
+        self.config = dict(self.DEFAULT_CONFIG, **(config or {}))
         
         self.last_signal_time = None
         
-    def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calcula todos os indicadores necessários usando pandas_ta"""
+    def calculate_indicators(self, df: pd.DataFrame, indicators: Optional[IndicatorEngine] = None) -> pd.DataFrame:
+        """Calcula todos os indicadores necessários usando o motor de indicadores compartilhado"""
+        indicators = indicators or IndicatorEngine(df)
         
         # EMAs
-        df.ta.ema(length=self.config['ema_fast'], append=True, col_names=(f'ema_{self.config["ema_fast"]}',))
-        df.ta.ema(length=self.config['ema_slow'], append=True, col_names=(f'ema_{self.config["ema_slow"]}',))
+        df[f'ema_{self.config["ema_fast"]}'] = indicators.get('ema', length=self.config['ema_fast'])
+        df[f'ema_{self.config["ema_slow"]}'] = indicators.get('ema', length=self.config['ema_slow'])
         
         # RSI
-        df.ta.rsi(length=self.config['rsi_period'], append=True, col_names=(f'rsi_{self.config["rsi_period"]}',))
+        df[f'rsi_{self.config["rsi_period"]}'] = indicators.get('rsi', length=self.config['rsi_period'])
         
         # Estocástico
-        stoch = df.ta.stoch(k=self.config['stoch_k'], d=self.config['stoch_d'], append=True)
+        stoch = indicators.get('stoch', k=self.config['stoch_k'], d=self.config['stoch_d'], smooth_k=3)
+        for col in stoch.columns:
+            df[col] = stoch[col]
         
         # Volume
-        df['volume_ma'] = df['volume'].rolling(window=20).mean()
+        df['volume_ma'] = indicators.get('sma', length=20, column='volume')
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
         # Padrões de candlestick
@@ -109,10 +118,17 @@ class PullbackStrategy:
         
         time_ok = True
         if self.last_signal_time:
-            time_diff = datetime.now() - self.last_signal_time
+            time_diff = self.signal_time(df) - self.last_signal_time
             time_ok = time_diff.total_seconds() > self.config['time_between_signals_seconds']
         
         return volume_ok and candle_ok and time_ok
+
+    @staticmethod
+    def signal_time(df: pd.DataFrame) -> datetime:
+        """Horário da última vela; o intervalo entre sinais segue o tempo das velas (vale também no replay)"""
+        if isinstance(df.index, pd.DatetimeIndex):
+            return df.index[-1].to_pydatetime()
+        return get_clock().now()
         
     def generate_signal(self, df: pd.DataFrame) -> Optional[str]:
         """Gera o sinal final ('CALL' ou 'PUT') para o robô"""
@@ -131,9 +147,61 @@ class PullbackStrategy:
             return None
             
         # Se todas as condições foram atendidas, retorna a direção e atualiza o tempo
-        self.last_signal_time = datetime.now()
+        self.last_signal_time = self.signal_time(df)
         return pullback_info.get('direction')
 
+    def generate_signals(self, df: pd.DataFrame, window: int = 110, indicators: Optional[IndicatorEngine] = None) -> np.ndarray:
+        """
+        Versão vetorizada de generate_signal para uma série inteira: o sinal de cada vela t é o que
+        check_signal daria na janela que o robô monta na abertura de t (`window` - 1 velas fechadas
+        mais t em formação: abertura, máxima, mínima e fechamento iguais, volume 0), começando sem
+        sinal anterior. EMAs e RSI são calculados como na janela (ver windowed_ema/windowed_rsi).
+        """
+        signals = np.full(len(df), None, dtype=object)
+        if len(df) < window or window < self.config['ema_slow']:
+            return signals
+
+        cfg = self.config
+        indicators = indicators or IndicatorEngine(df)
+        ema_fast = indicators.get('ema', length=cfg['ema_fast'], window=window, last='open').to_numpy()
+        ema_slow = indicators.get('ema', length=cfg['ema_slow'], window=window, last='open').to_numpy()
+        previous = np.vstack([indicators.get('ema', length=cfg['ema_fast'], window=window, offset=k).to_numpy() for k in range(1, 6)])
+        counts = (~np.isnan(previous)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ema_fast_prev = np.where(counts > 0, np.nansum(previous, axis=0) / counts, np.nan)  # média sem NaN, como Series.mean
+        rsi = indicators.get('rsi', length=cfg['rsi_period'], window=window, last='open').to_numpy()
+        stoch = indicators.get('stoch', k=cfg['stoch_k'], d=cfg['stoch_d'], smooth_k=3, last='open')
+        stoch_k = stoch[f"STOCHk_{cfg['stoch_k']}_{cfg['stoch_d']}_3"].to_numpy()
+
+        price = df['open'].to_numpy()
+        uptrend = (ema_fast > ema_slow) & (price > ema_fast) & (ema_fast > ema_fast_prev)
+        downtrend = ~uptrend & (ema_fast < ema_slow) & (price < ema_fast) & (ema_fast < ema_fast_prev)
+
+        high_5_bars = df['high'].rolling(5).max().shift(1).to_numpy()
+        low_5_bars = df['low'].rolling(5).min().shift(1).to_numpy()
+        up_size, down_size = high_5_bars - price, price - low_5_bars
+        call = uptrend & (cfg['min_pullback_size'] <= up_size) & (up_size <= cfg['max_pullback_size']) & (rsi < 50) & (stoch_k < 50)
+        put = downtrend & (cfg['min_pullback_size'] <= down_size) & (down_size <= cfg['max_pullback_size']) & (rsi > 50) & (stoch_k > 50)
+
+        # A vela em formação não tem volume nem corpo: com ela a confirmação de confirm_entry falha
+        volume = np.zeros(len(df))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volume_ratio = volume / indicators.get('sma', length=20, column='volume', last=0.0).to_numpy()
+        body_ratio = np.zeros(len(df))
+        confirmed = (volume_ratio > cfg['volume_threshold']) & (body_ratio > 0.6)
+
+        candidates = (call | put) & confirmed
+        candidates[:window - 1] = False
+
+        # Intervalo mínimo entre sinais, pelo horário das velas
+        times = df.index.as_unit('s').asi8 if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df)) * 60
+        last_time = None
+        for t in np.flatnonzero(candidates):
+            if last_time is not None and times[t] - last_time <= cfg['time_between_signals_seconds']: continue
+            signals[t] = "CALL" if call[t] else "PUT"
+            last_time = times[t]
+        return signals
+
 
 # =============================================================================
 # Bloco de Integração com o Robô
@@ -141,18 +209,40 @@ class PullbackStrategy:
 
 # Cria uma única instância da classe para manter o estado (last_signal_time)
 _strategy_instance = PullbackStrategy()
+# Instâncias para configurações alternativas (sweep.py), cada uma com o seu estado
+_instances = {}
+
+# Valores padrão dos parâmetros ajustáveis (sweep.py pode sobrescrevê-los via `params`)
+DEFAULT_PARAMS = dict(PullbackStrategy.DEFAULT_CONFIG)
+
+def _get_instance(params=None):
+    if not params: return _strategy_instance
+    key = tuple(sorted(params.items()))
+    if key not in _instances: _instances[key] = PullbackStrategy(params)
+    return _instances[key]
+
+def reset_state():
+    """Esquece o último sinal emitido (início de um replay ou de outro ativo no backtest)."""
+    _strategy_instance.last_signal_time = None
+    _instances.clear()
+
+def generate_signals(df, window=110, params=None, indicators=None):
+    """Sinais de todas as velas de uma vez (ver PullbackStrategy.generate_signals)."""
+    return _get_instance(params).generate_signals(df, window, indicators)
 
-def check_signal(df_m1, df_m5=None):
+def check_signal(df_m1, df_m5=None, indicators=None, params=None):
     """
     Função wrapper que o bot_core irá chamar.
     Ela utiliza a instância da classe para gerar o sinal.
     """
     try:
+        strategy = _get_instance(params)
         # 1. Calcula os indicadores necessários
-        data_with_indicators = _strategy_instance.calculate_indicators(df_m1.copy())
+        # df_m1 é uma visão das velas só desta estratégia: as colunas derivadas ficam nela
+        data_with_indicators = strategy.calculate_indicators(df_m1, indicators)
         
         # 2. Gera o sinal
-        signal = _strategy_instance.generate_signal(data_with_indicators)
+        signal = strategy.generate_signal(data_with_indicators)
         
         if signal:
             logging.warning(f"SINAL {signal} DETECTADO! [Pullback Complexo]")
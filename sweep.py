@@ -0,0 +1,226 @@
+# sweep.py - Varredura de parâmetros das estratégias sobre o histórico local
+#
+# Uso: python sweep.py --data pasta_com_csvs --strategy strategy_bollinger_rsi.py
+#                      [--grid bb_std=2.0,2.5,3.0 rsi_oversold=15,20] [--random 50 --seed 1]
+#                      [--assets EURUSD GBPUSD] [--workers N] [--payout 0.85] [--stake 1.0]
+#                      [--min-trades 20] [--top 20] [--output ranking.csv] [--start 2024-01-01 --end 2024-04-01]
+#
+# --data aceita uma pasta de CSVs ou um CandleStore (como no backtest.py).
+#
+# Sem --grid, usa a grade padrão da estratégia (DEFAULT_GRIDS). Os parâmetros são os de
+# DEFAULT_PARAMS de cada módulo; os não informados ficam com o valor padrão.
+
+import argparse
+import ast
+import csv
+import itertools
+import logging
+import math
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtest import (WINDOW, HistoryWalker, history_files, load_history, load_strategies,
+                      new_strategy_stats, parse_date, settle)
+from candles import enable_copy_on_write, read_only_view, to_frame
+from indicators import IndicatorEngine
+
+DEFAULT_GRIDS = {
+    'strategy_bollinger_rsi.py': {
+        'bb_length': [20],
+        'bb_std': [2.0, 2.5, 3.0],
+        'rsi_period': [4, 7, 14],
+        'rsi_oversold': [15, 20, 25, 30],
+        'rsi_overbought': [70, 75, 80, 85],
+    },
+    'strategy_pullback_complex.py': {
+        'ema_fast': [10, 20],
+        'ema_slow': [50],
+        'rsi_period': [7, 14],
+        'volume_threshold': [1.0, 1.2, 1.5],
+        'min_pullback_size': [0.0001, 0.0003, 0.0005],
+        'time_between_signals_seconds': [120, 300],
+    },
+    'strategy_fibo_ema_rsi.py': {
+        'ema_period': [50, 100],
+        'rsi_period': [7, 14],
+        'fib_low': [0.236, 0.382, 0.5],
+        'fib_high': [0.618, 0.786],
+    },
+}
+
+# Combinações sem sentido são descartadas antes de rodar
+CONSTRAINTS = {
+    'strategy_bollinger_rsi.py': lambda p: p['rsi_oversold'] < p['rsi_overbought'],
+    'strategy_pullback_complex.py': lambda p: p['ema_fast'] < p['ema_slow'] <= WINDOW,
+    'strategy_fibo_ema_rsi.py': lambda p: p['fib_low'] < p['fib_high'] and p['ema_period'] <= WINDOW,
+}
+
+# Histórico e motor de indicadores por arquivo, mantidos no processo entre lotes de configurações:
+# configurações que compartilham um subparâmetro (ex: mesmo bb_length, outro bb_std) reaproveitam o cálculo
+_history = {}
+
+
+def parse_grid(items):
+    """Converte ['bb_std=2.0,2.5', 'rsi_period=4'] em {'bb_std': [2.0, 2.5], 'rsi_period': [4]}."""
+    grid = {}
+    for item in items or []:
+        key, _, values = item.partition('=')
+        grid[key.strip()] = [ast.literal_eval(v.strip()) for v in values.split(',') if v.strip()]
+    return grid
+
+
+def expand_grid(strategy_name, grid, random_count=None, seed=None):
+    """Lista as configurações da grade (produto cartesiano), ou uma amostra aleatória dela."""
+    keys = list(grid)
+    constraint = CONSTRAINTS.get(strategy_name, lambda p: True)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    configs = [config for config in configs if constraint(config)]
+    if random_count and random_count < len(configs):
+        configs = random.Random(seed).sample(configs, random_count)
+        # Mantém a ordem da grade: lotes vizinhos compartilham mais indicadores
+        configs.sort(key=lambda config: [grid[k].index(config[k]) for k in keys])
+    return configs
+
+
+def load_cached(path):
+    if path not in _history:
+        timestamps, values = load_history(path)
+        frame = to_frame(timestamps, values)
+        _history[path] = {'timestamps': timestamps, 'values': values, 'frame': frame,
+                          'indicators': IndicatorEngine(frame), 'walker': None}
+    return _history[path]
+
+
+def trade_signals(module, configs, history):
+    """
+    Para cada configuração, o array de sinais alinhado à vela em que a ordem seria aberta: o sinal
+    da janela com t em formação abre a ordem em t, como no backtest. Com generate_signals, a série inteira
+    de uma vez; sem ele, check_signal vela a vela nas janelas do HistoryWalker, com um motor de
+    indicadores por vela compartilhado entre todas as configurações.
+    """
+    n = len(history['timestamps'])
+    if hasattr(module, 'generate_signals'):
+        arrays = []
+        for config in configs:
+            arrays.append(module.generate_signals(history['frame'], WINDOW, params=config, indicators=history['indicators']))
+        return arrays
+
+    if history['walker'] is None: history['walker'] = HistoryWalker(history['timestamps'], history['values'])
+    walker = history['walker']
+    arrays = [np.full(n, None, dtype=object) for _ in configs]
+    for f in range(WINDOW - 1, n):
+        df_m1 = walker.m1_window(f)
+        indicators = IndicatorEngine(df_m1)
+        for signals, config in zip(arrays, configs):
+            try:
+                # As estratégias ajustáveis não usam o M5; None evita montá-lo a cada vela
+                signals[f] = module.check_signal(read_only_view(df_m1), None, indicators=indicators, params=config)
+            except Exception:
+                signals[f] = None
+    return arrays
+
+
+def score_signals(signals, timestamps, open_price, close_price, payout, stake):
+    """Opera os sinais com entrada fixa, uma posição por vez, como o backtest (pula a vela seguinte)."""
+    stats = new_strategy_stats()
+    last = -2
+    for f in np.flatnonzero(np.not_equal(signals, None)):
+        if f == last + 1 or f < WINDOW - 1: continue
+        if timestamps[f] - timestamps[f - WINDOW + 1] != (WINDOW - 1) * 60: continue
+        profit = settle(signals[f], open_price[f], close_price[f], stake, payout)
+        stats['trades'] += 1; stats['pnl'] += profit
+        stats['wins' if profit > 0 else 'losses' if profit < 0 else 'draws'] += 1
+        last = f
+    return stats
+
+
+def evaluate_chunk(strategy_name, asset, path, configs, payout, stake):
+    """Avalia um lote de configurações de uma estratégia num ativo (roda em um processo do pool)."""
+    logging.disable(logging.CRITICAL)
+    module = sys.modules[load_strategies([strategy_name])[strategy_name].__module__]
+    if hasattr(module, 'reset_state'): module.reset_state()
+    history = load_cached(path)
+    open_price, close_price = history['values'][0], history['values'][3]
+    return [score_signals(signals, history['timestamps'], open_price, close_price, payout, stake)
+            for signals in trade_signals(module, configs, history)]
+
+
+def run_sweep(data_dir, strategy_name, configs, assets=None, workers=None, payout=0.85, stake=1.0,
+              start=None, end=None):
+    """
+    Distribui (ativo, lote de configurações) por um pool de processos, com lotes suficientes para
+    ocupar todos os núcleos. Retorna [(configuração, estatísticas somadas entre os ativos)].
+    """
+    files = history_files(data_dir, assets, start, end)
+    workers = workers or os.cpu_count() or 1
+    chunks_per_asset = max(1, min(len(configs), math.ceil(2 * workers / max(1, len(files)))))
+    chunk_size = math.ceil(len(configs) / chunks_per_asset)
+
+    totals = [new_strategy_stats() for _ in configs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=enable_copy_on_write) as pool:
+        futures = []
+        for asset, path in files.items():
+            for chunk_start in range(0, len(configs), chunk_size):
+                chunk = configs[chunk_start:chunk_start + chunk_size]
+                futures.append((chunk_start, pool.submit(evaluate_chunk, strategy_name, asset, path, chunk, payout, stake)))
+        for chunk_start, future in futures:
+            for offset, stats in enumerate(future.result()):
+                for key, value in stats.items():
+                    totals[chunk_start + offset][key] += value
+    return list(zip(configs, totals))
+
+
+def rank(results, min_trades=0):
+    """Ordena por assertividade e depois P/L, ignorando configurações com poucas operações."""
+    rows = []
+    for config, stats in results:
+        if stats['trades'] < min_trades: continue
+        win_rate = stats['wins'] / stats['trades'] * 100 if stats['trades'] else 0.0
+        rows.append(dict(config, operacoes=stats['trades'], wins=stats['wins'], losses=stats['losses'],
+                         draws=stats['draws'], assertividade=round(win_rate, 2), pl=round(stats['pnl'], 2)))
+    rows.sort(key=lambda row: (row['assertividade'], row['pl']), reverse=True)
+    return rows
+
+
+def main():
+    enable_copy_on_write()
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros das estratégias")
+    parser.add_argument('--data', required=True, help="Pasta com um CSV de velas M1 por ativo, ou um CandleStore")
+    parser.add_argument('--start', help="Início do período no CandleStore (AAAA-MM-DD, UTC)")
+    parser.add_argument('--end', help="Fim do período no CandleStore (AAAA-MM-DD, exclusivo)")
+    parser.add_argument('--strategy', required=True, choices=sorted(DEFAULT_GRIDS))
+    parser.add_argument('--grid', nargs='+', help="Valores por parâmetro, ex: bb_std=2.0,2.5 rsi_oversold=15,20")
+    parser.add_argument('--random', type=int, help="Amostra N configurações da grade em vez de rodar todas")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--assets', nargs='+')
+    parser.add_argument('--workers', type=int, default=None, help="Processos (padrão: todos os núcleos)")
+    parser.add_argument('--payout', type=float, default=0.85)
+    parser.add_argument('--stake', type=float, default=1.0)
+    parser.add_argument('--min-trades', type=int, default=20)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="Grava o ranking completo em CSV")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRIDS[args.strategy], **parse_grid(args.grid))
+    configs = expand_grid(args.strategy, grid, args.random, args.seed)
+    print(f"{len(configs)} configurações de {args.strategy} em {args.workers or os.cpu_count()} processo(s)")
+
+    rows = rank(run_sweep(args.data, args.strategy, configs, args.assets, args.workers, args.payout, args.stake,
+                          parse_date(args.start), parse_date(args.end)), args.min_trades)
+    for position, row in enumerate(rows[:args.top], 1):
+        params = ' '.join(f"{key}={row[key]}" for key in grid)
+        print(f"{position:>3}. {row['assertividade']:>6.2f}% | P/L {row['pl']:>9.2f} | {row['operacoes']:>5} ops | {params}")
+
+    if args.output and rows:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader(); writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+from app_paths import app_data_path
+
+
+def test_data_files_live_next_to_the_scripts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert app_data_path('metadata_cache.json') == os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metadata_cache.json')
+
+
+def test_frozen_build_uses_the_executable_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, 'frozen', True, raising=False)
+    monkeypatch.setattr(sys, 'executable', str(tmp_path / 'ROBO.exe'))
+    assert app_data_path('candle_store') == str(tmp_path / 'candle_store')
@@ -0,0 +1,91 @@
+import queue
+import threading
+
+import pytest
+
+from asset_resolver import AssetResolver, PreferredAssets, split_variant
+from bot_core import BotCore
+from iq_option_connection import AssetSnapshot
+
+PREFERRED = ["EURUSD", "EURJPY", "GBPUSD", "AUDCAD", "USDJPY", "EURGBP", "USDCAD"]
+# Nomes como a API já publicou: sufixos conhecidos, outros sufixos e '-OTC' no meio do nome
+NAMES = ['EURUSD', 'EURUSD-op', 'EURUSD-OTC', 'EURJPY-L', 'GBPUSDX', 'GBPUSD-OTC-L', 'AUDCAD_op', 'USDJPY-OTC',
+         'USDCHF', 'EURGBP', 'CADJPY-op', 'USDCAD-OTC', 'EURUSD-L']
+OPCODES = {name: code for code, name in enumerate(PREFERRED + ['EURUSD-OTC', 'USDJPY-OTC', 'USDCAD-OTC', 'USDCHF'])}
+
+
+class FakeConnection:
+    def __init__(self, binary, opcodes):
+        self.snapshot = AssetSnapshot(binary, {}, 0.0, AssetResolver(binary, opcodes))
+        self.opcodes = opcodes
+
+    def get_open_assets(self):
+        return self.snapshot
+
+    def is_asset_available_for_trading(self, asset_name, option_type):
+        return self.snapshot.binary.get(asset_name, {}).get('open', False)
+
+    def is_asset_supported_by_library(self, asset_name):
+        return asset_name.upper() in {str(name).upper() for name in self.opcodes}
+
+
+def old_find_active_assets(market_type, conn, preferred):
+    """A descoberta antes do AssetResolver: laços de prefixo e substring, como referência."""
+    active_assets = []
+    all_open_binary = conn.get_open_assets().binary
+    if market_type == 'REGULAR':
+        for api_asset_name in all_open_binary.keys():
+            if '-OTC' in api_asset_name: continue
+            for preferred_asset in preferred:
+                if api_asset_name.startswith(preferred_asset):
+                    if conn.is_asset_available_for_trading(api_asset_name, 'binary') and conn.is_asset_supported_by_library(preferred_asset):
+                        active_assets.append({'name': api_asset_name, 'type': 'binary'})
+                        break
+    else:
+        for asset in [asset + "-OTC" for asset in preferred]:
+            if conn.is_asset_available_for_trading(asset, 'binary') and conn.is_asset_supported_by_library(asset):
+                active_assets.append({'name': asset, 'type': 'binary'})
+    if not active_assets and market_type == 'REGULAR':
+        for asset in all_open_binary.keys():
+            if '-OTC' in asset and conn.is_asset_available_for_trading(asset, 'binary'):
+                active_assets.append({'name': asset, 'type': 'binary'})
+                if len(active_assets) >= 5: break
+    return active_assets
+
+
+def new_bot(preferred):
+    return BotCore({'preferred_assets': preferred}, queue.Queue(), queue.Queue(), threading.Event())
+
+
+@pytest.mark.parametrize('market_type', ['REGULAR', 'OTC'])
+@pytest.mark.parametrize('closed', [(), ('EURUSD', 'EURJPY-L'), tuple(NAMES)])
+def test_discovery_matches_the_old_loops(market_type, closed):
+    binary = {name: {'open': name not in closed} for name in NAMES}
+    conn = FakeConnection(binary, OPCODES)
+    assert new_bot(PREFERRED).find_active_assets(market_type, conn) == old_find_active_assets(market_type, conn, PREFERRED)
+
+
+def test_regular_without_preferred_falls_back_to_any_otc_name():
+    binary = {name: {'open': True} for name in ['USDCHF', 'GBPUSD-OTC-L', 'NZDUSD-OTC', 'EURUSD-OTC']}
+    conn = FakeConnection(binary, OPCODES)
+    found = new_bot(PREFERRED).find_active_assets('REGULAR', conn)
+    assert [asset['name'] for asset in found] == ['GBPUSD-OTC-L', 'NZDUSD-OTC', 'EURUSD-OTC']
+    assert found == old_find_active_assets('REGULAR', conn, PREFERRED)
+
+
+def test_preferred_match_uses_the_index_then_the_first_prefix():
+    resolver = AssetResolver(NAMES, OPCODES)
+    preferred = PreferredAssets(['EUR', 'EURUSD', 'GBPUSD'])
+    assert preferred.match(resolver.resolve('EURUSD-op')) == 'EURUSD'
+    assert preferred.match(resolver.resolve('EURUSD-L')) == 'EUR'
+    assert preferred.match(resolver.resolve('GBPUSDX')) == 'GBPUSD'
+    assert preferred.match(resolver.resolve('USDCHF')) is None
+
+
+def test_split_variant_and_otc_flag():
+    assert split_variant('EURUSD-OTC') == ('EURUSD', '-OTC')
+    assert split_variant('EURUSD-op') == ('EURUSD', '-op')
+    assert split_variant('EURUSD-L') == ('EURUSD-L', '')
+    resolver = AssetResolver(NAMES, OPCODES)
+    assert resolver.otc == ('EURUSD-OTC', 'GBPUSD-OTC-L', 'USDJPY-OTC', 'USDCAD-OTC')
+    assert resolver.is_supported('EURUSD-OTC') and not resolver.is_supported('EURUSD-L')
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import strategies.strategy_berman as berman
+from backtest import M5_INTERVAL, WINDOW, HistoryWalker, backtest_asset, settle
+from candles import to_frame
+from conftest import pullback_history, synthetic_history, write_csv
+
+SETTINGS = {'balance': 1000.0, 'stake_mode': 'fixed', 'stake_value': 1.0, 'stop_loss': 100.0, 'take_profit': 100.0}
+VECTORIZED_STRATEGIES = ['strategy_berman.py', 'strategy_bollinger_rsi.py', 'strategy_pullback_complex.py']
+
+
+def test_m5_window_never_looks_ahead():
+    timestamps, values = synthetic_history(600, seed=1)
+    walker = HistoryWalker(timestamps, values)
+    for f in range(WINDOW - 1, len(walker)):
+        m5 = walker.m5_window(f)
+        starts = m5.index.as_unit('s').asi8
+        assert starts[-1] == timestamps[f] // M5_INTERVAL * M5_INTERVAL
+        assert (starts <= timestamps[f]).all()
+        # O bucket em formação agrega as velas fechadas antes de `f` e só a abertura de `f`
+        first = int(np.searchsorted(timestamps, starts[-1]))
+        assert m5['close'].iloc[-1] == values[0, f]
+        assert m5['high'].iloc[-1] == values[1, first:f].max(initial=values[0, f])
+        assert m5['volume'].iloc[-1] == values[4, first:f].sum()
+
+
+def test_m1_window_ends_on_the_forming_candle():
+    # Como get_candles(ativo, 60, 110, agora) na virada do minuto: 109 velas fechadas + a que abriu
+    timestamps, values = synthetic_history(300, seed=1)
+    walker = HistoryWalker(timestamps, values)
+    df = walker.m1_window(200)
+    assert len(df) == WINDOW
+    assert df.index.as_unit('s').asi8[-1] == timestamps[200]
+    np.testing.assert_array_equal(df.iloc[:-1].to_numpy().T, values[:, 200 - WINDOW + 1:200])
+    assert df.iloc[-1].tolist() == [values[0, 200]] * 4 + [0.0]
+    # A janela é uma cópia: o histórico não é alterado
+    assert values[3, 200] != values[0, 200]
+
+
+@pytest.mark.parametrize('history', [synthetic_history(2000, seed=0), synthetic_history(2000, seed=1), pullback_history()],
+                         ids=['synthetic-0', 'synthetic-1', 'pullback'])
+def test_per_bar_and_vectorized_modes_make_the_same_trades(history, tmp_path):
+    path = tmp_path / 'EURUSD.csv'
+    write_csv(path, *history)
+    per_bar = backtest_asset('EURUSD', str(path), SETTINGS, VECTORIZED_STRATEGIES, vectorized=False)
+    vectorized = backtest_asset('EURUSD', str(path), SETTINGS, VECTORIZED_STRATEGIES, vectorized=True)
+    assert per_bar['trades']
+    assert per_bar['trades'] == vectorized['trades']
+    assert per_bar['final_balance'] == pytest.approx(vectorized['final_balance'])
+
+
+def test_order_opens_on_the_signal_candle(tmp_path):
+    timestamps, values = synthetic_history(2000, seed=0)
+    path = tmp_path / 'EURUSD.csv'
+    write_csv(path, timestamps, values)
+    result = backtest_asset('EURUSD', str(path), SETTINGS, ['strategy_berman.py'], vectorized=True)
+    signals = berman.generate_signals(to_frame(timestamps, values), WINDOW)
+    index = {int(ts): i for i, ts in enumerate(timestamps)}
+    for start, _, signal, profit in result['trades']:
+        f = index[start]
+        # Aberta na vela do sinal e liquidada no fechamento dela
+        assert signals[f] == signal
+        assert profit == settle(signal, values[0, f], values[3, f], SETTINGS['stake_value'], 0.85)
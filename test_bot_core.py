@@ -0,0 +1,99 @@
+import queue
+import threading
+
+import pytest
+
+from bot_core import BotCore
+from candles import to_frame
+from conftest import synthetic_history
+from order_tracker import OrderTracker
+from risk_management import RiskManagement
+
+SETTINGS = {'stake_mode': 'fixed', 'stake_value': 10.0, 'stop_loss': 10.0, 'take_profit': 50.0,
+            'trade_history_file': None, 'concurrent_positions': True, 'max_open_positions': 2,
+            'candle_store_dir': None, 'metadata_cache_file': None}
+HISTORY = synthetic_history(300)
+
+
+class FakeBroker:
+    """Conexão falsa do BotCore: aceita (ou recusa) as ordens e guarda os callbacks de liquidação."""
+
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.orders = []
+        self.callbacks = {}
+
+    def buy_binary(self, amount, asset, action, duration):
+        if not self.accept: return None
+        self.orders.append((asset, amount, action))
+        return len(self.orders)
+
+    def watch_order(self, order_id, duration, on_result, opened_at=None):
+        self.callbacks[order_id] = on_result
+
+
+def always_call(df_m1, indicators=None):
+    return 'CALL'
+
+
+def window(minute):
+    """Janela de 110 velas M1 terminando no minuto `minute` do histórico sintético."""
+    return to_frame(HISTORY[0][minute - 109:minute + 1], HISTORY[1][:, minute - 109:minute + 1])
+
+
+def make_bot(iq, settings=SETTINGS):
+    bot = BotCore(dict(settings, preferred_assets=['EURUSD', 'GBPUSD', 'USDJPY']),
+                  queue.Queue(), queue.Queue(), threading.Event())
+    risk = RiskManagement(1000.0, bot.settings)
+    bot.order_tracker = OrderTracker(iq, lambda order, profit: bot.on_order_settled(order, profit, risk))
+    return bot, risk
+
+
+def evaluate(bot, iq, risk, asset, minute):
+    return bot.evaluate_asset(iq, {'name': asset, 'type': 'binary'}, window(minute), {'always': always_call}, risk)
+
+
+def test_one_position_per_asset_and_max_open_positions():
+    iq = FakeBroker()
+    bot, risk = make_bot(iq)
+    assert evaluate(bot, iq, risk, 'EURUSD', 150)
+    # Mesmo ativo com posição aberta: não opera de novo, nem em vela nova
+    assert not evaluate(bot, iq, risk, 'EURUSD', 151)
+    assert evaluate(bot, iq, risk, 'GBPUSD', 151)
+    # Limite de 2 posições abertas
+    assert not evaluate(bot, iq, risk, 'USDJPY', 151)
+    assert [order[0] for order in iq.orders] == ['EURUSD', 'GBPUSD']
+    assert risk.total_open_exposure == pytest.approx(20.0)
+
+
+def test_settlement_on_another_thread_releases_the_stake():
+    iq = FakeBroker()
+    bot, risk = make_bot(iq)
+    assert evaluate(bot, iq, risk, 'EURUSD', 150)
+    assert risk.open_exposure == {'EURUSD': 10.0}
+
+    thread = threading.Thread(target=iq.callbacks[1], args=(8.5,))
+    thread.start(); thread.join(1)
+    assert risk.open_exposure == {}
+    assert risk.current_balance == pytest.approx(1008.5)
+    updates = [bot.update_queue.get_nowait() for _ in range(bot.update_queue.qsize())]
+    assert updates[-1]['wins'] == 1 and updates[-1]['status'] == 'Rodando'
+    # Posição liquidada: o ativo volta a operar na vela seguinte, mas não na mesma
+    assert not evaluate(bot, iq, risk, 'EURUSD', 150)
+    assert evaluate(bot, iq, risk, 'EURUSD', 151)
+
+
+def test_refused_order_releases_the_stake():
+    iq = FakeBroker(accept=False)
+    bot, risk = make_bot(iq)
+    assert not evaluate(bot, iq, risk, 'EURUSD', 150)
+    assert risk.open_exposure == {}
+    assert bot.order_tracker.open_count() == 0
+
+
+def test_sequential_mode_allows_a_single_open_position():
+    iq = FakeBroker()
+    settings = {key: value for key, value in SETTINGS.items() if key not in ('concurrent_positions', 'max_open_positions')}
+    bot, risk = make_bot(iq, settings)
+    assert evaluate(bot, iq, risk, 'EURUSD', 150)
+    assert not evaluate(bot, iq, risk, 'GBPUSD', 150)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from candle_store import SECONDS_PER_DAY, CandleStore
+from iq_option_connection import IQOptionConnection, window_covered
+from simulated_broker import SimulatedBroker
+
+DAY = 19730 * SECONDS_PER_DAY  # 2024-01-08 00:00 UTC
+
+
+def minutes(first, count):
+    timestamps = first + 60 * np.arange(count, dtype=np.int64)
+    values = np.vstack([1.0 + np.arange(count) / 1000] * 4 + [np.ones(count)])
+    return timestamps, values
+
+
+def test_read_spans_days_and_skips_empty_slots(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EURUSD', *minutes(DAY + SECONDS_PER_DAY - 600, 20))
+    store.write('EURUSD', *minutes(DAY + 2 * SECONDS_PER_DAY + 3600, 5))
+    timestamps, values = store.read('EURUSD')
+    assert len(timestamps) == 25 and (np.diff(timestamps) > 0).all()
+    timestamps, _ = store.read('EURUSD', DAY + SECONDS_PER_DAY, DAY + 2 * SECONDS_PER_DAY)
+    assert len(timestamps) == 10
+
+
+def test_tail_returns_the_last_candles_before_end(tmp_path):
+    store = CandleStore(str(tmp_path))
+    timestamps, values = minutes(DAY + SECONDS_PER_DAY - 300, 10)
+    store.write('EURUSD', timestamps, values)
+    tail, tail_values = store.tail('EURUSD', 4, end=int(timestamps[8]))
+    np.testing.assert_array_equal(tail, timestamps[4:8])
+    np.testing.assert_array_equal(tail_values, values[:, 4:8])
+    assert store.last_timestamp('EURUSD') == timestamps[-1]
+
+
+def test_tail_opens_only_the_newest_days(tmp_path):
+    store = CandleStore(str(tmp_path))
+    for day in range(10):
+        store.write('EURUSD', *minutes(DAY + day * SECONDS_PER_DAY, 60))
+    reader = CandleStore(str(tmp_path))
+    timestamps, _ = reader.tail('EURUSD', 100)
+    assert len(timestamps) == 100
+    assert sorted(day for _, day in reader._partitions) == [DAY // SECONDS_PER_DAY + 8, DAY // SECONDS_PER_DAY + 9]
+
+
+def test_reads_map_read_only_and_writes_reopen(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EURUSD', *minutes(DAY, 5))
+    reader = CandleStore(str(tmp_path))
+    reader.read('EURUSD')
+    partition = reader._partitions[('EURUSD', DAY // SECONDS_PER_DAY)]
+    assert not partition.writable and partition.timestamps.mode == 'r'
+    with pytest.raises(ValueError):
+        partition.timestamps[0] = 1
+
+    reader.write('EURUSD', *minutes(DAY + 300, 2))
+    assert reader._partitions[('EURUSD', DAY // SECONDS_PER_DAY)].writable
+    assert len(reader.read('EURUSD')[0]) == 7
+
+
+def test_only_single_day_reads_are_zero_copy(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EURUSD', *minutes(DAY + SECONDS_PER_DAY - 600, 20))
+    timestamps, values = store.read('EURUSD', DAY + SECONDS_PER_DAY - 600, DAY + SECONDS_PER_DAY)
+    partition = store._partitions[('EURUSD', DAY // SECONDS_PER_DAY)]
+    assert np.shares_memory(timestamps, partition.timestamps) and np.shares_memory(values, partition.values)
+
+    timestamps, values = store.read('EURUSD')
+    assert len(timestamps) == 20
+    assert not np.shares_memory(timestamps, partition.timestamps)
+    assert not timestamps.flags.writeable and not values.flags.writeable
+
+
+@pytest.mark.parametrize('cached, missing, count, covered', [
+    (110, 1, 110, True), (110, 111, 110, False), (100, 11, 110, True), (100, 10, 110, False), (110, 0, 110, True),
+])
+def test_window_covered(cached, missing, count, covered):
+    assert window_covered(cached, missing, count) == covered
+
+
+def test_short_store_seed_is_completed_by_one_incremental_fetch(tmp_path):
+    # 100 velas no histórico e 11 a buscar (a última gravada de novo): cobre a janela de 110
+    store = CandleStore(str(tmp_path))
+    store.write('SIM0001', *minutes(DAY, 100))
+    broker = SimulatedBroker(['SIM0001'], clock=lambda: DAY + 109 * 60 + 30)
+    conn = IQOptionConnection(None, None, broker)
+    conn.connect()
+    conn.attach_candle_store(store)
+    calls = []
+    fetch = conn._fetch_candles
+    conn._fetch_candles = lambda *args: calls.append(args[2]) or fetch(*args)
+    df = conn.get_candles('SIM0001', 60, 110, DAY + 109 * 60 + 30)
+    assert len(df) == 110
+    assert calls == [11]
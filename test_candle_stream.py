@@ -0,0 +1,54 @@
+import pandas as pd
+
+from candle_stream import CandleStream, FakeCandleFeed
+from iq_option_connection import IQOptionConnection
+from simulated_broker import SimulatedBroker
+
+START = 1704672000
+
+
+def test_closed_candle_event_when_next_candle_appears():
+    feed = FakeCandleFeed()
+    stream = CandleStream(feed, interval=60)
+    stream.set_assets(['EURUSD', 'GBPUSD'])
+    feed.push_tick('EURUSD', 1.10, START + 5)
+    feed.push_tick('GBPUSD', 1.25, START + 5)
+    stream.poll_once()
+    feed.push_tick('EURUSD', 1.11, START + 40)
+    stream.poll_once()
+    assert stream.wait_closed_candle(timeout=0) is None
+
+    feed.push_tick('EURUSD', 1.12, START + 61)
+    stream.poll_once()
+    assert stream.wait_closed_candle(timeout=0) == ('EURUSD', START)
+    assert stream.wait_closed_candle(timeout=0) is None
+
+
+def test_unsubscribed_asset_stops_emitting():
+    feed = FakeCandleFeed()
+    stream = CandleStream(feed, interval=60)
+    stream.set_assets(['EURUSD'])
+    feed.push_tick('EURUSD', 1.10, START)
+    stream.poll_once()
+    stream.set_assets([])
+    feed.push_tick('EURUSD', 1.10, START + 60)
+    stream.poll_once()
+    assert stream.wait_closed_candle(timeout=0) is None
+
+
+def test_streamed_candles_match_a_fresh_fetch():
+    now = [START + 30]
+    broker = SimulatedBroker(['SIM0001'], clock=lambda: now[0])
+    conn = IQOptionConnection(None, None, broker)
+    conn.connect()
+    conn.get_candles('SIM0001', 60, 110, now[0])
+    conn.start_candle_stream(['SIM0001'], 60)
+    try:
+        now[0] += 125
+        streamed = conn.get_streamed_candles('SIM0001', 60, 110, now[0])
+    finally:
+        conn.stop_candle_stream()
+
+    fresh = IQOptionConnection(None, None, broker)
+    fresh.connect()
+    pd.testing.assert_frame_equal(streamed, fresh.get_candles('SIM0001', 60, 110, now[0]))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from candles import CandleBuffer, candles_to_arrays, resample_candles, to_frame
+
+START = 1704672000
+
+
+def bars(first, count, price=1.0):
+    timestamps = START + 60 * np.arange(first, first + count, dtype=np.int64)
+    prices = price + np.arange(first, first + count) / 1000
+    values = np.vstack([prices] * 4 + [np.ones(count)])
+    return timestamps, values
+
+
+def test_append_past_the_end_compacts_and_keeps_the_last_candles():
+    buffer = CandleBuffer(10)
+    for minute in range(0, 57, 3):
+        buffer.append(*bars(minute, 3))
+    timestamps, values = buffer.arrays()
+    expected_timestamps, expected_values = bars(47, 10)
+    assert len(buffer) == 10
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    np.testing.assert_array_equal(values, expected_values)
+    assert buffer.end <= 2 * buffer.capacity
+
+
+def test_forming_candle_is_replaced_not_duplicated():
+    buffer = CandleBuffer(10)
+    buffer.append(*bars(0, 5))
+    timestamps, values = bars(4, 2, price=2.0)
+    buffer.append(timestamps, values)
+    assert len(buffer) == 6
+    assert buffer.last_timestamp == START + 5 * 60
+    np.testing.assert_array_equal(buffer.arrays()[1][:, -2:], values)
+
+
+def test_views_taken_before_compaction_stay_valid():
+    buffer = CandleBuffer(4)
+    buffer.append(*bars(0, 4))
+    frame = buffer.to_frame()
+    snapshot = frame.copy()
+    for minute in range(4, 20):
+        buffer.append(*bars(minute, 1))
+    pd.testing.assert_frame_equal(frame, snapshot)
+
+
+def test_arrays_are_read_only():
+    buffer = CandleBuffer(4)
+    buffer.append(*bars(0, 4))
+    timestamps, values = buffer.arrays()
+    assert not timestamps.flags.writeable and not values.flags.writeable
+
+
+def test_candles_to_arrays_sorts_by_time():
+    candles = [{'from': START + 60, 'open': 2, 'max': 2, 'min': 2, 'close': 2, 'volume': 1},
+               {'from': START, 'open': 1, 'max': 1, 'min': 1, 'close': 1, 'volume': 1}]
+    timestamps, values = candles_to_arrays(candles)
+    np.testing.assert_array_equal(timestamps, [START, START + 60])
+    np.testing.assert_array_equal(values[3], [1, 2])
+    assert candles_to_arrays([]) is None
+
+
+def test_resample_drops_incomplete_first_bucket():
+    df = to_frame(*bars(3, 12))
+    m5 = resample_candles(df, 300)
+    assert list(m5.index) == [pd.Timestamp(START + 300, unit='s'), pd.Timestamp(START + 600, unit='s')]
+    assert m5['volume'].iloc[0] == 5
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from clock import SimulatedClock
+
+START = 1704672000.0
+
+
+def start_sleeper(clock, timeout, log, name):
+    """Thread de fundo que dorme `timeout` segundos pelo relógio e anota quando acordou."""
+    condition = threading.Condition()
+
+    def run():
+        try:
+            with condition:
+                notified = clock.wait_on(condition, timeout)
+            log.append((name, clock.time(), notified))
+        finally:
+            clock.thread_finished()
+
+    clock.thread_started()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, condition
+
+
+def test_advance_to_without_sleepers_jumps_to_target():
+    clock = SimulatedClock(START)
+    clock.advance_to(START + 30)
+    assert clock.time() == START + 30
+    # Nunca volta no tempo
+    clock.advance_to(START + 10)
+    assert clock.time() == START + 30
+    clock.sleep(15)
+    assert clock.time() == START + 45
+
+
+def test_sleepers_wake_in_deadline_order():
+    clock = SimulatedClock(START)
+    log = []
+    threads = [start_sleeper(clock, 20, log, 'b')[0], start_sleeper(clock, 5, log, 'a')[0]]
+    clock.advance_to(START + 60)
+    for thread in threads: thread.join(1)
+    assert log == [('a', START + 5, False), ('b', START + 20, False)]
+    assert clock.time() == START + 60
+
+
+def test_advance_waits_for_new_threads_to_sleep():
+    clock = SimulatedClock(START)
+    log = []
+    ready = threading.Event()
+
+    def run():
+        try:
+            # Trabalho antes do primeiro wait_on: o relógio não pode passar do prazo enquanto isso
+            ready.wait(1); time.sleep(0.05)
+            condition = threading.Condition()
+            with condition:
+                clock.wait_on(condition, 10)
+            log.append(clock.time())
+        finally:
+            clock.thread_finished()
+
+    clock.thread_started()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.set()
+    clock.advance_to(START + 60)
+    thread.join(1)
+    assert log == [START + 10]
+
+
+def test_advance_returns_only_after_woken_thread_goes_idle():
+    clock = SimulatedClock(START)
+    done = []
+    condition = threading.Condition()
+
+    def run():
+        try:
+            with condition:
+                clock.wait_on(condition, 5)
+            time.sleep(0.05)
+            done.append(clock.time())
+        finally:
+            clock.thread_finished()
+
+    clock.thread_started()
+    threading.Thread(target=run, daemon=True).start()
+    clock.advance_to(START + 5)
+    assert done == [START + 5]
+
+
+def test_notified_sleeper_leaves_the_queue():
+    clock = SimulatedClock(START)
+    log = []
+    thread, condition = start_sleeper(clock, 30, log, 'a')
+    # Espera a thread dormir antes de notificar (o avanço nulo só volta com ela parada)
+    clock.advance_to(START)
+    with condition:
+        condition.notify()
+    thread.join(1)
+    assert log == [('a', START, True)]
+    # O prazo antigo não acorda mais ninguém nem trava o avanço
+    clock.advance_to(START + 60)
+    assert clock.time() == START + 60
+
+
+def test_stop_at_sets_event_when_time_arrives():
+    clock = SimulatedClock(START)
+    event = threading.Event()
+    clock.stop_at(START + 100, event)
+    clock.sleep(99)
+    assert not event.is_set()
+    assert not clock.wait(event, 0.5)
+    # Como event.wait, a espera termina quando o evento é sinalizado, não no prazo
+    assert clock.wait(event, 10)
+    assert clock.time() == START + 100
+    assert clock.wait(event, 60)
+    assert clock.time() == START + 100
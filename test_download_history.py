@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+
+import download_history
+
+from candle_store import CandleStore
+from conftest import SharedSlotAPI, asset_price
+from download_history import DownloadCheckpoint, HistoryDownloader
+
+ASSETS = ['EURUSD', 'GBPUSD', 'EURJPY', 'USDJPY', 'AUDCAD', 'EURGBP']
+START = 1704672000
+END = START + 2 * 86400
+
+
+def downloader(api, tmp_path, checkpoint=None, **kwargs):
+    return HistoryDownloader(api, CandleStore(str(tmp_path / 'store')), checkpoint, workers=4, rate=1000.0,
+                             page_size=500, retries=2, retry_delay=0.0, **kwargs)
+
+
+def test_each_partition_holds_only_its_own_asset(tmp_path):
+    api = SharedSlotAPI(delay=0.001)
+    totals = downloader(api, tmp_path).download(ASSETS, START, END)
+    assert totals == {asset: 2 * 1440 for asset in ASSETS}
+
+    store = CandleStore(str(tmp_path / 'store'))
+    for asset in ASSETS:
+        for day in store.days(asset):
+            timestamps, values = store.read(asset, day * 86400, (day + 1) * 86400)
+            assert len(timestamps) == 1440
+            np.testing.assert_array_equal(values[3], asset_price(asset))
+
+
+def test_stops_at_the_start_of_the_asset_history(tmp_path):
+    api = SharedSlotAPI(first=START + 86400 + 3600, delay=0.0)
+    totals = downloader(api, tmp_path).download(['EURUSD'], START, END)
+    assert totals == {'EURUSD': 1440 - 60}
+
+
+def test_resumes_from_the_checkpoint(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    cursor = END - 600 * 60
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'EURUSD': {'start': START, 'end': END, 'cursor': cursor, 'done': False},
+                   'GBPUSD': {'start': START, 'end': END, 'cursor': START, 'done': True}}, f)
+    api = SharedSlotAPI(delay=0.0)
+    totals = downloader(api, tmp_path, DownloadCheckpoint(path)).download(['EURUSD', 'GBPUSD'], START, END)
+    assert totals == {'EURUSD': (cursor - START) // 60, 'GBPUSD': 0}
+    timestamps, _ = CandleStore(str(tmp_path / 'store')).read('EURUSD')
+    assert timestamps[-1] == cursor - 60
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['EURUSD']['done']
+
+
+class FixedPageAPI:
+    """Responde sempre a mesma página de velas, qualquer que seja o pedido."""
+
+    concurrent_get_candles = True
+
+    def __init__(self, froms):
+        self.froms = list(froms)
+        self.calls = 0
+
+    def get_candles(self, asset, interval, count, endtime):
+        self.calls += 1
+        return [{'from': ts, 'open': 1.0, 'max': 1.0, 'min': 1.0, 'close': 1.0, 'volume': 1} for ts in self.froms]
+
+
+def test_page_only_newer_than_the_cursor_ends_the_download(tmp_path):
+    # A API não tem nada anterior ao cursor: início do histórico
+    path = str(tmp_path / 'checkpoint.json')
+    api = FixedPageAPI(range(END, END + 600, 60))
+    assert downloader(api, tmp_path, DownloadCheckpoint(path)).download(['EURUSD'], START, END) == {'EURUSD': 0}
+    assert DownloadCheckpoint(path).cursor('EURUSD', START, END) == (END, True)
+
+
+def test_page_filtered_out_does_not_mark_done(tmp_path):
+    # Velas anteriores ao período, nenhuma dentro dele: não marca como concluído
+    path = str(tmp_path / 'checkpoint.json')
+    api = FixedPageAPI(range(START - 600, START, 60))
+    assert downloader(api, tmp_path, DownloadCheckpoint(path)).download(['EURUSD'], START, END) == {'EURUSD': 0}
+    assert DownloadCheckpoint(path).cursor('EURUSD', START, END) == (END, False)
+    assert api.calls == 1
+
+
+def test_no_sleep_after_the_last_attempt(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(download_history.time, 'sleep', sleeps.append)
+    api = FixedPageAPI([])
+    loader = HistoryDownloader(api, CandleStore(str(tmp_path / 'store')), rate=1000.0, retries=3, retry_delay=1.0)
+    assert loader.fetch_page('EURUSD', END) is None
+    assert api.calls == 3
+    assert sleeps == [1.0, 2.0]
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from candles import to_frame
+from indicators import IndicatorEngine, IndicatorStateBank, WINDOW_DEPENDENT, find_fractals, find_last_swing
+
+WINDOW = 110
+
+# (nome, parâmetros) como pedidos pelas estratégias
+INDICATORS = [
+    ('sma', {'length': 20}),
+    ('rolling_std', {'length': 20}),
+    ('rolling_max', {'length': 14}),
+    ('rolling_min', {'length': 14}),
+    ('bbands', {'length': 20, 'std': 2.0}),
+    ('stoch', {'k': 14, 'd': 3, 'smooth_k': 3}),
+    ('ema', {'length': 21}),
+    ('ewm', {'span': 9}),
+    ('rsi', {'length': 4}),
+]
+
+
+def random_walk(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    opens = np.r_[close[0], close[:-1]]
+    high = np.maximum(opens, close) + rng.uniform(0, 0.0003, n)
+    low = np.minimum(opens, close) - rng.uniform(0, 0.0003, n)
+    timestamps = 1704672000 + 60 * np.arange(n, dtype=np.int64)
+    return to_frame(timestamps, np.vstack([opens, high, low, close, np.ones(n)]))
+
+
+def as_values(value):
+    return np.array(list(value.values()) if isinstance(value, dict) else [value], dtype=float)
+
+
+@pytest.mark.parametrize('name, params', INDICATORS)
+def test_latest_with_states_matches_window_calculation(name, params):
+    # Um ciclo por minuto, cada um com a janela de 110 velas terminando na vela em formação
+    series = random_walk()
+    bank = IndicatorStateBank()
+    for end in range(WINDOW, len(series) + 1):
+        df = series.iloc[end - WINDOW:end]
+        incremental = IndicatorEngine(df, asset='EURUSD', states=bank).latest(name, **params)
+        expected = IndicatorEngine(df).latest(name, **params)
+        np.testing.assert_allclose(as_values(incremental), as_values(expected), rtol=1e-9, atol=1e-9)
+
+
+def test_window_dependent_indicators_bypass_the_states():
+    series = random_walk()
+    bank = IndicatorStateBank()
+    for end in range(WINDOW, 200):
+        for name in WINDOW_DEPENDENT:
+            params = {'span': 9} if name == 'ewm' else {'length': 14}
+            IndicatorEngine(series.iloc[end - WINDOW:end], asset='EURUSD', states=bank).latest(name, **params)
+    assert not bank._entries
+
+
+# (nome, parâmetros) com a última vela de cada janela em formação, como nos generate_signals
+FORMING = [
+    ('sma', {'length': 20, 'column': 'volume', 'last': 0.0}),
+    ('bbands', {'length': 20, 'std': 2.5, 'last': 'open'}),
+    ('stoch', {'k': 14, 'd': 3, 'smooth_k': 3, 'last': 'open'}),
+    ('ema', {'length': 21, 'window': WINDOW, 'last': 'open'}),
+    ('rsi', {'length': 14, 'window': WINDOW, 'last': 'open'}),
+]
+
+
+@pytest.mark.parametrize('name, params', FORMING)
+def test_forming_last_matches_window_with_forming_candle(name, params):
+    series = random_walk()
+    full = IndicatorEngine(series).get(name, **params)
+    window_params = {k: v for k, v in params.items() if k not in ('window', 'last')}
+    for t in range(WINDOW - 1, len(series)):
+        # Vela t recém-aberta: só a abertura, sem volume
+        df = series.iloc[t - WINDOW + 1:t + 1].copy()
+        df.iloc[-1] = [df['open'].iloc[-1]] * 4 + [0.0]
+        expected = IndicatorEngine(df).get(name, **window_params).iloc[-1]
+        np.testing.assert_allclose(np.asarray(full.iloc[t], dtype=float), np.asarray(expected, dtype=float), rtol=1e-9, atol=1e-12)
+
+
+# --- Referência: fractais e swings como na versão original da strategy_fibo_ema_rsi ---
+
+def _manual_fractal(df):
+    df['FRACTALS_5_high'] = None
+    df['FRACTALS_5_low'] = None
+    for i in range(2, len(df) - 2):
+        is_high_fractal = (df['high'].iloc[i] > df['high'].iloc[i-2] and df['high'].iloc[i] > df['high'].iloc[i-1] and
+                           df['high'].iloc[i] > df['high'].iloc[i+1] and df['high'].iloc[i] > df['high'].iloc[i+2])
+        if is_high_fractal:
+            df.loc[df.index[i], 'FRACTALS_5_high'] = df['high'].iloc[i]
+
+        is_low_fractal = (df['low'].iloc[i] < df['low'].iloc[i-2] and df['low'].iloc[i] < df['low'].iloc[i-1] and
+                          df['low'].iloc[i] < df['low'].iloc[i+1] and df['low'].iloc[i] < df['low'].iloc[i+2])
+        if is_low_fractal:
+            df.loc[df.index[i], 'FRACTALS_5_low'] = df['low'].iloc[i]
+    return df
+
+
+def _find_last_swing(df, trend_type):
+    fractal_highs = df[df['FRACTALS_5_high'].notna()]
+    fractal_lows = df[df['FRACTALS_5_low'].notna()]
+    if len(fractal_lows) < 1 or len(fractal_highs) < 1: return None, None
+    if trend_type == 'bullish':
+        last_high_time = fractal_highs.index[-1]
+        relevant_lows = fractal_lows[fractal_lows.index < last_high_time]
+        if relevant_lows.empty: return None, None
+        return df.loc[relevant_lows.index[-1], 'low'], df.loc[last_high_time, 'high']
+    last_low_time = fractal_lows.index[-1]
+    relevant_highs = fractal_highs[fractal_highs.index < last_low_time]
+    if relevant_highs.empty: return None, None
+    return df.loc[last_low_time, 'low'], df.loc[relevant_highs.index[-1], 'high']
+
+
+def _swing_points(df, lookback=20):
+    # find_swing_points da strategy_fibonacci_ema: empates ficam com a vela mais antiga
+    recent = df.tail(lookback)
+    high_idx, low_idx = recent['high'].idxmax(), recent['low'].idxmin()
+    return {'price': recent.loc[high_idx, 'high'], 'index': high_idx}, {'price': recent.loc[low_idx, 'low'], 'index': low_idx}
+
+
+def stepped_walk(n=400, seed=5):
+    # Preços em degraus de 1 pip: muitos empates entre máximas e mínimas vizinhas
+    df = random_walk(n, seed)
+    return df.assign(high=df['high'].round(4), low=df['low'].round(4))
+
+
+@pytest.mark.parametrize('df', [random_walk(300), stepped_walk(300)], ids=['continuo', 'degraus'])
+def test_vectorized_fractals_match_manual_loop(df):
+    expected = _manual_fractal(df.copy())
+    highs, lows = find_fractals(df['high'].to_numpy(), df['low'].to_numpy())
+    np.testing.assert_array_equal(highs, expected['FRACTALS_5_high'].to_numpy(dtype=float))
+    np.testing.assert_array_equal(lows, expected['FRACTALS_5_low'].to_numpy(dtype=float))
+    for end in range(5, len(df), 7):
+        window = expected.iloc[:end]
+        for trend in ('bullish', 'bearish'):
+            assert find_last_swing(highs[:end], lows[:end], trend) == _find_last_swing(window, trend)
+
+
+@pytest.mark.parametrize('df', [random_walk(250), stepped_walk(250)], ids=['continuo', 'degraus'])
+def test_swing_tracker_matches_window_calculation(df):
+    # Um ciclo por minuto com a janela de 110 velas, como a strategy_fibo_ema_rsi e a strategy_fibonacci_ema
+    bank = IndicatorStateBank()
+    for end in range(WINDOW, len(df) + 1):
+        window = df.iloc[end - WINDOW:end]
+        tracked = IndicatorEngine(window, asset='EURUSD', states=bank).latest('swings', window=WINDOW, lookback=20)
+        vectorized = IndicatorEngine(window).latest('swings', window=WINDOW, lookback=20)
+        manual = _manual_fractal(window.copy())
+        high_point, low_point = _swing_points(window)
+        for result in (tracked, vectorized):
+            assert result['bullish'] == _find_last_swing(manual, 'bullish')
+            assert result['bearish'] == _find_last_swing(manual, 'bearish')
+            assert result['high_point'] == high_point and result['low_point'] == low_point
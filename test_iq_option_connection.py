@@ -0,0 +1,375 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from candle_store import CandleStore
+from candles import candles_to_arrays
+from conftest import asset_price
+from iq_option_connection import CANDLE_CACHE_SIZE, IQOptionConnection, SettlementPoller
+from simulated_broker import SimulatedBroker
+
+ASSETS = [f"ATIVO{i}" for i in range(8)]
+
+
+def fetch_all(conn, endtime=1704672000):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = {asset: pool.submit(conn.get_candles, asset, 60, 20, endtime) for asset in ASSETS}
+        return {asset: future.result() for asset, future in futures.items()}
+
+
+def test_parallel_get_candles_keeps_each_asset_own_candles(shared_slot_api):
+    conn = IQOptionConnection(None, None, shared_slot_api)
+    conn.api = shared_slot_api
+    for asset, df in fetch_all(conn).items():
+        assert len(df) == 20
+        assert (df['close'] == asset_price(asset)).all()
+
+
+def test_concurrent_backends_are_not_serialized(shared_slot_api):
+    # O defeito da API falsa aparece sem a trava: garante que o teste acima exercita a corrida
+    shared_slot_api.concurrent_get_candles = True
+    conn = IQOptionConnection(None, None, shared_slot_api)
+    conn.api = shared_slot_api
+    mixed = [asset for asset, df in fetch_all(conn).items()
+             if df is None or not (df['close'] == asset_price(asset)).all()]
+    assert mixed
+
+
+class FakeSettlementConn:
+    """Conexão falsa do SettlementPoller: cada ordem liquida em `settle_at`; anota as consultas."""
+
+    def __init__(self, clock, settle_at, profit=0.85, failures=0):
+        self.clock = clock
+        self.settle_at = settle_at
+        self.profit = profit
+        self.failures = failures
+        self.calls = []
+
+    def poll_order_result(self, order_id):
+        self.calls.append((order_id, self.clock.time()))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("timeout")
+        if self.clock.time() < self.settle_at[order_id]: return False, None
+        return True, self.profit
+
+
+def run_poller(clock, conn, orders, until):
+    """Acompanha `orders` [(id, aberta em)] de 1 minuto até `until`. Retorna {id: lucro}."""
+    results = {}
+    poller = SettlementPoller(conn)
+    for order_id, opened_at in orders:
+        poller.watch(order_id, 1, lambda profit, order_id=order_id: results.setdefault(order_id, profit), opened_at)
+    clock.advance_to(until)
+    return results
+
+
+def test_poller_first_check_is_at_expiration(simulated_clock):
+    start = simulated_clock.time()
+    # Aberta a 50s da virada: expira nela; a 20s: pula para a seguinte
+    conn = FakeSettlementConn(simulated_clock, {'A': start + 60, 'B': start + 120})
+    results = run_poller(simulated_clock, conn, [('A', start + 10), ('B', start + 40)], start + 300)
+    assert conn.calls == [('A', start + 60), ('B', start + 120)]
+    assert results == {'A': 0.85, 'B': 0.85}
+
+
+def test_poller_backs_off_up_to_max_interval(simulated_clock):
+    start = simulated_clock.time()
+    conn = FakeSettlementConn(simulated_clock, {'A': start + 80})
+    results = run_poller(simulated_clock, conn, [('A', start + 10)], start + 300)
+    times = [at - start for _, at in conn.calls]
+    assert times == [60, 60.5, 61.5, 63.5, 67.5, 72.5, 77.5, 82.5]
+    assert results == {'A': 0.85}
+
+
+def test_poller_retries_after_api_error(simulated_clock):
+    start = simulated_clock.time()
+    conn = FakeSettlementConn(simulated_clock, {'A': start + 60}, profit=-1.0, failures=1)
+    results = run_poller(simulated_clock, conn, [('A', start + 10)], start + 300)
+    assert [at - start for _, at in conn.calls] == [60, 60.5]
+    assert results == {'A': -1.0}
+
+
+def closed_event(win, amount, win_amount=0.0):
+    return {'msg': {'win': win, 'sum': amount, 'win_amount': win_amount}}
+
+
+@pytest.mark.parametrize('event, expected', [
+    (None, (False, None)),
+    (closed_event('win', 10, 18.5), (True, 8.5)),
+    (closed_event('loose', 10), (True, -10.0)),
+    (closed_event('equal', 10, 10), (True, 0)),
+], ids=['aberta', 'win', 'loss', 'draw'])
+def test_poll_order_result_reads_socket_option_closed(event, expected):
+    conn = IQOptionConnection(None, None)
+    conn.api = SimpleNamespace(api=SimpleNamespace(socket_option_closed={} if event is None else {42: event}),
+                               check_win_v4=lambda order_id: pytest.fail("check_win_v4 com o evento disponível"))
+    assert conn.poll_order_result(42) == expected
+
+
+def test_poll_order_result_falls_back_to_check_win_v4():
+    conn = IQOptionConnection(None, None)
+    conn.api = SimpleNamespace(check_win_v4=lambda order_id: ('pending', None))
+    assert conn.poll_order_result(42) == (False, None)
+    conn.api = SimpleNamespace(check_win_v4=lambda order_id: ('loose', -5.0))
+    assert conn.poll_order_result(42) == (True, -5.0)
+
+
+class FakeAssetsAPI:
+    """Backend falso de disponibilidade: `open` são os ativos abertos; com `fail`, a chamada levanta."""
+
+    def __init__(self, open_assets):
+        self.open = list(open_assets)
+        self.fail = False
+        self.calls = 0
+
+    def connect(self):
+        return True, None
+
+    def get_all_ACTIVES_OPCODE(self):
+        return {'EURUSD': 1, 'GBPUSD': 2, 'USDJPY': 3}
+
+    def get_all_open_time(self):
+        self.calls += 1
+        if self.fail: raise ConnectionError("timeout")
+        opened = {asset: {'open': True} for asset in self.open}
+        return {'binary': dict(opened), 'turbo': {}, 'digital': dict(opened)}
+
+
+def connected(api):
+    conn = IQOptionConnection(None, None, api)
+    assert conn.connect()
+    return conn
+
+
+def test_asset_refresher_updates_every_ttl(simulated_clock):
+    start = simulated_clock.time()
+    api = FakeAssetsAPI(['EURUSD'])
+    conn = connected(api)
+    conn.start_asset_refresh(300)
+    assert api.calls == 1
+    simulated_clock.advance_to(start + 299)
+    assert api.calls == 1
+    simulated_clock.advance_to(start + 300)
+    assert api.calls == 2 and conn.get_open_assets().refreshed_at == start + 300
+    simulated_clock.advance_to(start + 900)
+    assert api.calls == 4
+    conn.stop_asset_refresh()
+    simulated_clock.advance_to(start + 3600)
+    assert api.calls == 4
+
+
+def test_refresh_swaps_in_a_new_snapshot(simulated_clock):
+    start = simulated_clock.time()
+    api = FakeAssetsAPI(['EURUSD'])
+    conn = connected(api)
+    conn.start_asset_refresh(300)
+    before = conn.get_open_assets()
+
+    simulated_clock.advance_to(start + 300)
+    same_names = conn.get_open_assets()
+    assert same_names is not before
+    # Mesmos nomes: o índice é reaproveitado
+    assert same_names.resolver is before.resolver
+
+    api.open = ['EURUSD', 'GBPUSD']
+    simulated_clock.advance_to(start + 600)
+    after = conn.get_open_assets()
+    conn.stop_asset_refresh()
+    # Quem guardou o snapshot anterior continua vendo a disponibilidade antiga, inteira
+    assert list(before.binary) == ['EURUSD'] and before.refreshed_at == start
+    assert list(after.binary) == ['EURUSD', 'GBPUSD'] and after.refreshed_at == start + 600
+    assert after.resolver is not before.resolver
+    assert conn.is_asset_available_for_trading('GBPUSD', 'binary')
+
+
+def test_refresh_error_keeps_the_last_good_snapshot(simulated_clock):
+    start = simulated_clock.time()
+    api = FakeAssetsAPI(['EURUSD'])
+    conn = connected(api)
+    conn.start_asset_refresh(300)
+    good = conn.get_open_assets()
+    api.fail = True
+    simulated_clock.advance_to(start + 600)
+    assert api.calls == 3
+    # Vencido, mas com a atualização em segundo plano ligada: get_open_assets não chama a API
+    assert conn.get_open_assets() is good
+    assert api.calls == 3
+    api.fail = False
+    simulated_clock.advance_to(start + 900)
+    conn.stop_asset_refresh()
+    assert conn.get_open_assets().refreshed_at == start + 900
+
+
+def test_get_open_assets_refreshes_after_ttl_without_refresher(simulated_clock):
+    start = simulated_clock.time()
+    api = FakeAssetsAPI(['EURUSD'])
+    conn = connected(api)
+    conn.asset_ttl = 300
+    first = conn.get_open_assets()
+    simulated_clock.advance_to(start + 299)
+    assert conn.get_open_assets() is first and api.calls == 1
+    simulated_clock.advance_to(start + 300)
+    assert conn.get_open_assets().refreshed_at == start + 300 and api.calls == 2
+
+    api.fail = True
+    simulated_clock.advance_to(start + 600)
+    last_good = conn.asset_snapshot
+    assert conn.get_open_assets() is last_good and api.calls == 3
+
+
+class CountingCandlesAPI:
+    """
+    API falsa de velas: preço determinístico por segundo, a última vela em formação até `endtime`.
+    Anota o `count` de cada get_candles.
+    """
+
+    concurrent_get_candles = True
+
+    def __init__(self):
+        self.counts = []
+
+    @staticmethod
+    def price(t):
+        return 1.1 + 0.001 * np.sin(t / 700.0) + 0.0001 * (t % 7)
+
+    def get_candles(self, asset, interval, count, endtime):
+        self.counts.append(count)
+        last = int(endtime) // interval * interval
+        candles = []
+        for ts in range(last - (count - 1) * interval, last + interval, interval):
+            close_at = min(ts + interval, endtime)
+            o, c = self.price(ts), self.price(close_at)
+            candles.append({'from': ts, 'open': o, 'max': max(o, c) + 0.0002, 'min': min(o, c) - 0.0002, 'close': c,
+                            'volume': close_at - ts})
+        return candles
+
+
+T = 1704672000 + 30  # meio de um minuto: a última vela está em formação
+
+
+def candle_conn(store=None):
+    api = CountingCandlesAPI()
+    conn = IQOptionConnection(None, None, api)
+    conn.api = api
+    if store is not None: conn.attach_candle_store(store)
+    return conn, api
+
+
+def assert_same_as_full_fetch(df, endtime):
+    fresh, _ = candle_conn()
+    expected = fresh.get_candles('EURUSD', 60, len(df), endtime)
+    np.testing.assert_array_equal(df.index.as_unit('s').asi8, expected.index.as_unit('s').asi8)
+    np.testing.assert_allclose(df.to_numpy(), expected.to_numpy())
+
+
+def test_get_candles_fetches_only_the_new_candles():
+    conn, api = candle_conn()
+    conn.get_candles('EURUSD', 60, 110, T)
+    assert api.counts == [CANDLE_CACHE_SIZE]
+    # Um minuto depois: a vela que estava em formação (buscada de novo) e a nova
+    df = conn.get_candles('EURUSD', 60, 110, T + 60)
+    assert api.counts[-1] == 2
+    assert_same_as_full_fetch(df, T + 60)
+    df = conn.get_candles('EURUSD', 60, 110, T + 240)
+    assert api.counts[-1] == 4
+    assert_same_as_full_fetch(df, T + 240)
+    # Mesmo minuto: só a vela em formação
+    conn.get_candles('EURUSD', 60, 110, T + 250)
+    assert api.counts[-1] == 1
+
+
+def test_get_candles_reseeds_after_a_gap_larger_than_the_window():
+    conn, api = candle_conn()
+    conn.get_candles('EURUSD', 60, 110, T)
+    # Lacuna de 100 minutos: cabe na janela, uma busca incremental de 101 velas
+    df = conn.get_candles('EURUSD', 60, 110, T + 100 * 60)
+    assert api.counts[-1] == 101
+    assert_same_as_full_fetch(df, T + 100 * 60)
+    # Lacuna maior que a janela: semeia de novo
+    df = conn.get_candles('EURUSD', 60, 110, T + 400 * 60)
+    assert api.counts[-1] == CANDLE_CACHE_SIZE
+    assert_same_as_full_fetch(df, T + 400 * 60)
+
+
+def test_forming_candle_is_not_persisted(tmp_path):
+    store = CandleStore(str(tmp_path))
+    conn, api = candle_conn(store)
+    conn.get_candles('EURUSD', 60, 110, T)
+    forming = T // 60 * 60
+    assert store.last_timestamp('EURUSD') == forming - 60
+
+    conn.get_candles('EURUSD', 60, 110, T + 60)
+    # Fechada, a vela é gravada com o fechamento final, não com o preço visto em formação
+    timestamps, values = store.tail('EURUSD', 1)
+    assert timestamps[-1] == forming
+    assert values[3, -1] == api.price(forming + 60)
+
+
+def test_seed_from_store_uses_only_the_contiguous_tail(tmp_path):
+    store = CandleStore(str(tmp_path))
+    full = candles_to_arrays(CountingCandlesAPI().get_candles('EURUSD', 60, 400, T - 60))
+    # 200 velas, uma lacuna e as últimas 50 antes do instante pedido
+    keep = np.r_[np.arange(0, 200), np.arange(349, 399)]
+    store.write('EURUSD', full[0][keep], full[1][:, keep])
+    conn, api = candle_conn(store)
+    df = conn.get_candles('EURUSD', 60, 110, T)
+    # 50 velas contíguas + 2 a buscar não cobrem 110: busca completa
+    assert api.counts == [CANDLE_CACHE_SIZE]
+    assert_same_as_full_fetch(df, T)
+
+
+def test_seed_from_store_completes_the_window_incrementally(tmp_path):
+    store = CandleStore(str(tmp_path))
+    full = candles_to_arrays(CountingCandlesAPI().get_candles('EURUSD', 60, 400, T - 60))
+    store.write('EURUSD', full[0][:-1], full[1][:, :-1])
+    conn, api = candle_conn(store)
+    df = conn.get_candles('EURUSD', 60, 110, T)
+    # A última gravada de novo, a que faltava e a em formação
+    assert api.counts == [3]
+    assert_same_as_full_fetch(df, T)
+
+
+def broker_conn(now):
+    """Conexão sobre o SimulatedBroker, anotando o intervalo de cada busca na API."""
+    broker = SimulatedBroker(['EURUSD'], clock=lambda: now[0])
+    conn = IQOptionConnection(None, None, broker)
+    conn.connect()
+    intervals = []
+    fetch = conn._fetch_candles
+    conn._fetch_candles = lambda *args: intervals.append(args[1]) or fetch(*args)
+    return conn, broker, intervals
+
+
+def test_m5_is_derived_from_the_cached_m1():
+    now = [T + 120]
+    conn, broker, intervals = broker_conn(now)
+    conn.get_candles('EURUSD', 60, 110, now[0])
+    df = conn.get_timeframe_candles('EURUSD', 300, 50, now[0])
+    assert intervals == [60]
+    # Igual ao M5 da API, inclusive o bucket em formação
+    timestamps, values = candles_to_arrays(broker.get_candles('EURUSD', 300, 50, now[0]))
+    np.testing.assert_array_equal(df.index.as_unit('s').asi8, timestamps)
+    np.testing.assert_allclose(df.to_numpy().T, values)
+
+
+def test_m5_falls_back_to_the_api_when_m1_is_stale():
+    now = [T + 120]
+    conn, broker, intervals = broker_conn(now)
+    conn.get_candles('EURUSD', 60, 110, now[0])
+    # Dois minutos sem atualizar o M1: o cache não representa mais o bucket atual
+    now[0] += 120
+    df = conn.get_timeframe_candles('EURUSD', 300, 50, now[0])
+    assert intervals == [60, 300]
+    assert len(df) == 50 and df.index.as_unit('s').asi8[-1] == now[0] // 300 * 300
+
+
+def test_m5_falls_back_to_the_api_when_m1_is_short():
+    now = [T + 120]
+    conn, broker, intervals = broker_conn(now)
+    conn.get_candles('EURUSD', 60, 110, now[0])
+    # 300 velas M1 não cobrem 100 velas M5
+    conn.get_timeframe_candles('EURUSD', 300, 100, now[0])
+    assert intervals == [60, 300]
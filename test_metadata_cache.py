@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from iq_option_connection import IQOptionConnection
+from metadata_cache import METADATA_CACHE_VERSION, MetadataCache
+
+OPCODES = {'EURUSD': 1, 'GBPUSD': 2}
+OPEN = {'EURUSD': {'open': True}, 'GBPUSD': {'open': False}}
+
+
+class CountingAPI:
+    """Backend falso que conta as chamadas de metadados."""
+
+    def __init__(self):
+        self.opcode_calls = 0
+        self.open_time_calls = 0
+
+    def connect(self):
+        return True, None
+
+    def get_all_ACTIVES_OPCODE(self):
+        self.opcode_calls += 1
+        return dict(OPCODES)
+
+    def get_all_open_time(self):
+        self.open_time_calls += 1
+        return {'binary': dict(OPEN), 'turbo': {}, 'digital': {}}
+
+
+def rewrite(cache, **changes):
+    """Altera campos do arquivo salvo, como um cache de outra versão ou com outro relógio."""
+    with open(cache.path, encoding='utf-8') as f:
+        data = json.load(f)
+    data.update(changes)
+    with open(cache.path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+@pytest.fixture
+def cache(tmp_path, simulated_clock):
+    return MetadataCache(str(tmp_path / 'metadata_cache.json'), max_age=3600)
+
+
+def test_save_and_load_roundtrip(cache, simulated_clock):
+    cache.save('IQ_Option', OPCODES, OPEN, {})
+    data = cache.load('IQ_Option')
+    assert data['opcodes'] == OPCODES and data['binary'] == OPEN and data['digital'] == {}
+    assert data['saved_at'] == simulated_clock.time()
+
+
+def test_load_rejects_other_source(cache):
+    cache.save('SimulatedBroker', OPCODES, OPEN, {})
+    assert cache.load('IQ_Option') is None
+
+
+def test_load_rejects_other_version(cache):
+    cache.save('IQ_Option', OPCODES, OPEN, {})
+    rewrite(cache, version=METADATA_CACHE_VERSION + 1)
+    assert cache.load('IQ_Option') is None
+
+
+def test_load_rejects_old_or_future_cache(cache, simulated_clock):
+    start = simulated_clock.time()
+    cache.save('IQ_Option', OPCODES, OPEN, {})
+    simulated_clock.advance_to(start + 3599)
+    assert cache.load('IQ_Option') is not None
+    simulated_clock.advance_to(start + 3600)
+    assert cache.load('IQ_Option') is None
+    # Salvo "no futuro" (relógio voltou): também descartado
+    cache.save('IQ_Option', OPCODES, OPEN, {})
+    rewrite(cache, saved_at=simulated_clock.time() + 60)
+    assert cache.load('IQ_Option') is None
+
+
+def test_load_ignores_missing_or_corrupt_file(cache):
+    assert cache.load('IQ_Option') is None
+    with open(cache.path, 'w', encoding='utf-8') as f:
+        f.write('{"version": 1, "sou')
+    assert cache.load('IQ_Option') is None
+
+
+def test_warm_cache_skips_metadata_calls_on_connect(cache, simulated_clock):
+    # Primeira sessão: busca na API e salva na atualização dos ativos
+    cold_api = CountingAPI()
+    cold = IQOptionConnection(None, None, cold_api, metadata_cache=cache)
+    assert cold.connect()
+    cold.update_open_assets()
+    assert cold_api.opcode_calls == 1 and not cold.metadata_pending
+
+    simulated_clock.advance_to(simulated_clock.time() + 600)
+    warm_api = CountingAPI()
+    warm = IQOptionConnection(None, None, warm_api, metadata_cache=cache)
+    assert warm.connect()
+    assert warm_api.opcode_calls == 0 and warm_api.open_time_calls == 0
+    assert warm.supported_assets == OPCODES and warm.metadata_pending
+    assert warm.is_asset_available_for_trading('EURUSD', 'binary')
+    assert not warm.is_asset_available_for_trading('GBPUSD', 'binary')
+
+    # A primeira atualização revalida também os opcodes
+    warm.update_open_assets()
+    assert warm_api.opcode_calls == 1 and warm_api.open_time_calls == 1 and not warm.metadata_pending
+
+
+def test_stale_cache_falls_back_to_the_api(cache, simulated_clock):
+    cache.save('CountingAPI', OPCODES, OPEN, {})
+    simulated_clock.advance_to(simulated_clock.time() + 7200)
+    api = CountingAPI()
+    conn = IQOptionConnection(None, None, api, metadata_cache=cache)
+    assert conn.connect()
+    assert api.opcode_calls == 1 and not conn.metadata_pending
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from iq_option_connection import IQOptionConnection
+from order_tracker import OrderTracker
+from simulated_broker import SimulatedBroker
+
+
+class FakeWatcher:
+    """Conexão falsa: guarda os callbacks de liquidação para o teste entregar o resultado."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def watch_order(self, order_id, duration, on_result, opened_at=None):
+        self.callbacks[order_id] = on_result
+
+
+def settle_in_thread(callback, profit):
+    # Como o poller: o resultado chega em outra thread
+    thread = threading.Thread(target=callback, args=(profit,))
+    thread.start(); thread.join(1)
+
+
+def test_submit_tracks_positions_until_settled():
+    iq, settled = FakeWatcher(), []
+    tracker = OrderTracker(iq, lambda order, profit: settled.append((order['order_id'], profit)))
+    tracker.submit(1, 'EURUSD', 10.0, 'CALL', 'strategy_berman.py', 1)
+    tracker.submit(2, 'GBPUSD', 10.0, 'PUT', 'strategy_berman.py', 1)
+    assert tracker.has_open_position('EURUSD') and not tracker.has_open_position('USDJPY')
+    assert tracker.open_count() == 2
+
+    settle_in_thread(iq.callbacks[1], 8.5)
+    assert settled == [(1, 8.5)]
+    assert not tracker.has_open_position('EURUSD')
+    assert tracker.open_count() == 1
+
+
+def test_failing_callback_still_closes_the_position():
+    iq = FakeWatcher()
+    tracker = OrderTracker(iq, lambda order, profit: 1 / 0)
+    tracker.submit(1, 'EURUSD', 10.0, 'CALL', 'strategy_berman.py', 1)
+    settle_in_thread(iq.callbacks[1], -10.0)
+    assert tracker.open_count() == 0
+
+
+def test_wait_all_gives_up_after_timeout(simulated_clock):
+    tracker = OrderTracker(FakeWatcher(), lambda order, profit: None)
+    tracker.submit(1, 'EURUSD', 10.0, 'CALL', 'strategy_berman.py', 1)
+    start = simulated_clock.time()
+    assert tracker.wait_all(90) == 1
+    assert simulated_clock.time() == start + 90
+
+
+def test_wait_all_returns_when_the_poller_settles(simulated_clock):
+    # Encerramento do robô: a ordem aberta é liquidada pelo poller da conexão na expiração
+    broker = SimulatedBroker(['EURUSD'])
+    iq = IQOptionConnection(None, None, broker)
+    assert iq.connect()
+    settled = []
+    tracker = OrderTracker(iq, lambda order, profit: settled.append(profit))
+    simulated_clock.advance_to(simulated_clock.time() + 15)
+    _, order_id = broker.buy(10.0, 'EURUSD', 'call', 1)
+    tracker.submit(order_id, 'EURUSD', 10.0, 'CALL', 'strategy_berman.py', 1)
+
+    assert tracker.wait_all(90) == 0
+    status, profit = broker.check_win_v4(order_id)
+    assert settled == [profit] and profit in (8.5, -10.0, 0.0)
+    # Liquidada na primeira consulta, na expiração (virada do minuto seguinte)
+    assert simulated_clock.time() == pytest.approx(1704672060, abs=0.5)
@@ -0,0 +1,65 @@
+from recording import ReplayBackend, RecordingBackend, read_recording
+from simulated_broker import SimulatedBroker
+
+ASSETS = ['EURUSD', 'GBPUSD']
+
+
+def record_session(clock, path):
+    """Sessão curta no SimulatedBroker gravada: velas, uma compra, a liquidação e o saldo."""
+    start = clock.time()
+    api = RecordingBackend(SimulatedBroker(ASSETS), str(path))
+    responses = {'connect': api.connect()}
+    clock.advance_to(start + 10)
+    responses['m1'] = api.get_candles('EURUSD', 60, 110, clock.time())
+    responses['m5'] = api.get_candles('GBPUSD', 300, 20, clock.time())
+    responses['buy'] = api.buy(10.0, 'EURUSD', 'call', 1)
+    order_id = responses['buy'][1]
+    responses['pending'] = api.check_win_v4(order_id)
+    clock.advance_to(start + 61)
+    responses['result'] = api.check_win_v4(order_id)
+    responses['balance'] = api.get_balance()
+    api.close()
+    return start, order_id, responses
+
+
+def replay_session(replay, start, order_id):
+    responses = {'connect': replay.connect()}
+    responses['m1'] = replay.get_candles('EURUSD', 60, 110, start + 10)
+    responses['m5'] = replay.get_candles('GBPUSD', 300, 20, start + 10)
+    responses['buy'] = replay.buy(10.0, 'EURUSD', 'call', 1)
+    responses['result'] = replay.check_win_v4(order_id)
+    responses['balance'] = replay.get_balance()
+    return responses
+
+
+def test_replay_answers_like_the_recorded_session(tmp_path, simulated_clock):
+    path = tmp_path / 'sessao.jsonl.gz'
+    start, order_id, recorded = record_session(simulated_clock, path)
+    assert recorded['pending'] == ('pending', None)
+    assert recorded['result'][0] in ('win', 'loose', 'equal')
+
+    records = read_recording(str(path))
+    assert [r['m'] for r in records] == ['connect', 'get_candles', 'get_candles', 'buy', 'check_win_v4', 'check_win_v4', 'get_balance']
+    replay = ReplayBackend(str(path), clock=lambda: start)
+    assert replay.start_time == start and replay.end_time == start + 61
+
+    replayed = replay_session(replay, start, order_id)
+    assert replayed['connect'] == recorded['connect']
+    assert replayed['m1'] == recorded['m1'] and len(replayed['m1']) == 110
+    assert replayed['m5'] == recorded['m5']
+    assert replayed['buy'] == recorded['buy']
+    assert replayed['result'] == recorded['result']
+    assert replayed['balance'] == recorded['balance']
+
+
+def test_replay_on_another_day_shifts_candle_times(tmp_path, simulated_clock):
+    path = tmp_path / 'sessao.jsonl'
+    start, order_id, recorded = record_session(simulated_clock, path)
+    day = 86400
+    replay = ReplayBackend(str(path), clock=lambda: start + day)
+    replay.connect()
+    assert replay.offset == -day
+    candles = replay.get_candles('EURUSD', 60, 110, start + day + 10)
+    assert [c['from'] for c in candles] == [c['from'] + day for c in recorded['m1']]
+    assert [c['close'] for c in candles] == [c['close'] for c in recorded['m1']]
+    assert replay.check_win_v4(order_id) == recorded['result']
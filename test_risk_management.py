@@ -0,0 +1,114 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from risk_management import RiskManagement
+
+
+class BaselineRiskManagement:
+    """As regras do RiskManagement antes das posições simultâneas (modo sequencial), como referência."""
+
+    def __init__(self, balance, settings):
+        self.initial_balance = self.current_balance = balance
+        self.stake_mode = settings.get('stake_mode', 'percentage')
+        self.stake_value = settings.get('stake_value', 1.0)
+        self.stop_loss = settings.get('stop_loss', 10.0)
+        self.take_profit = settings.get('take_profit', 5.0)
+        self.strategy = settings.get('capital_strategy', 'none')
+        self.soros_max_levels = settings.get('soros_levels', 2)
+        self.multiplier = settings.get('martingale_multiplier', 2.0)
+        self.soros_level, self.soros_initial, self.soros_reinvest = 0, 0.0, 0.0
+        self.martingale_level, self.martingale_base = 0, 0.0
+        self.daily_profit_loss = 0.0
+
+    def calculate_initial_stake(self):
+        if self.current_balance <= 0: return 0
+        if self.stake_mode == 'percentage': return self.current_balance * (self.stake_value / 100)
+        if self.stake_mode == 'fixed': return min(self.stake_value, self.current_balance)
+        return 1.0
+
+    def calculate_stake(self):
+        if self.strategy == 'soros' and self.soros_level > 0:
+            return min(self.soros_initial + self.soros_reinvest, self.current_balance)
+        if self.strategy == 'martingale' and self.martingale_level > 0:
+            return min(self.martingale_base * self.multiplier ** self.martingale_level, self.current_balance)
+        stake = self.calculate_initial_stake()
+        if self.strategy == 'soros': self.soros_initial = stake
+        elif self.strategy == 'martingale': self.martingale_base = stake
+        return stake
+
+    def register_trade_result(self, profit):
+        self.daily_profit_loss += profit
+        self.current_balance += profit
+        if self.strategy == 'soros':
+            if profit > 0:
+                self.soros_reinvest = profit
+                self.soros_level += 1
+                if self.soros_level > self.soros_max_levels: self.soros_level, self.soros_initial, self.soros_reinvest = 0, 0.0, 0.0
+            else:
+                self.soros_level, self.soros_initial, self.soros_reinvest = 0, 0.0, 0.0
+        elif self.strategy == 'martingale':
+            if profit > 0: self.martingale_level = 0
+            elif profit < 0: self.martingale_level += 1
+
+    def check_stop_loss(self):
+        if self.daily_profit_loss >= 0: return False
+        return self.daily_profit_loss <= -self.initial_balance * (self.stop_loss / 100)
+
+    def check_take_profit(self):
+        if self.daily_profit_loss <= 0: return False
+        return self.daily_profit_loss >= self.initial_balance * (self.take_profit / 100)
+
+
+SETTINGS = [
+    dict(capital_strategy=strategy, stake_mode=mode, stake_value=value, stop_loss=stop_loss, take_profit=take_profit,
+         soros_levels=2, martingale_multiplier=2.2)
+    for strategy, (mode, value), (stop_loss, take_profit) in itertools.product(
+        ['none', 'soros', 'martingale'], [('percentage', 5.0), ('fixed', 40.0)], [(10.0, 5.0), (30.0, 20.0)])
+]
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+def test_sequential_mode_matches_the_baseline(settings, tmp_path):
+    rng = np.random.default_rng(7)
+    for _ in range(30):
+        risk = RiskManagement(1000.0, dict(settings, trade_history_file=str(tmp_path / 'history.csv')))
+        baseline = BaselineRiskManagement(1000.0, settings)
+        for outcome in rng.choice([1, -1, 0], size=60, p=[0.5, 0.45, 0.05]):
+            stake = risk.reserve_stake('EURUSD')
+            expected = baseline.calculate_stake()
+            assert stake == pytest.approx(expected)
+            if expected <= 0: break
+            # Metas e saldo conferidos com a ordem ainda aberta, como no loop do robô
+            assert risk.available_balance == pytest.approx(baseline.current_balance)
+            assert risk.check_stop_loss() == baseline.check_stop_loss()
+            assert risk.check_take_profit() == baseline.check_take_profit()
+
+            profit = stake * 0.85 if outcome > 0 else -stake if outcome < 0 else 0.0
+            risk.register_trade_result(profit, 'EURUSD', stake)
+            baseline.register_trade_result(profit)
+            assert risk.current_balance == pytest.approx(baseline.current_balance)
+            stop, take = risk.check_stop_loss(), risk.check_take_profit()
+            assert (stop, take) == (baseline.check_stop_loss(), baseline.check_take_profit())
+            if stop or take: break
+
+
+def test_sequential_mode_does_not_refuse_near_the_stop_loss(tmp_path):
+    risk = RiskManagement(1000.0, {'stake_mode': 'fixed', 'stake_value': 50.0, 'stop_loss': 10.0,
+                                   'trade_history_file': str(tmp_path / 'history.csv')})
+    risk.register_trade_result(-80.0)
+    assert risk.reserve_stake('EURUSD') == 50.0
+
+
+def test_concurrent_mode_counts_open_exposure(tmp_path):
+    risk = RiskManagement(1000.0, {'stake_mode': 'fixed', 'stake_value': 50.0, 'stop_loss': 10.0, 'take_profit': 5.0,
+                                   'concurrent_positions': True, 'trade_history_file': str(tmp_path / 'history.csv')})
+    risk.register_trade_result(-80.0)
+    assert risk.reserve_stake('EURUSD') == 0
+    risk.register_trade_result(140.0)
+    assert risk.reserve_stake('EURUSD') == 50.0
+    assert risk.available_balance == pytest.approx(1010.0)
+    assert not risk.check_take_profit()
+    risk.register_trade_result(42.5, 'EURUSD', 50.0)
+    assert risk.check_take_profit()
@@ -0,0 +1,44 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from ruin_simulator import RUINED, STOP_LOSS, TAKE_PROFIT, draw_outcomes, simulate, simulate_day, verify_against_risk_management
+
+SETTINGS = [
+    dict(capital_strategy=strategy, stake_mode=mode, stake_value=value, stop_loss=stop_loss, take_profit=take_profit,
+         soros_levels=2, martingale_multiplier=2.2, balance=1000.0)
+    for strategy, (mode, value), (stop_loss, take_profit) in itertools.product(
+        ['none', 'soros', 'martingale'], [('percentage', 5.0), ('fixed', 40.0)], [(10.0, 5.0), (60.0, 40.0)])
+]
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+@pytest.mark.parametrize('win_rate', [0.45, 0.6])
+def test_simulator_matches_risk_management(settings, win_rate):
+    assert verify_against_risk_management(settings, win_rate, 0.85, paths=60, trades_per_day=60) < 1e-6
+
+
+def test_draw_outcomes_rates():
+    outcomes = draw_outcomes(np.random.default_rng(0), (200_000,), 0.55, 0.05)
+    assert set(np.unique(outcomes)) == {-1, 0, 1}
+    assert np.mean(outcomes == 1) == pytest.approx(0.55, abs=0.005)
+    assert np.mean(outcomes == 0) == pytest.approx(0.05, abs=0.005)
+
+
+def test_day_ends_on_the_targets():
+    settings = dict(stake_mode='fixed', stake_value=10.0, stop_loss=5.0, take_profit=5.0)
+    wins, losses = np.ones((1, 20), dtype=np.int8), -np.ones((1, 20), dtype=np.int8)
+    balance, pnl, reason, count = simulate_day(np.full(2, 1000.0), np.vstack([wins, losses]), settings, 1.0)
+    np.testing.assert_array_equal(reason, [TAKE_PROFIT, STOP_LOSS])
+    np.testing.assert_array_equal(count, [5, 5])
+    np.testing.assert_allclose(balance, [1050.0, 950.0])
+
+
+def test_ruined_paths_stop_trading():
+    settings = dict(capital_strategy='martingale', stake_mode='fixed', stake_value=100.0, stop_loss=100.0,
+                    take_profit=1000.0, martingale_multiplier=2.0, balance=300.0)
+    result = simulate(settings, 0.0, 0.85, paths=50, trades_per_day=10, days=3, seed=1)
+    assert (result['ruin_day'] == 0).all()
+    assert (result['reasons'][:, 1:] == RUINED).all()
+    assert (result['trades'][:, 1:] == 0).all()
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from candle_store import SECONDS_PER_DAY, CandleStore
+from simulated_broker import SimulatedBroker
+
+DAY = 19730 * SECONDS_PER_DAY  # 2024-01-08 00:00 UTC
+# Abertura de cada minuto a partir de DAY; o fechamento é a abertura seguinte
+OPENS = [1.0, 1.1, 1.2, 1.2, 1.25, 1.3, 1.3, 1.3]
+
+
+@pytest.fixture
+def broker(tmp_path):
+    store = CandleStore(str(tmp_path))
+    opens = np.array(OPENS)
+    closes = np.r_[opens[1:], opens[-1]]
+    timestamps = DAY + 60 * np.arange(len(opens), dtype=np.int64)
+    store.write('EURUSD', timestamps, np.vstack([opens, np.maximum(opens, closes) + 0.05,
+                                                 np.minimum(opens, closes) - 0.05, closes, np.full(len(opens), 10.0)]))
+    now = [DAY]
+    broker = SimulatedBroker(['EURUSD'], store=store, payout=0.85, balance=1000.0, start=DAY, clock=lambda: now[0])
+    broker.connect()
+    broker.now_at = lambda t: now.__setitem__(0, t)
+    return broker
+
+
+def trade(broker, at, action, amount=10.0):
+    broker.now_at(at)
+    ok, order_id = broker.buy(amount, 'EURUSD', action, 1)
+    assert ok
+    return order_id
+
+
+@pytest.mark.parametrize('opened, action, expected', [
+    (10, 'call', ('win', 8.5)),       # 1.0 -> 1.1
+    (70, 'put', ('loose', -10.0)),    # 1.1 -> 1.2
+    (130, 'call', ('equal', 0.0)),    # 1.2 -> 1.2
+], ids=['win', 'loss', 'draw'])
+def test_order_settles_against_the_next_candle(broker, opened, action, expected):
+    order_id = trade(broker, DAY + opened, action)
+    assert broker.balances['PRACTICE'] == pytest.approx(990.0)
+    assert broker.orders[order_id]['entry'] == OPENS[opened // 60]
+
+    expiration = DAY + (opened // 60 + 1) * 60
+    broker.now_at(expiration - 1)
+    assert broker.check_win_v4(order_id) == ('pending', None)
+    broker.now_at(expiration)
+    assert broker.check_win_v4(order_id) == expected
+    assert broker.get_balance() == pytest.approx(1000.0 + expected[1])
+
+
+def test_late_order_expires_on_the_following_minute(broker):
+    # Aberta a menos de 30s da virada: expira na virada seguinte (1.2 -> 1.3)
+    order_id = trade(broker, DAY + 3 * 60 + 45, 'call')
+    broker.now_at(DAY + 4 * 60)
+    assert broker.check_win_v4(order_id) == ('pending', None)
+    broker.now_at(DAY + 5 * 60)
+    assert broker.check_win_v4(order_id) == ('win', 8.5)
+
+
+def test_balance_over_several_orders(broker):
+    orders = [trade(broker, DAY + 10, 'call'), trade(broker, DAY + 70, 'put'), trade(broker, DAY + 130, 'call')]
+    # Em DAY + 130 as duas primeiras já expiraram; a terceira segue reservada
+    assert broker.get_balance() == pytest.approx(1000.0 - 30.0 + 18.5)
+    broker.now_at(DAY + 600)
+    assert [broker.check_win_v4(order_id)[1] for order_id in orders] == [8.5, -10.0, 0.0]
+    assert broker.get_balance() == pytest.approx(1000.0 + 8.5 - 10.0)
+    # Saldo insuficiente: recusada
+    assert broker.buy(5000.0, 'EURUSD', 'call', 1) == (False, None)
+
+
+def test_get_candles_serves_the_forming_candle_with_its_open(broker):
+    broker.now_at(DAY + 4 * 60 + 10)
+    candles = broker.get_candles('EURUSD', 60, 3, DAY + 4 * 60 + 10)
+    assert [c['from'] for c in candles] == [DAY + 120, DAY + 180, DAY + 240]
+    assert [c['close'] for c in candles] == [1.2, 1.25, 1.25]
+    forming = candles[-1]
+    assert forming['open'] == forming['max'] == forming['min'] == forming['close'] == 1.25 and forming['volume'] == 0.0
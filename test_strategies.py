@@ -0,0 +1,47 @@
+import logging
+
+import numpy as np
+import pytest
+
+import strategies.strategy_berman as berman
+import strategies.strategy_bollinger_rsi as bollinger_rsi
+import strategies.strategy_pullback_complex as pullback
+from backtest import WINDOW, HistoryWalker, verify_generate_signals
+from candles import to_frame
+from conftest import pullback_history, synthetic_history
+
+
+@pytest.fixture(autouse=True)
+def quiet_strategies():
+    # check_signal registra cada sinal com logging.warning
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def signal_count(signals):
+    return int(np.not_equal(signals, None).sum())
+
+
+@pytest.mark.parametrize('module, history, fires', [
+    (berman, synthetic_history(1500, seed=0), True),
+    (bollinger_rsi, synthetic_history(1500, seed=0), True),
+    (pullback, pullback_history(seed=0), False),
+    (pullback, pullback_history(seed=1), False),
+], ids=['berman', 'bollinger_rsi', 'pullback-0', 'pullback-1'])
+def test_generate_signals_matches_check_signal(module, history, fires):
+    df = to_frame(*history)
+    assert (signal_count(module.generate_signals(df, WINDOW)) > 0) == fires
+    assert verify_generate_signals(module, df) == []
+
+
+def test_pullback_cannot_confirm_on_the_forming_candle():
+    # Na janela fechada o pullback confirma; com a vela recém-aberta (sem volume nem corpo), não
+    timestamps, values = pullback_history(blocks=2)
+    walker = HistoryWalker(timestamps, values)
+    df = to_frame(timestamps, values)
+    closed = [t for t in range(WINDOW - 1, len(df)) if pullback.check_signal(df.iloc[t - WINDOW + 1:t + 1].copy())]
+    assert len(closed) == 2
+    pullback.reset_state()
+    assert all(pullback.check_signal(walker.m1_window(t + 1)) is None for t in closed if t + 1 < len(df))
+    assert signal_count(pullback.generate_signals(df, WINDOW)) == 0
@@ -0,0 +1,96 @@
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import strategies.strategy_bollinger_rsi as bollinger_rsi
+from backtest import WINDOW, settle
+from conftest import synthetic_history, write_csv
+from sweep import evaluate_chunk, expand_grid, load_cached, parse_grid, rank, run_sweep, score_signals, trade_signals
+
+STRATEGY = 'strategy_bollinger_rsi.py'
+GRID = {'bb_std': [2.0, 2.5], 'rsi_period': [4, 7], 'rsi_oversold': [20, 30], 'rsi_overbought': [25, 70]}
+
+
+@pytest.fixture(autouse=True)
+def quiet_strategies():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('historico')
+    write_csv(path / 'EURUSD.csv', *synthetic_history(1500, seed=0))
+    write_csv(path / 'GBPUSD.csv', *synthetic_history(1500, seed=1))
+    return path
+
+
+def test_parse_grid():
+    assert parse_grid(['bb_std=2.0, 2.5', 'rsi_period=4']) == {'bb_std': [2.0, 2.5], 'rsi_period': [4]}
+
+
+def test_expand_grid_applies_constraints():
+    configs = expand_grid(STRATEGY, GRID)
+    # rsi_overbought=25 só vale com rsi_oversold=20
+    assert len(configs) == 2 * 2 * 3
+    assert all(c['rsi_oversold'] < c['rsi_overbought'] for c in configs)
+
+
+def test_expand_grid_samples_in_grid_order():
+    full = expand_grid(STRATEGY, GRID)
+    sample = expand_grid(STRATEGY, GRID, random_count=5, seed=3)
+    assert len(sample) == 5 and all(c in full for c in sample)
+    assert sample == sorted(sample, key=full.index)
+    assert sample == expand_grid(STRATEGY, GRID, random_count=5, seed=3)
+    assert expand_grid(STRATEGY, GRID, random_count=50, seed=3) == full
+
+
+def test_score_signals_one_position_at_a_time_and_gaps():
+    n = WINDOW + 20
+    timestamps = 1704672000 + 60 * np.arange(n, dtype=np.int64)
+    timestamps[WINDOW + 10:] += 3600  # lacuna de uma hora
+    open_price = np.full(n, 1.1)
+    close_price = open_price + np.where(np.arange(n) % 2, 0.001, -0.001)
+    signals = np.full(n, None, dtype=object)
+    first = WINDOW - 1
+    signals[[first - 1, first, first + 1, first + 3, WINDOW + 10, WINDOW + 15]] = 'CALL'
+
+    stats = score_signals(signals, timestamps, open_price, close_price, 0.85, 1.0)
+    # Antes da primeira janela: não opera; f + 1 ainda com posição aberta; depois da lacuna, sem janela contínua
+    traded = [first, first + 3]
+    assert stats['trades'] == len(traded)
+    assert stats['pnl'] == pytest.approx(sum(settle('CALL', open_price[f], close_price[f], 1.0, 0.85) for f in traded))
+    assert stats['wins'] + stats['losses'] + stats['draws'] == stats['trades']
+
+
+def test_run_sweep_sums_chunks_across_assets(data_dir):
+    configs = expand_grid(STRATEGY, GRID)
+    results = run_sweep(str(data_dir), STRATEGY, configs, workers=3)
+    assert [config for config, _ in results] == configs
+
+    per_asset = [evaluate_chunk(STRATEGY, asset, str(data_dir / f'{asset}.csv'), configs, 0.85, 1.0)
+                 for asset in ('EURUSD', 'GBPUSD')]
+    for (_, total), first, second in zip(results, *per_asset):
+        assert total['trades'] == first['trades'] + second['trades']
+        assert total['wins'] == first['wins'] + second['wins']
+        assert total['pnl'] == pytest.approx(first['pnl'] + second['pnl'])
+    assert sum(total['trades'] for _, total in results) > 0
+
+
+def test_per_bar_and_generate_signals_rank_the_same(data_dir):
+    configs = expand_grid(STRATEGY, GRID, random_count=4, seed=1)
+    history = load_cached(str(data_dir / 'EURUSD.csv'))
+    # Só com check_signal: trade_signals cai no caminho vela a vela
+    per_bar_module = SimpleNamespace(check_signal=bollinger_rsi.check_signal)
+    vectorized = trade_signals(bollinger_rsi, configs, history)
+    per_bar = trade_signals(per_bar_module, configs, history)
+    for a, b in zip(vectorized, per_bar):
+        assert list(a[WINDOW - 1:]) == list(b[WINDOW - 1:])
+
+    open_price, close_price = history['values'][0], history['values'][3]
+    score = lambda arrays: [score_signals(s, history['timestamps'], open_price, close_price, 0.85, 1.0) for s in arrays]
+    assert rank(list(zip(configs, score(vectorized)))) == rank(list(zip(configs, score(per_bar))))
+    assert any(np.not_equal(s, None).any() for s in vectorized)